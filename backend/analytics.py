@@ -0,0 +1,249 @@
+"""Time-bucketed complaint rollups for the analytics API.
+
+Rollups are recomputed periodically from a columnar extract of the
+complaints table: each column becomes a NumPy array and every metric is
+computed with vectorized grouping (bincount / sorted splits) instead of
+per-row Python. The API then only reads the small ``complaint_rollups``
+table, so trend queries are independent of the complaint volume.
+
+Resolution metrics are cohort-based: a complaint counts towards the bucket
+in which it was created. Every series exists for all teams together and,
+except the per-team one, for each team alone.
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import delete, func, select, union_all
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+import models
+import sla_clock
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_WINDOW_DAYS = int(os.getenv("ANALYTICS_WINDOW_DAYS", "400"))
+ANALYTICS_REFRESH_SECONDS = int(os.getenv("ANALYTICS_REFRESH_SECONDS", "900"))
+EXTRACT_CHUNK_SIZE = 50000
+
+GRANULARITIES = ("day", "week")
+DIMENSIONS = ("all", "product", "issue", "team", "severity")
+
+_refresh_lock = threading.Lock()
+_thread = None
+
+def _encode(values, index: dict) -> np.ndarray:
+    """Dictionary-encode values to int codes, extending ``index`` in place."""
+    return np.fromiter((index.setdefault(v, len(index)) for v in values), dtype=np.int64, count=len(values))
+
+def extract_columns(db: Session, since: datetime) -> dict:
+    """Read the columns rollups need as NumPy arrays, in chunks.
+
+    Dimension columns are dictionary-encoded as ``(categories, codes)``.
+    """
+    chunks = {name: [] for name in ("created_at", "resolution_time", "due_at", "sla_hours", "sla_breach") + DIMENSIONS[1:]}
+    indexes = {dimension: {} for dimension in DIMENSIONS[1:]}
+    # Archived complaints still belong to the trends of their buckets
+    stmt = union_all(*[
+        select(
+            table.c.created_at,
+            table.c.resolution_time,
+            table.c.due_at,
+            table.c.sla_hours,
+            table.c.sla_breach,
+            table.c.product,
+            table.c.issue,
+            table.c.assigned_team_id,
+            table.c.severity,
+        ).where(table.c.created_at >= since)
+        for table in (models.Complaint.__table__, models.ArchivedComplaint.__table__)
+    ]).execution_options(yield_per=EXTRACT_CHUNK_SIZE)
+
+    for partition in db.execute(stmt).partitions():
+        created, resolved, due, sla, breach, product, issue, team, severity = zip(*partition)
+        chunks["created_at"].append(np.array(created, dtype="datetime64[s]"))
+        chunks["resolution_time"].append(np.array(resolved, dtype="datetime64[s]"))
+        chunks["due_at"].append(np.array(due, dtype="datetime64[s]"))
+        chunks["sla_hours"].append(np.array([24 if v is None else v for v in sla], dtype=np.float64))
+        chunks["sla_breach"].append(np.array(breach, dtype=bool))
+        chunks["product"].append(_encode(product, indexes["product"]))
+        chunks["issue"].append(_encode(issue, indexes["issue"]))
+        chunks["team"].append(_encode(["unassigned" if v is None else str(v) for v in team], indexes["team"]))
+        chunks["severity"].append(_encode([v.value for v in severity], indexes["severity"]))
+
+    dtypes = {
+        "created_at": "datetime64[s]", "resolution_time": "datetime64[s]", "due_at": "datetime64[s]",
+        "sla_hours": np.float64, "sla_breach": bool
+    }
+    columns = {}
+    for name, parts in chunks.items():
+        array = np.concatenate(parts) if parts else np.array([], dtype=dtypes.get(name, np.int64))
+        columns[name] = (np.array(list(indexes[name]), dtype=object), array) if name in indexes else array
+    return columns
+
+def bucket_starts(created: np.ndarray, granularity: str) -> np.ndarray:
+    """Floor timestamps to day or ISO week (Monday) starts."""
+    days = created.astype("datetime64[D]")
+    if granularity == "week":
+        # 1970-01-01 was a Thursday; shift so weeks start on Monday
+        days = days - ((days.astype(np.int64) + 3) % 7)
+    return days
+
+def _grouped_medians(group: np.ndarray, values: np.ndarray, n_groups: int) -> np.ndarray:
+    """Median of ``values`` per group id, NaN for empty groups.
+
+    ``values`` must already be sorted ascending; a stable sort by group then
+    keeps each group's values in order.
+    """
+    medians = np.full(n_groups, np.nan)
+    if values.size == 0:
+        return medians
+    # Small keys let NumPy use its radix sort for the stable sort
+    keys = group.astype(np.uint16) if n_groups <= np.iinfo(np.uint16).max else group
+    order = np.argsort(keys, kind="stable")
+    values = values[order]
+    counts = np.bincount(group, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    present = counts > 0
+    lo = starts[present] + (counts[present] - 1) // 2
+    hi = starts[present] + counts[present] // 2
+    medians[present] = (values[lo] + values[hi]) / 2
+    return medians
+
+def compute_rollups(columns: dict, now: datetime, calendars=None) -> list:
+    """Compute rollup rows for every granularity and dimension.
+
+    A complaint is breached when it ended (or is still open) after its
+    business-hours deadline; rows without a stored deadline are measured
+    against ``calendars`` (default: the default business calendar).
+    """
+    created = columns["created_at"]
+    if created.size == 0:
+        return []
+    resolved = columns["resolution_time"]
+    closed = ~np.isnat(resolved)
+
+    now64 = np.datetime64(now, "s")
+    ended = np.where(closed, resolved, now64)
+    elapsed_hours = (ended - created).astype(np.float64) / 3600
+
+    due = columns["due_at"]
+    breached = columns["sla_breach"] | (~np.isnat(due) & (ended > due))
+    untimed = np.flatnonzero(np.isnat(due))
+    if untimed.size:
+        calendars = calendars or sla_clock.Calendars(sla_clock.BusinessCalendar(), {})
+        team_values, team_codes = columns["team"]
+        team_ids = np.array([sla_clock.NO_TEAM if v == "unassigned" else int(v) for v in team_values], dtype=np.int64)
+        business_hours = calendars.hours_between_many(created[untimed], ended[untimed], team_ids[team_codes[untimed]])
+        breached[untimed] |= business_hours > columns["sla_hours"][untimed]
+
+    # Sort closed complaints by resolution time once; medians reuse the order
+    closed_idx = np.flatnonzero(closed)
+    closed_idx = closed_idx[np.argsort(elapsed_hours[closed_idx], kind="stable")]
+    resolution_hours = elapsed_hours[closed_idx]
+
+    dimensions = {"all": (np.array(["all"], dtype=object), np.zeros(created.size, dtype=np.int64))}
+    dimensions.update((dimension, columns[dimension]) for dimension in DIMENSIONS[1:])
+
+    # Rows are computed for all teams together (team_id None) and for each
+    # team on its own (0 = unassigned), so managers can be shown their teams only
+    team_values, team_codes = columns["team"]
+    scopes = (
+        ([None], np.zeros(created.size, dtype=np.int64)),
+        ([0 if value == "unassigned" else int(value) for value in team_values], team_codes),
+    )
+
+    rows = []
+    for granularity in GRANULARITIES:
+        days = bucket_starts(created, granularity)
+        first_day = days.min()
+        bucket_idx = (days - first_day).astype(np.int64)
+        n_buckets = int(bucket_idx.max()) + 1
+        for dimension in DIMENSIONS:
+            values, value_idx = dimensions[dimension]
+            for scope_ids, scope_idx in scopes:
+                if dimension == "team" and scope_ids[0] is not None:
+                    # Already one team per row
+                    continue
+                n_cells = n_buckets * len(scope_ids)
+                n_groups = n_cells * len(values)
+
+                # Dense group ids: no sort needed to group
+                group = (bucket_idx * len(scope_ids) + scope_idx) * len(values) + value_idx
+                total = np.bincount(group, minlength=n_groups)
+                closed_count = np.bincount(group, weights=closed, minlength=n_groups)
+                breached_count = np.bincount(group, weights=breached, minlength=n_groups)
+                closed_group = group[closed_idx]
+                resolution_sum = np.bincount(closed_group, weights=resolution_hours, minlength=n_groups)
+                medians = _grouped_medians(closed_group, resolution_hours, n_groups)
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    means = resolution_sum / closed_count
+
+                for key in np.flatnonzero(total):
+                    cell, value = divmod(int(key), len(values))
+                    bucket, scope = divmod(cell, len(scope_ids))
+                    rows.append({
+                        "granularity": granularity,
+                        "bucket_start": (first_day + bucket).astype(datetime),
+                        "dimension": dimension,
+                        "dimension_value": values[value],
+                        "team_id": scope_ids[scope],
+                        "complaints": int(total[key]),
+                        "closed": int(closed_count[key]),
+                        "breached": int(breached_count[key]),
+                        "mean_resolution_hours": None if np.isnan(means[key]) else round(float(means[key]), 3),
+                        "median_resolution_hours": None if np.isnan(medians[key]) else round(float(medians[key]), 3),
+                        "refreshed_at": now,
+                    })
+    return rows
+
+def refresh_rollups(db: Session) -> dict:
+    """Recompute all rollups inside the analytics window."""
+    with _refresh_lock:
+        start = time.perf_counter()
+        now = datetime.utcnow()
+        # Start the window on a Monday so the first week bucket is complete
+        since = (now - timedelta(days=ANALYTICS_WINDOW_DAYS)).replace(hour=0, minute=0, second=0, microsecond=0)
+        since -= timedelta(days=since.weekday())
+
+        columns = extract_columns(db, since)
+        rows = compute_rollups(columns, now, sla_clock.get_calendars(db))
+
+        db.execute(delete(models.ComplaintRollup))
+        if rows:
+            db.execute(models.ComplaintRollup.__table__.insert(), rows)
+        db.commit()
+
+        elapsed_ms = round((time.perf_counter() - start) * 1000, 3)
+        logger.info("Refreshed %d rollup rows from %d complaints in %.1f ms",
+                    len(rows), columns["created_at"].size, elapsed_ms)
+        return {"complaints": int(columns["created_at"].size), "rollup_rows": len(rows), "elapsed_ms": elapsed_ms}
+
+def refresh_if_stale(db: Session):
+    """Refresh unless any worker already did within the refresh interval."""
+    last = db.execute(select(func.max(models.ComplaintRollup.refreshed_at))).scalar()
+    if last is None or datetime.utcnow() - last >= timedelta(seconds=ANALYTICS_REFRESH_SECONDS):
+        refresh_rollups(db)
+
+def _run():
+    while True:
+        db = SessionLocal()
+        try:
+            refresh_if_stale(db)
+        except Exception:
+            logger.exception("Analytics rollup refresh failed")
+        finally:
+            db.close()
+        time.sleep(ANALYTICS_REFRESH_SECONDS)
+
+def start():
+    """Start the periodic rollup refresh thread."""
+    global _thread
+    if _thread is None and ANALYTICS_REFRESH_SECONDS > 0:
+        _thread = threading.Thread(target=_run, name="analytics-refresh", daemon=True)
+        _thread.start()
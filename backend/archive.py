@@ -0,0 +1,136 @@
+"""Hot/cold partitioning: move old closed complaints into archive tables.
+
+Closed complaints whose resolution is older than ARCHIVE_AFTER_DAYS are
+copied, with their notes, attachments and history, into the ``*_archive``
+tables and deleted from the working tables. Each batch of ARCHIVE_BATCH_SIZE
+complaints is moved in its own short transaction (INSERT ... SELECT then
+DELETE), so the working tables are never locked for long. Reads only union
+the archive when a filter asks for closed or dated complaints.
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+import changes
+import complaint_cache
+import models
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "180"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+ARCHIVE_INTERVAL_SECONDS = int(os.getenv("ARCHIVE_INTERVAL_SECONDS", "3600"))
+
+# (live, archive) pairs; children first so deletes respect foreign keys
+ARCHIVED_TABLES = (
+    (models.ComplaintNote, models.ArchivedComplaintNote),
+    (models.ComplaintAttachment, models.ArchivedComplaintAttachment),
+    (models.ComplaintHistory, models.ArchivedComplaintHistory),
+    (models.Complaint, models.ArchivedComplaint),
+)
+
+_archive_lock = threading.Lock()
+_thread = None
+
+def shared_columns(live, archived) -> list:
+    """Names of the archive columns copied from the live table."""
+    live_columns = live.__table__.columns
+    return [column.name for column in archived.__table__.columns if column.name in live_columns]
+
+def archive_batch(db: Session, cutoff: datetime, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Move one batch of closed complaints resolved before ``cutoff``; returns its size."""
+    complaint_ids = db.execute(
+        select(models.Complaint.id)
+        .where(
+            models.Complaint.status == models.ComplaintStatus.CLOSED,
+            models.Complaint.resolution_time < cutoff,
+            # Keep the newest row so auto-increment ids are never reused
+            models.Complaint.id < select(func.max(models.Complaint.id)).scalar_subquery()
+        )
+        .order_by(models.Complaint.id)
+        .limit(batch_size)
+        .with_for_update()
+    ).scalars().all()
+    if not complaint_ids:
+        db.rollback()
+        return 0
+
+    # Summaries show recent history and notes from the working tables, and
+    # unfiltered complaint lists only the working table
+    owners = db.execute(
+        select(models.Complaint.assigned_team_id, models.Complaint.customer_id)
+        .where(models.Complaint.id.in_(complaint_ids)).distinct()
+    ).all()
+    complaint_cache.touch(db, [team_id for team_id, _ in owners], [customer_id for _, customer_id in owners])
+    changes.record_tombstones(db, complaint_ids, "archived")
+
+    for live, archived in ARCHIVED_TABLES:
+        key = live.id if live is models.Complaint else live.complaint_id
+        names = shared_columns(live, archived)
+        db.execute(
+            insert(archived).from_select(
+                names, select(*[live.__table__.c[name] for name in names]).where(key.in_(complaint_ids))
+            )
+        )
+        db.execute(delete(live).where(key.in_(complaint_ids)).execution_options(synchronize_session=False))
+    db.commit()
+    return len(complaint_ids)
+
+def archive_closed_complaints(
+    db: Session,
+    older_than_days: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    max_batches: Optional[int] = None
+) -> dict:
+    """Archive every eligible complaint, one transaction per batch."""
+    older_than_days = ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    batch_size = batch_size or ARCHIVE_BATCH_SIZE
+    with _archive_lock:
+        start = time.perf_counter()
+        cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+        archived = batches = 0
+        while max_batches is None or batches < max_batches:
+            moved = archive_batch(db, cutoff, batch_size)
+            if moved == 0:
+                break
+            archived += moved
+            batches += 1
+
+        elapsed_ms = round((time.perf_counter() - start) * 1000, 3)
+        if archived:
+            logger.info("Archived %d complaints in %d batches in %.1f ms", archived, batches, elapsed_ms)
+        return {"archived": archived, "batches": batches, "cutoff": cutoff, "elapsed_ms": elapsed_ms}
+
+def archive_stats(db: Session) -> dict:
+    """Row counts of the working and archive complaint tables."""
+    return {
+        "live_complaints": db.execute(select(func.count(models.Complaint.id))).scalar(),
+        "archived_complaints": db.execute(select(func.count(models.ArchivedComplaint.id))).scalar(),
+        "archive_after_days": ARCHIVE_AFTER_DAYS,
+    }
+
+def _run():
+    while True:
+        time.sleep(ARCHIVE_INTERVAL_SECONDS)
+        db = SessionLocal()
+        try:
+            archive_closed_complaints(db)
+        except Exception:
+            logger.exception("Complaint archival failed")
+        finally:
+            db.close()
+
+def start():
+    """Start the periodic archival thread."""
+    global _thread
+    if _thread is None and ARCHIVE_INTERVAL_SECONDS > 0:
+        _thread = threading.Thread(target=_run, name="complaint-archive", daemon=True)
+        _thread.start()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""Contention benchmark: optimistic version checks vs SELECT ... FOR UPDATE.
+
+Many threads repeatedly update a small set of hot complaints. The optimistic
+strategy reads the version and runs UPDATE ... WHERE id = ? AND version = ?,
+retrying on a lost race; the pessimistic one locks the row with
+SELECT ... FOR UPDATE before updating. Run against the MySQL database the API
+uses (SQLite ignores FOR UPDATE and serializes all writers anyway):
+
+    DATABASE_URL=mysql+pymysql://... python benchmarks/contention.py --threads 32
+
+With --claims it instead measures the team queue: --threads agents claim
+complaints with ``claim_next`` until the queue of --queue complaints is
+empty, while --editors threads keep updating the same team's complaints the
+way the API does (row change, cache generation bump, commit). Claims per
+second and failed transactions (e.g. deadlocks) are reported.
+"""
+
+import argparse
+import random
+import sys
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, delete, insert, select, update
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm.exc import StaleDataError
+from database import DATABASE_URL, SessionLocal
+import complaint_cache
+import models
+
+complaints = models.Complaint.__table__
+
+def optimistic_update(conn, complaint_id: int) -> int:
+    """Compare-and-swap update; returns the number of retries needed."""
+    retries = 0
+    while True:
+        with conn.begin():
+            version = conn.execute(
+                select(complaints.c.version).where(complaints.c.id == complaint_id)
+            ).scalar_one()
+            result = conn.execute(
+                update(complaints)
+                .where(complaints.c.id == complaint_id, complaints.c.version == version)
+                .values(sla_hours=complaints.c.sla_hours + 1, version=version + 1)
+            )
+        if result.rowcount == 1:
+            return retries
+        retries += 1
+
+def pessimistic_update(conn, complaint_id: int) -> int:
+    """Row-lock update; never retries."""
+    with conn.begin():
+        conn.execute(
+            select(complaints.c.version).where(complaints.c.id == complaint_id).with_for_update()
+        ).scalar_one()
+        conn.execute(
+            update(complaints)
+            .where(complaints.c.id == complaint_id)
+            .values(sla_hours=complaints.c.sla_hours + 1, version=complaints.c.version + 1)
+        )
+    return 0
+
+def run(engine, strategy, complaint_ids, threads: int, updates_per_thread: int) -> dict:
+    retries = [0] * threads
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(index):
+        rng = random.Random(index)
+        with engine.connect() as conn:
+            barrier.wait()
+            for _ in range(updates_per_thread):
+                retries[index] += strategy(conn, rng.choice(complaint_ids))
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    total = threads * updates_per_thread
+    return {
+        "updates": total,
+        "seconds": round(elapsed, 3),
+        "updates_per_second": round(total / elapsed, 1),
+        "retries": sum(retries),
+    }
+
+def edit(team_id: int, complaint_ids) -> str:
+    """One complaint update as update_complaint makes it; returns its outcome."""
+    db = SessionLocal()
+    try:
+        complaint = db.get(models.Complaint, random.choice(complaint_ids))
+        complaint.updated_at = datetime.utcnow()
+        complaint_cache.touch(db, [team_id], [complaint.customer_id])
+        db.commit()
+        return "ok"
+    except StaleDataError:
+        db.rollback()
+        return "conflict"
+    except DBAPIError:
+        db.rollback()
+        return "error"
+    finally:
+        db.close()
+
+def run_claims(engine, customer_id: int, agents: int, editors: int, queue: int) -> dict:
+    from routers.complaints import claim_next
+
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        team_id = conn.execute(insert(models.Team.__table__).values(
+            name=f"Benchmark {int(time.time() * 1000)}"
+        )).inserted_primary_key[0]
+        complaint_ids = [
+            conn.execute(insert(complaints).values(
+                complaint_number=f"CLAIM{int(time.time() * 1000)}{i}",
+                product="Benchmark",
+                issue="Claim queue",
+                description="Claim benchmark scratch row",
+                severity=models.ComplaintSeverity.LOW,
+                status=models.ComplaintStatus.OPEN,
+                customer_id=customer_id,
+                assigned_team_id=team_id,
+                sla_hours=48,
+                due_at=now + timedelta(minutes=i),
+                version=1,
+            )).inserted_primary_key[0]
+            for i in range(queue)
+        ]
+    agent = SimpleNamespace(id=customer_id, team_id=team_id, full_name="Benchmark agent", email="agent@bench.example.com")
+    outcomes = {"claims": 0, "claim_errors": 0, "edits": 0, "edit_conflicts": 0, "edit_errors": 0}
+    lock = threading.Lock()
+    done = threading.Event()
+    barrier = threading.Barrier(agents + editors + 1)
+
+    def claimer():
+        barrier.wait()
+        while True:
+            db = SessionLocal()
+            try:
+                claimed = claim_next(db, agent)
+            except DBAPIError:
+                db.rollback()
+                with lock:
+                    outcomes["claim_errors"] += 1
+                continue
+            finally:
+                db.close()
+            if claimed is None:
+                return
+            with lock:
+                outcomes["claims"] += 1
+
+    def editor():
+        barrier.wait()
+        while not done.is_set():
+            outcome = edit(team_id, complaint_ids)
+            with lock:
+                outcomes[{"ok": "edits", "conflict": "edit_conflicts", "error": "edit_errors"}[outcome]] += 1
+
+    claimers = [threading.Thread(target=claimer) for _ in range(agents)]
+    others = [threading.Thread(target=editor) for _ in range(editors)]
+    try:
+        for thread in claimers + others:
+            thread.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for thread in claimers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        done.set()
+        for thread in others:
+            thread.join()
+    finally:
+        with engine.begin() as conn:
+            history = models.ComplaintHistory.__table__
+            conn.execute(delete(history).where(history.c.complaint_id.in_(complaint_ids)))
+            conn.execute(delete(complaints).where(complaints.c.id.in_(complaint_ids)))
+            conn.execute(delete(models.Team.__table__).where(models.Team.__table__.c.id == team_id))
+    return {
+        **outcomes,
+        "seconds": round(elapsed, 3),
+        "claims_per_second": round(outcomes["claims"] / elapsed, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--updates", type=int, default=200, help="updates per thread")
+    parser.add_argument("--hot", type=int, default=4, help="number of hot complaints")
+    parser.add_argument("--claims", action="store_true", help="benchmark claim_next against concurrent edits")
+    parser.add_argument("--editors", type=int, default=4, help="editing threads with --claims")
+    parser.add_argument("--queue", type=int, default=500, help="queued complaints with --claims")
+    args = parser.parse_args()
+
+    engine = create_engine(DATABASE_URL, pool_size=args.threads, max_overflow=0)
+    with engine.begin() as conn:
+        customer_id = conn.execute(select(models.User.__table__.c.id).limit(1)).scalar_one()
+    if args.claims:
+        print(f"{args.threads} agents claiming {args.queue} complaints, {args.editors} editors ({engine.dialect.name})")
+        print(run_claims(engine, customer_id, args.threads, args.editors, args.queue))
+        return
+
+    with engine.begin() as conn:
+        complaint_ids = [
+            conn.execute(insert(complaints).values(
+                complaint_number=f"BENCH{int(time.time() * 1000)}{i}",
+                product="Benchmark",
+                issue="Contention",
+                description="Contention benchmark scratch row",
+                severity=models.ComplaintSeverity.LOW,
+                status=models.ComplaintStatus.OPEN,
+                customer_id=customer_id,
+                sla_hours=0,
+                version=1,
+            )).inserted_primary_key[0]
+            for i in range(args.hot)
+        ]
+
+    try:
+        print(f"{args.threads} threads x {args.updates} updates over {args.hot} hot complaints ({engine.dialect.name})")
+        for name, strategy in (("optimistic (version CAS)", optimistic_update),
+                               ("pessimistic (FOR UPDATE)", pessimistic_update)):
+            print(f"{name:26} {run(engine, strategy, complaint_ids, args.threads, args.updates)}")
+    finally:
+        with engine.begin() as conn:
+            conn.execute(delete(complaints).where(complaints.c.id.in_(complaint_ids)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""Micro-benchmarks for the backend's hot functions.
+
+Every benchmark runs against an in-memory SQLite database seeded with a
+small fixture (one user per role, two teams, SLA rules, 1000 complaints),
+so results are repeatable and need no server. Timing follows
+pytest-benchmark: calls are batched so a round lasts at least --min-time,
+rounds are repeated with the garbage collector off, and the min and median per-call times are reported.
+
+Results are compared with the stored baselines in benchmarks/baselines.json
+and anything more than --threshold (default 10%) slower is flagged:
+
+    python benchmarks/micro.py                 # compare with the baselines
+    python benchmarks/micro.py --save          # record new baselines
+    python benchmarks/micro.py -k serialize --fail-on-regression
+
+Baselines are only comparable on the machine that recorded them; re-record
+them with --save after an intended performance change.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.security import HTTPAuthorizationCredentials
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from auth import create_access_token, verify_token
+from routers.chatbot import process_chatbot_query
+from routers.complaints import calculate_sla, generate_complaint_number, role_scope_condition
+import models
+import schemas
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+FIXTURE_COMPLAINTS = 1000
+
+BENCHMARKS = {}
+
+def benchmark(name: str):
+    """Register a benchmark: a function taking the fixture and returning the callable to time."""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+class Fixture:
+    """In-memory database with users, teams, SLA rules and complaints."""
+
+    def __init__(self):
+        self.engine = create_engine(
+            "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+        )
+        models.Base.metadata.create_all(self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+        self.users = {}
+        for role in models.UserRole:
+            user = models.User(
+                email=f"{role.value}@bench.example.com",
+                full_name=f"Bench {role.value}",
+                # Never checked here; skips bcrypt
+                hashed_password="x",
+                role=role,
+            )
+            self.db.add(user)
+            self.users[role] = user
+        self.db.flush()
+        teams = [
+            models.Team(name=f"Bench team {i}", manager_id=self.users[models.UserRole.MANAGER].id,
+                        team_lead_id=self.users[models.UserRole.TEAM_LEAD].id)
+            for i in range(2)
+        ]
+        self.db.add_all(teams)
+        self.db.flush()
+        for role in (models.UserRole.OPS_MEMBER, models.UserRole.TEAM_LEAD):
+            self.users[role].team_id = teams[0].id
+        for severity, hours in ((models.ComplaintSeverity.HIGH, 4), (models.ComplaintSeverity.MEDIUM, 12)):
+            self.db.add(models.SLAMatrix(product="Credit Card", issue="Payment Issue", severity=severity, sla_hours=hours))
+
+        customer = self.users[models.UserRole.CUSTOMER]
+        severities = list(models.ComplaintSeverity)
+        statuses = list(models.ComplaintStatus)
+        start = datetime(2024, 1, 1)
+        self.db.add_all([
+            models.Complaint(
+                complaint_number=f"BENCH{i:06d}",
+                product=("Credit Card", "Loan", "Savings Account")[i % 3],
+                issue=("Payment Issue", "Processing Delay", "Access Issue")[i % 3],
+                description="Micro-benchmark fixture complaint",
+                severity=severities[i % len(severities)],
+                status=statuses[i % len(statuses)],
+                customer_id=customer.id,
+                assigned_team_id=teams[i % 2].id,
+                assigned_to_id=self.users[models.UserRole.OPS_MEMBER].id if i % 2 == 0 else None,
+                sla_hours=24,
+                created_at=start + timedelta(hours=i),
+                updated_at=start + timedelta(hours=i),
+            )
+            for i in range(FIXTURE_COMPLAINTS)
+        ])
+        self.db.commit()
+        self.complaints = self.db.query(models.Complaint).order_by(models.Complaint.id).all()
+
+    def close(self):
+        self.db.close()
+        self.engine.dispose()
+
+@benchmark("auth.create_access_token")
+def bench_create_access_token(fixture):
+    data = {"sub": "admin@bench.example.com", "role": "admin"}
+    return lambda: create_access_token(data)
+
+@benchmark("auth.verify_token")
+def bench_verify_token(fixture):
+    credentials = HTTPAuthorizationCredentials(
+        scheme="Bearer", credentials=create_access_token({"sub": "ops_member@bench.example.com", "role": "ops_member"})
+    )
+    return lambda: verify_token(credentials, fixture.db)
+
+@benchmark("complaints.calculate_sla")
+def bench_calculate_sla(fixture):
+    # One complaint with a matching rule, one falling back to the default
+    complaints = [
+        models.Complaint(product="Credit Card", issue="Payment Issue", severity=models.ComplaintSeverity.HIGH),
+        models.Complaint(product="Loan", issue="Other", severity=models.ComplaintSeverity.LOW),
+    ]
+    return lambda: [calculate_sla(fixture.db, complaint) for complaint in complaints]
+
+@benchmark("complaints.generate_complaint_number")
+def bench_generate_complaint_number(fixture):
+    return generate_complaint_number
+
+@benchmark("chatbot.process_chatbot_query")
+def bench_chatbot(fixture):
+    queries = [
+        "find customer customer@bench.example.com",
+        "show account balance",
+        "recent transaction history",
+        "hello",
+    ]
+    return lambda: [process_chatbot_query(query, fixture.db) for query in queries]
+
+@benchmark("complaints.role_scope_compile")
+def bench_role_scope_compile(fixture):
+    users = list(fixture.users.values())
+    dialect = fixture.engine.dialect
+
+    def compile_scopes():
+        for user in users:
+            stmt = select(models.Complaint.id)
+            scope = role_scope_condition(fixture.db, user)
+            if scope is not None:
+                stmt = stmt.where(scope)
+            str(stmt.compile(dialect=dialect))
+    return compile_scopes
+
+def bench_serialize(rows: int):
+    def setup(fixture):
+        adapter = TypeAdapter(list[schemas.Complaint])
+        complaints = fixture.complaints[:rows]
+        return lambda: adapter.dump_json(adapter.validate_python(complaints, from_attributes=True))
+    return setup
+
+benchmark("schemas.serialize_complaints_100")(bench_serialize(100))
+benchmark("schemas.serialize_complaints_1000")(bench_serialize(1000))
+
+def measure(fn, rounds: int, min_time: float) -> dict:
+    """Per-call timings of ``fn`` over ``rounds`` calibrated rounds, in seconds."""
+    # Calibrate: double the calls per round until one round takes min_time
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or calls >= 1 << 20:
+            break
+        calls *= 2
+
+    # Collections triggered by earlier benchmarks' garbage would land in
+    # random rounds; collect up front and keep the collector off while timing
+    timings = []
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for _ in range(calls):
+                fn()
+            timings.append((time.perf_counter() - start) / calls)
+    finally:
+        gc.enable()
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "rounds": rounds,
+        "calls_per_round": calls,
+    }
+
+def run(names, rounds: int, min_time: float) -> dict:
+    fixture = Fixture()
+    try:
+        return {name: measure(BENCHMARKS[name](fixture), rounds, min_time) for name in names}
+    finally:
+        fixture.close()
+
+def load_baselines(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f).get("benchmarks", {})
+
+def save_baselines(path: str, results: dict):
+    """Merge ``results`` into the baselines file."""
+    benchmarks = load_baselines(path)
+    benchmarks.update(results)
+    with open(path, "w") as f:
+        json.dump({
+            "machine": platform.platform(),
+            "python": platform.python_version(),
+            "recorded_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "benchmarks": dict(sorted(benchmarks.items())),
+        }, f, indent=2)
+        f.write("\n")
+
+def report(results: dict, baselines: dict, stat: str, threshold: float) -> list:
+    """Print a comparison table; returns the names of regressed benchmarks."""
+    regressions = []
+    print(f"{'benchmark':40} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, result in results.items():
+        current = result[stat]
+        baseline = baselines.get(name, {}).get(stat)
+        if baseline is None:
+            print(f"{name:40} {'-':>12} {current * 1e6:>10.2f}us {'new':>8}")
+            continue
+        change = current / baseline - 1
+        flag = ""
+        if change > threshold:
+            flag = "  SLOWER"
+            regressions.append(name)
+        elif change < -threshold:
+            flag = "  faster"
+        print(f"{name:40} {baseline * 1e6:>10.2f}us {current * 1e6:>10.2f}us {change:>+8.1%}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", dest="pattern", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--min-time", type=float, default=0.05, help="minimum seconds per round")
+    parser.add_argument("--stat", choices=("min", "median"), default="min", help="statistic to compare")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative slowdown to flag")
+    parser.add_argument("--baselines", default=BASELINES_PATH)
+    parser.add_argument("--save", action="store_true", help="store the results as the new baselines")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with status 1 if anything is flagged")
+    args = parser.parse_args()
+
+    names = [name for name in BENCHMARKS if args.pattern in name]
+    if not names:
+        parser.error(f"no benchmark matches {args.pattern!r}")
+    results = run(names, args.rounds, args.min_time)
+    regressions = report(results, load_baselines(args.baselines), args.stat, args.threshold)
+
+    if args.save:
+        save_baselines(args.baselines, results)
+        print(f"Saved baselines to {args.baselines}")
+    elif regressions:
+        print(f"{len(regressions)} benchmark(s) more than {args.threshold:.0%} slower than baseline: {', '.join(regressions)}")
+        if args.fail_on_regression:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
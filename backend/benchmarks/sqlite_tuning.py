@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""Concurrent load on a SQLite file: tuned engines against SQLite defaults.
+
+Each configuration gets a fresh database file with the application schema
+and a few thousand complaints, then writer threads create and update
+complaints (one short transaction each) while reader threads run list and
+count queries, for --duration seconds:
+
+- ``default``: a plain ``create_engine`` (rollback journal, synchronous=FULL,
+  the driver's 5 s busy timeout, one pool for everything).
+- ``tuned``: ``database.create_database_engine`` as the application uses it
+  for SQLite files (WAL, synchronous=NORMAL, mmap, larger cache, the write
+  queue, and a separate reader pool).
+
+    python benchmarks/sqlite_tuning.py
+    python benchmarks/sqlite_tuning.py --writers 8 --readers 16 --duration 10
+
+Reported are committed writes and reads per second, write latency
+percentiles and the number of "database is locked" failures.
+"""
+
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, func, select, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+import database
+import models
+
+FIXTURE_COMPLAINTS = 5000
+
+def seed(engine):
+    models.Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        customer = models.User(email="customer@bench.example.com", full_name="Bench customer",
+                               hashed_password="x", role=models.UserRole.CUSTOMER)
+        db.add(customer)
+        db.flush()
+        db.add_all([
+            models.Complaint(
+                complaint_number=f"SEED{i:07d}", product="Loan", issue="Processing Delay",
+                description="SQLite benchmark fixture", severity=models.ComplaintSeverity.MEDIUM,
+                customer_id=customer.id, sla_hours=24, due_at=datetime.utcnow()
+            )
+            for i in range(FIXTURE_COMPLAINTS)
+        ])
+        db.commit()
+        return customer.id
+    finally:
+        db.close()
+
+def engines(config: str, url: str):
+    """(write engine, read engine) of a configuration."""
+    if config == "default":
+        engine = create_engine(url)
+        return engine, engine
+    return (
+        database.create_database_engine(url, tuned=True),
+        database.create_database_engine(url, read_only=True, tuned=True),
+    )
+
+def writer(Session, customer_id, stop, latencies, errors, number):
+    sequence = 0
+    while not stop.is_set():
+        sequence += 1
+        db = Session()
+        start = time.perf_counter()
+        try:
+            db.add(models.Complaint(
+                complaint_number=f"W{number:03d}{sequence:08d}", product="Loan", issue="Processing Delay",
+                description="SQLite benchmark write", severity=models.ComplaintSeverity.LOW,
+                customer_id=customer_id, sla_hours=24, due_at=datetime.utcnow()
+            ))
+            db.execute(
+                update(models.Complaint)
+                .where(models.Complaint.id == random.randint(1, FIXTURE_COMPLAINTS))
+                .values(status=models.ComplaintStatus.INPROCESS, version=models.Complaint.version + 1)
+            )
+            db.commit()
+            latencies.append(time.perf_counter() - start)
+        except OperationalError as e:
+            db.rollback()
+            errors.append(str(e.orig))
+        finally:
+            db.close()
+
+def reader(Session, stop, reads, errors):
+    count = 0
+    while not stop.is_set():
+        db = Session()
+        try:
+            db.execute(
+                select(models.Complaint.id, models.Complaint.status, models.Complaint.due_at)
+                .order_by(models.Complaint.id.desc()).limit(50)
+            ).all()
+            db.execute(select(models.Complaint.status, func.count()).group_by(models.Complaint.status)).all()
+            count += 1
+        except OperationalError as e:
+            errors.append(str(e.orig))
+        finally:
+            db.close()
+    reads.append(count)
+
+def run(config: str, writers: int, readers: int, duration: float) -> dict:
+    directory = tempfile.mkdtemp(prefix="sqlite-bench-")
+    url = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+    write_engine, read_engine = engines(config, url)
+    try:
+        customer_id = seed(write_engine)
+        WriteSession = sessionmaker(bind=write_engine)
+        ReadSession = sessionmaker(bind=read_engine)
+        stop = threading.Event()
+        latencies, write_errors, read_errors, reads = [], [], [], []
+        threads = [
+            threading.Thread(target=writer, args=(WriteSession, customer_id, stop, latencies, write_errors, i))
+            for i in range(writers)
+        ] + [
+            threading.Thread(target=reader, args=(ReadSession, stop, reads, read_errors))
+            for _ in range(readers)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        latencies.sort()
+        percentile = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000 if latencies else None
+        return {
+            "writes_per_s": len(latencies) / elapsed,
+            "reads_per_s": sum(reads) / elapsed,
+            "write_p50_ms": percentile(0.50),
+            "write_p99_ms": percentile(0.99),
+            "write_mean_ms": statistics.mean(latencies) * 1000 if latencies else None,
+            "locked_errors": sum("locked" in error for error in write_errors + read_errors),
+            "other_errors": sum("locked" not in error for error in write_errors + read_errors),
+        }
+    finally:
+        write_engine.dispose()
+        read_engine.dispose()
+        shutil.rmtree(directory, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per configuration")
+    args = parser.parse_args()
+
+    results = {config: run(config, args.writers, args.readers, args.duration) for config in ("default", "tuned")}
+    metrics = list(results["default"])
+    print(f"{args.writers} writers, {args.readers} readers, {args.duration:g}s per configuration")
+    print(f"{'metric':16} {'default':>12} {'tuned':>12}")
+    for metric in metrics:
+        values = [results[config][metric] for config in results]
+        print(f"{metric:16} " + " ".join(f"{'-' if v is None else format(v, '.1f'):>12}" for v in values))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Cross-worker invalidation for in-process caches.
+
+Every worker keeps its own caches, so a write in one worker has to reach the
+others. Writers call ``bump(db, name)`` inside their transaction, which
+increments a row in the ``cache_generations`` table as it commits. The bump invalidates the
+local worker as soon as the transaction commits; every other worker polls the
+table every CACHE_SYNC_INTERVAL seconds and runs the invalidation callbacks of
+any generation that moved, so stale entries live at most one interval.
+No service besides the database is needed.
+
+Callbacks registered with ``local=False`` only run for other workers'
+bumps: the writing worker applies its own change itself (e.g. to the user
+index) instead of rebuilding.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+from sqlalchemy import event, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+import models
+
+logger = logging.getLogger(__name__)
+
+CACHE_SYNC_INTERVAL = float(os.getenv("CACHE_SYNC_INTERVAL", "1"))
+
+_callbacks = defaultdict(list)
+_remote_callbacks = defaultdict(list)
+_seen = {}
+_lock = threading.Lock()
+_thread = None
+
+def on_invalidate(name: str, callback, local: bool = True):
+    """Register a callback run whenever generation ``name`` is bumped.
+
+    With ``local=False`` it is skipped for bumps committed by this worker.
+    """
+    _callbacks[name].append(callback)
+    if not local:
+        _remote_callbacks[name].append(callback)
+
+def _invalidate(name: str, remote: bool = True):
+    for callback in _callbacks.get(name, []):
+        if not remote and callback in _remote_callbacks.get(name, ()):
+            continue
+        try:
+            callback()
+        except Exception:
+            logger.exception("Cache invalidation callback for %s failed", name)
+
+def bump(db: Session, *names: str):
+    """Increment generations when the caller's transaction commits.
+
+    The rows are written by ``_apply_bumps`` just before the commit, after
+    the final flush and in name order: every write path locks its own rows
+    first and the generations last, in the same order, so two writers never
+    hold them in opposite order.
+    """
+    if names:
+        db.info.setdefault("cache_pending", set()).update(names)
+
+def current(db: Session, name: str) -> int:
+    """Read a generation straight from the database (0 if never bumped)."""
+    table = models.CacheGeneration.__table__
+    return db.execute(select(table.c.generation).where(table.c.name == name)).scalar() or 0
+
+@event.listens_for(Session, "before_commit")
+def _apply_bumps(session):
+    if session.in_nested_transaction() or not session.info.get("cache_pending"):
+        return
+    session.flush()
+    names = sorted(session.info.pop("cache_pending"))
+    table = models.CacheGeneration.__table__
+    for name in names:
+        result = session.execute(
+            update(table).where(table.c.name == name).values(generation=table.c.generation + 1)
+        )
+        if result.rowcount == 0:
+            try:
+                with session.begin_nested():
+                    session.execute(table.insert().values(name=name, generation=1))
+            except IntegrityError:
+                # Another worker created the row first
+                session.execute(
+                    update(table).where(table.c.name == name).values(generation=table.c.generation + 1)
+                )
+    # New generations of watched names, to tell our bumps from other workers' at commit
+    bumps = session.info["cache_bumps"] = dict.fromkeys(names)
+    watched = [name for name in names if name in _callbacks]
+    if watched:
+        bumps.update(session.execute(
+            select(table.c.name, table.c.generation).where(table.c.name.in_(watched))
+        ).all())
+
+@event.listens_for(SessionLocal, "after_commit")
+def _invalidate_local(session):
+    for name, generation in session.info.pop("cache_bumps", {}).items():
+        with _lock:
+            # Only our own bump since the last sync, or also other workers'?
+            # Either way the callbacks run here cover them, so the sync
+            # thread need not run them again
+            previous = _seen.get(name)
+            own = generation is not None and previous == generation - 1
+            if generation is not None and (previous is None or previous < generation):
+                _seen[name] = generation
+        _invalidate(name, remote=not own)
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_bumps(session):
+    # Also fired for savepoints, whose rollback keeps the outer transaction
+    if session.in_nested_transaction():
+        return
+    session.info.pop("cache_pending", None)
+    session.info.pop("cache_bumps", None)
+
+def sync(db: Session):
+    """Run callbacks for every watched generation changed since the last sync."""
+    names = list(_callbacks)
+    if not names:
+        return
+    table = models.CacheGeneration.__table__
+    rows = dict(db.execute(select(table.c.name, table.c.generation).where(table.c.name.in_(names))).all())
+    with _lock:
+        changed = []
+        for name in names:
+            # A missing row has never been bumped: generation 0
+            generation = rows.get(name, 0)
+            previous = _seen.get(name)
+            _seen[name] = generation
+            if previous is not None and previous != generation:
+                changed.append(name)
+    for name in changed:
+        _invalidate(name)
+
+def _run():
+    while True:
+        time.sleep(CACHE_SYNC_INTERVAL)
+        db = SessionLocal()
+        try:
+            sync(db)
+        except Exception:
+            logger.exception("Cache generation sync failed")
+        finally:
+            db.close()
+
+def start():
+    """Record current generations and start the background sync thread."""
+    global _thread
+    if _thread is not None:
+        return
+    db = SessionLocal()
+    try:
+        sync(db)
+    finally:
+        db.close()
+    _thread = threading.Thread(target=_run, name="cache-sync", daemon=True)
+    _thread.start()
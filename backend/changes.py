@@ -0,0 +1,108 @@
+"""Change stamps for the complaint delta feed (``GET /api/complaints/changes``).
+
+Every complaint a transaction inserts or updates gets its ``change_seq``
+stamped: ORM flushes through the mapper events in models.py, set-based
+UPDATEs explicitly. Complaints that leave the working table (archival) leave
+a tombstone stamped the same way.
+
+While the transaction runs, its rows carry a marker unique to it (a
+negative number). Right before COMMIT, after the final flush and the cache
+generation bumps, the marker is replaced by the commit time in microseconds.
+There is no shared counter, so writers never wait on each other for a
+number, and stamps follow commit order up to the few milliseconds between
+stamping and COMMIT (and the clock skew between app servers).
+
+The feed only serves stamps older than CHANGE_FEED_LAG_SECONDS (plus
+REPLICA_MAX_LAG_SECONDS when reads go to replicas): a transaction still
+committing, or not yet replicated, is stamped inside that window, so a
+cursor never moves past a change that is not visible yet. Clients page
+through changes by an opaque cursor, ``<change_seq>.<complaint id>``.
+"""
+
+import os
+import random
+import threading
+import time
+
+from sqlalchemy import event, insert, literal, select, update
+from sqlalchemy.orm import Session
+
+# Registers its before_commit listener first, so generations are bumped
+# before the stamp is taken
+import cache
+from database import DATABASE_REPLICA_URLS, REPLICA_MAX_LAG_SECONDS
+import models
+
+CHANGE_FEED_LAG_SECONDS = float(os.getenv("CHANGE_FEED_LAG_SECONDS", "5"))
+
+START = "0.0"
+
+_lock = threading.Lock()
+_last_stamp = 0
+
+def _now_us() -> int:
+    return time.time_ns() // 1000
+
+def _next_stamp() -> int:
+    """Commit time in microseconds, increasing within this process."""
+    global _last_stamp
+    with _lock:
+        _last_stamp = max(_now_us(), _last_stamp + 1)
+        return _last_stamp
+
+def transaction_seq(db: Session) -> int:
+    """Marker of the session's transaction, replaced by its commit stamp."""
+    marker = db.info.get("change_seq")
+    if marker is None:
+        marker = db.info["change_seq"] = -random.getrandbits(62) - 1
+    return marker
+
+def horizon() -> int:
+    """Newest stamp the feed may serve: older than any transaction still committing."""
+    lag = CHANGE_FEED_LAG_SECONDS + (REPLICA_MAX_LAG_SECONDS if DATABASE_REPLICA_URLS else 0)
+    return _now_us() - int(lag * 1_000_000)
+
+@event.listens_for(Session, "before_commit")
+def _stamp(session):
+    if session.in_nested_transaction():
+        return
+    # The commit's own flush comes after this hook and may stamp rows too
+    session.flush()
+    if "change_seq" not in session.info:
+        return
+    marker = session.info.pop("change_seq")
+    stamp = _next_stamp()
+    for table in (models.Complaint.__table__, models.ComplaintTombstone.__table__):
+        session.execute(update(table).where(table.c.change_seq == marker).values(change_seq=stamp))
+
+@event.listens_for(Session, "after_rollback")
+def _end_transaction(session):
+    # Also fired for savepoints, whose rollback keeps the outer transaction
+    if not session.in_nested_transaction():
+        session.info.pop("change_seq", None)
+
+def encode_cursor(seq: int, complaint_id: int) -> str:
+    return f"{seq}.{complaint_id}"
+
+def decode_cursor(cursor: str) -> tuple:
+    """(change_seq, complaint id) of a cursor; raises ValueError if malformed."""
+    seq, _, complaint_id = cursor.partition(".")
+    seq, complaint_id = int(seq), int(complaint_id or 0)
+    if seq < 0 or complaint_id < 0:
+        raise ValueError(cursor)
+    return seq, complaint_id
+
+def record_tombstones(db: Session, complaint_ids, reason: str):
+    """Tombstone these working-table complaints in the caller's transaction."""
+    complaints = models.Complaint.__table__
+    seq = transaction_seq(db)
+    db.execute(
+        insert(models.ComplaintTombstone).from_select(
+            ["complaint_id", "complaint_number", "customer_id", "assigned_team_id", "assigned_to_id",
+             "reason", "change_seq"],
+            select(
+                complaints.c.id, complaints.c.complaint_number, complaints.c.customer_id,
+                complaints.c.assigned_team_id, complaints.c.assigned_to_id, literal(reason), literal(seq)
+            ).where(complaints.c.id.in_(list(complaint_ids)))
+        )
+    )
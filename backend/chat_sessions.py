@@ -0,0 +1,213 @@
+"""Per-user conversation state for the ops chatbot.
+
+A chatbot session belongs to one user and is named by the ``context`` of
+``ChatbotQuery`` (one unnamed session per user if omitted). It remembers the
+entities the conversation resolved (the customer being discussed) and the
+results of recent lookups, so a follow-up such as "and their transactions?"
+is answered from the session instead of the database.
+
+Sessions are kept per worker in memory. Idle sessions expire after
+CHATBOT_SESSION_TTL_SECONDS, cached results are reused for at most
+CHATBOT_RESULT_MAX_AGE_SECONDS, a session keeps its CHATBOT_SESSION_RESULTS
+most recent results, a user keeps their CHATBOT_SESSIONS_PER_USER most
+recently used sessions, and the store evicts least-recently-used sessions to
+stay under CHATBOT_SESSIONS_MAX_BYTES. Sizes are the JSON-encoded size of
+what a session holds plus SESSION_BASE_BYTES and the length of its name, so
+even empty sessions count against the budget.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+CHATBOT_SESSION_TTL_SECONDS = float(os.getenv("CHATBOT_SESSION_TTL_SECONDS", "1800"))
+CHATBOT_RESULT_MAX_AGE_SECONDS = float(os.getenv("CHATBOT_RESULT_MAX_AGE_SECONDS", "300"))
+CHATBOT_SESSION_RESULTS = int(os.getenv("CHATBOT_SESSION_RESULTS", "20"))
+CHATBOT_SESSIONS_MAX_BYTES = int(os.getenv("CHATBOT_SESSIONS_MAX_BYTES", str(16 * 1024 * 1024)))
+CHATBOT_SESSIONS_PER_USER = int(os.getenv("CHATBOT_SESSIONS_PER_USER", "20"))
+
+# Rough footprint of an empty session: the object, its key and containers
+SESSION_BASE_BYTES = 512
+
+DEFAULT_SESSION = "default"
+
+def size_of(value) -> int:
+    return len(json.dumps(value, default=str))
+
+class ChatSession:
+    """Entities and recent lookup results of one conversation."""
+
+    def __init__(self, user_id: int, name: str):
+        self.user_id = user_id
+        self.name = name
+        self.entities = {}
+        self.results = OrderedDict()
+        self.bytes = SESSION_BASE_BYTES + len(name)
+        self.turns = self.hits = self.misses = 0
+        self.created_at = self.last_used = time.time()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "user_id": self.user_id,
+            "context": self.name,
+            "entities": dict(self.entities),
+            "cached_results": len(self.results),
+            "bytes": self.bytes,
+            "turns": self.turns,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "created_at": self.created_at,
+            "last_used": self.last_used,
+        }
+
+class SessionStore:
+    """Chatbot sessions with idle expiry, LRU eviction and a byte budget."""
+
+    def __init__(self, ttl: float = CHATBOT_SESSION_TTL_SECONDS, max_bytes: int = CHATBOT_SESSIONS_MAX_BYTES,
+                 max_results: int = CHATBOT_SESSION_RESULTS, result_max_age: float = CHATBOT_RESULT_MAX_AGE_SECONDS,
+                 per_user: int = CHATBOT_SESSIONS_PER_USER):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_results = max_results
+        self.result_max_age = result_max_age
+        self.per_user = per_user
+        self.bytes = 0
+        self._sessions = OrderedDict()
+        self._user_sessions = {}
+        self._lock = threading.Lock()
+        self.created = self.expired = self.evictions = 0
+
+    def _drop(self, key):
+        session = self._sessions.pop(key)
+        self.bytes -= session.bytes
+        self._user_sessions[session.user_id] -= 1
+        if not self._user_sessions[session.user_id]:
+            del self._user_sessions[session.user_id]
+
+    def _start(self, key) -> ChatSession:
+        user_id = key[0]
+        if self._user_sessions.get(user_id, 0) >= self.per_user:
+            # The user's least recently used session makes room
+            self._drop(next(other for other in self._sessions if other[0] == user_id))
+            self.evictions += 1
+        session = self._sessions[key] = ChatSession(*key)
+        self._user_sessions[user_id] = self._user_sessions.get(user_id, 0) + 1
+        self.bytes += session.bytes
+        self.created += 1
+        self._evict(session)
+        return session
+
+    def _expire(self, now: float):
+        # Least recently used first, so stop at the first live session
+        while self._sessions:
+            key, session = next(iter(self._sessions.items()))
+            if now - session.last_used <= self.ttl:
+                break
+            self._drop(key)
+            self.expired += 1
+
+    def session(self, user_id: int, name: str = None) -> ChatSession:
+        """The user's session called ``name``, started if missing or expired; counts a turn."""
+        key = (user_id, name or DEFAULT_SESSION)
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._start(key)
+            self._sessions.move_to_end(key)
+            session.last_used = now
+            session.turns += 1
+            return session
+
+    def get(self, session: ChatSession, key):
+        """A result cached in the session, or None if missing or too old."""
+        with self._lock:
+            entry = session.results.get(key)
+            if entry is not None and time.time() - entry[0] <= self.result_max_age:
+                session.results.move_to_end(key)
+                session.hits += 1
+                return entry[1]
+            session.misses += 1
+            return None
+
+    def put(self, session: ChatSession, key, value):
+        """Cache a result in the session, evicting its oldest results and other sessions to fit."""
+        size = size_of(key) + size_of(value)
+        with self._lock:
+            previous = session.results.pop(key, None)
+            if previous is not None:
+                self._account(session, -previous[2])
+            session.results[key] = (time.time(), value, size)
+            self._account(session, size)
+            while len(session.results) > self.max_results:
+                _, (_, _, evicted) = session.results.popitem(last=False)
+                self._account(session, -evicted)
+            self._evict(session)
+
+    def remember(self, session: ChatSession, **entities):
+        """Record entities the conversation resolved."""
+        with self._lock:
+            self._account(session, -size_of(session.entities))
+            session.entities.update(entities)
+            self._account(session, size_of(session.entities))
+            self._evict(session)
+
+    def _account(self, session: ChatSession, delta: int):
+        session.bytes += delta
+        if (session.user_id, session.name) in self._sessions:
+            self.bytes += delta
+
+    def _evict(self, current: ChatSession):
+        # Other sessions first; the current one sheds its oldest results
+        for key in list(self._sessions):
+            if self.bytes <= self.max_bytes:
+                return
+            if self._sessions[key] is not current:
+                self._drop(key)
+                self.evictions += 1
+        while self.bytes > self.max_bytes and current.results:
+            _, (_, _, evicted) = current.results.popitem(last=False)
+            self._account(current, -evicted)
+
+    def clear(self, user_id: int, name: str = None) -> bool:
+        with self._lock:
+            key = (user_id, name or DEFAULT_SESSION)
+            if key not in self._sessions:
+                return False
+            self._drop(key)
+            return True
+
+    def sessions(self, user_id: int = None) -> list:
+        """Per-session stats, most recently used first; only ``user_id``'s if given."""
+        with self._lock:
+            self._expire(time.time())
+            return [
+                session.stats() for session in reversed(self._sessions.values())
+                if user_id is None or session.user_id == user_id
+            ]
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._expire(time.time())
+            hits = sum(session.hits for session in self._sessions.values())
+            misses = sum(session.misses for session in self._sessions.values())
+            return {
+                "sessions": len(self._sessions),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "sessions_per_user": self.per_user,
+                "ttl_seconds": self.ttl,
+                "created": self.created,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "hits": hits,
+                "misses": misses,
+                "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else None,
+            }
+
+store = SessionStore()
@@ -0,0 +1,141 @@
+"""Result cache for complaint list pages.
+
+``GET /api/complaints/`` pages are cached as serialized JSON, keyed by the
+caller's visibility scope, the filters and the page. Team members whose
+scope is just their team share entries, so a team polling the same list
+costs one query per page per change.
+
+Every entry records the cache generations its scope depends on: the
+``team:<id>`` generations of the teams it can show (``team:none`` for
+unassigned complaints) or the customer's ``customer:<id>`` generation, plus
+``calendars``. Complaint writes bump the generations of the old and new team
+and of the customer in their own transaction (``touch``), and a hit re-reads
+the generations in one primary-key lookup, so a page is never served after a
+change to what it shows, in any worker. Memory is bounded by
+COMPLAINT_CACHE_BYTES with least-recently-used eviction by size.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import List
+
+from pydantic import TypeAdapter
+from sqlalchemy import exists, select
+from sqlalchemy.orm import Session
+
+import cache
+import customer_summary
+import models
+import reference_data
+import schemas
+import sla_clock
+
+COMPLAINT_CACHE_BYTES = int(os.getenv("COMPLAINT_CACHE_BYTES", str(32 * 1024 * 1024)))
+# Larger pages are served uncached rather than evicting everything else
+MAX_ENTRY_FRACTION = 8
+
+_serializer = TypeAdapter(List[schemas.Complaint])
+
+def team_generation(team_id) -> str:
+    return f"team:{'none' if team_id is None else team_id}"
+
+def touch(db: Session, team_ids=(), customer_ids=()):
+    """Invalidate cached pages and summaries showing these teams' and customers' complaints on commit."""
+    cache.bump(db, *sorted({team_generation(team_id) for team_id in team_ids}))
+    customer_summary.touch(db, *customer_ids)
+
+def all_teams(db: Session) -> list:
+    return [team_generation(None)] + [team_generation(team_id) for team_id in reference_data.team_ids(db)]
+
+def scope_key(db: Session, user: models.User, assigned_to_me: bool = False) -> tuple:
+    """Canonical visibility scope of a user and the generations it depends on.
+
+    Mirrors ``role_scope_condition``: users who see the same complaints get
+    the same key.
+    """
+    role = user.role
+    if role == models.UserRole.CUSTOMER:
+        return ("customer", user.id), [customer_summary.generation_name(user.id)]
+    if role == models.UserRole.OPS_MEMBER:
+        if not assigned_to_me and user.team_id is not None:
+            # Assignment moves a complaint to the assignee's team, so the
+            # "or assigned to me" part normally adds nothing to the team
+            outside = db.execute(select(exists().where(
+                models.Complaint.assigned_to_id == user.id,
+                models.Complaint.assigned_team_id.is_distinct_from(user.team_id)
+            ))).scalar()
+            if not outside:
+                return ("team", user.team_id), [team_generation(user.team_id)]
+        return ("assignee", user.id, assigned_to_me), all_teams(db)
+    if role == models.UserRole.TEAM_LEAD:
+        return ("team", user.team_id), [team_generation(user.team_id)]
+    if role == models.UserRole.MANAGER:
+        team_ids = reference_data.managed_team_ids(db, user.id)
+        if team_ids:
+            return ("teams", tuple(sorted(team_ids))), [team_generation(team_id) for team_id in sorted(team_ids)]
+    return ("all",), all_teams(db)
+
+def generations(db: Session, names: list) -> tuple:
+    """Current generations of ``names`` (with the names), in one query."""
+    table = models.CacheGeneration.__table__
+    names = names + [sla_clock.CALENDARS]
+    current = dict(db.execute(select(table.c.name, table.c.generation).where(table.c.name.in_(names))).all())
+    return tuple((name, current.get(name, 0)) for name in names)
+
+def serialize(rows) -> bytes:
+    """Complaint rows (ORM objects or result rows) as a JSON list."""
+    return _serializer.dump_json(_serializer.validate_python(rows, from_attributes=True))
+
+class PageCache:
+    """LRU of serialized pages, bounded by total size in bytes."""
+
+    def __init__(self, max_bytes: int = COMPLAINT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.stale = self.evictions = 0
+
+    def get(self, key, token) -> bytes:
+        """Cached body for ``key`` if it was built at generations ``token``, else None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == token:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            if entry is not None:
+                self.stale += 1
+            return None
+
+    def put(self, key, token, body: bytes):
+        if len(body) > self.max_bytes // MAX_ENTRY_FRACTION:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= len(previous[1])
+            self._entries[key] = (token, body)
+            self.bytes += len(body)
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= len(evicted)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+pages = PageCache()
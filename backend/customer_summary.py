@@ -0,0 +1,171 @@
+"""Customer 360: one customer's profile, complaints, history and notes.
+
+A summary is assembled in a fixed number of queries, whatever the number of
+complaints, and cached per customer. Every write that changes what a summary
+shows bumps the customer's ``customer:<id>`` cache generation in the same
+transaction (``touch``); a cached summary is served only while that
+generation is unchanged, so it is never stale, even across workers, and a
+hit costs a single primary-key lookup. A calendar change re-times deadlines
+of many customers at once, so it clears the whole cache instead.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import Session
+
+import cache
+import models
+import sla_clock
+
+CUSTOMER_SUMMARY_CACHE_SIZE = int(os.getenv("CUSTOMER_SUMMARY_CACHE_SIZE", "1000"))
+RECENT_LIMIT = 20
+
+_summaries = OrderedDict()
+_lock = threading.Lock()
+
+def _clear():
+    with _lock:
+        _summaries.clear()
+
+cache.on_invalidate(sla_clock.CALENDARS, _clear)
+
+def generation_name(customer_id: int) -> str:
+    return f"customer:{customer_id}"
+
+def touch(db: Session, *customer_ids: int):
+    """Invalidate the summaries of these customers when the caller commits."""
+    cache.bump(db, *sorted({generation_name(customer_id) for customer_id in customer_ids if customer_id is not None}))
+
+def can_view(db: Session, user: models.User, customer_id: int) -> bool:
+    """Whether ``user`` may see a customer's summary.
+
+    Customers see their own, admins and managers any customer's, and other
+    staff only those of customers with a complaint (live or archived)
+    assigned to their team or to them.
+    """
+    if user.role == models.UserRole.CUSTOMER:
+        return user.id == customer_id
+    if user.role in (models.UserRole.ADMIN, models.UserRole.MANAGER):
+        return True
+    return any(
+        db.execute(
+            select(model.id).where(
+                model.customer_id == customer_id,
+                or_(model.assigned_team_id == user.team_id, model.assigned_to_id == user.id)
+            ).limit(1)
+        ).first() is not None
+        for model in (models.Complaint, models.ArchivedComplaint)
+    )
+
+def build_summary(db: Session, customer_id: int) -> Optional[dict]:
+    """Assemble a customer's summary, or None if there is no such customer."""
+    customer = db.query(models.User).filter(
+        models.User.id == customer_id, models.User.role == models.UserRole.CUSTOMER
+    ).first()
+    if customer is None:
+        return None
+
+    counts = {status.value: 0 for status in models.ComplaintStatus}
+    for model in (models.Complaint, models.ArchivedComplaint):
+        for complaint_status, count in db.execute(
+            select(model.status, func.count()).where(model.customer_id == customer_id).group_by(model.status)
+        ):
+            counts[complaint_status.value] += count
+
+    open_complaints = db.execute(
+        select(
+            models.Complaint.id, models.Complaint.complaint_number, models.Complaint.product,
+            models.Complaint.issue, models.Complaint.severity, models.Complaint.status,
+            models.Complaint.assigned_team_id, models.Complaint.assigned_to_id, models.Complaint.created_at,
+            models.Complaint.due_at
+        )
+        .where(models.Complaint.customer_id == customer_id, models.Complaint.status != models.ComplaintStatus.CLOSED)
+        .order_by(models.Complaint.due_at)
+    ).mappings().all()
+
+    history = db.execute(
+        select(
+            models.ComplaintHistory.complaint_id, models.ComplaintHistory.user_id, models.ComplaintHistory.action,
+            models.ComplaintHistory.old_value, models.ComplaintHistory.new_value, models.ComplaintHistory.notes,
+            models.ComplaintHistory.created_at
+        )
+        .join(models.Complaint, models.Complaint.id == models.ComplaintHistory.complaint_id)
+        .where(models.Complaint.customer_id == customer_id)
+        .order_by(models.ComplaintHistory.created_at.desc(), models.ComplaintHistory.id.desc())
+        .limit(RECENT_LIMIT)
+    ).mappings().all()
+
+    notes = db.execute(
+        select(
+            models.ComplaintNote.id, models.ComplaintNote.complaint_id, models.ComplaintNote.user_id,
+            models.ComplaintNote.note, models.ComplaintNote.is_internal, models.ComplaintNote.created_at
+        )
+        .join(models.Complaint, models.Complaint.id == models.ComplaintNote.complaint_id)
+        .where(models.Complaint.customer_id == customer_id)
+        .order_by(models.ComplaintNote.created_at.desc(), models.ComplaintNote.id.desc())
+        .limit(RECENT_LIMIT)
+    ).mappings().all()
+
+    return {
+        "profile": {
+            "id": customer.id,
+            "email": customer.email,
+            "full_name": customer.full_name,
+            "role": customer.role,
+            "is_active": customer.is_active,
+            "team_id": customer.team_id,
+            "created_at": customer.created_at,
+            "updated_at": customer.updated_at,
+        },
+        "complaint_counts": counts,
+        "open_complaints": [dict(row) for row in open_complaints],
+        "recent_history": [dict(row) for row in history],
+        "recent_notes": [dict(row) for row in notes],
+    }
+
+def get_summary(db: Session, customer_id: int, include_internal: bool = True) -> Optional[dict]:
+    """Cached summary with SLA time remaining computed for the current time."""
+    generation = cache.current(db, generation_name(customer_id))
+    with _lock:
+        cached = _summaries.get(customer_id)
+        if cached is not None and cached[0] == generation:
+            _summaries.move_to_end(customer_id)
+            summary = cached[1]
+        else:
+            summary = None
+
+    if summary is None:
+        summary = build_summary(db, customer_id)
+        if summary is None:
+            return None
+        with _lock:
+            _summaries[customer_id] = (generation, summary)
+            _summaries.move_to_end(customer_id)
+            while len(_summaries) > CUSTOMER_SUMMARY_CACHE_SIZE:
+                _summaries.popitem(last=False)
+
+    # Business hours left, for all open complaints in one vectorized call
+    timed = [complaint for complaint in summary["open_complaints"] if complaint["due_at"] is not None]
+    remaining = {}
+    if timed:
+        hours = sla_clock.get_calendars(db).hours_between_many(
+            datetime.utcnow(),
+            [complaint["due_at"] for complaint in timed],
+            [complaint["assigned_team_id"] for complaint in timed]
+        )
+        remaining = {complaint["id"]: round(float(left), 2) for complaint, left in zip(timed, hours)}
+    return {
+        **summary,
+        "open_complaints": [
+            {**complaint, "sla_remaining_hours": remaining.get(complaint["id"])}
+            for complaint in summary["open_complaints"]
+        ],
+        "recent_notes": [
+            note for note in summary["recent_notes"] if include_internal or not note["is_internal"]
+        ],
+    }
@@ -0,0 +1,58 @@
+"""Sparse fieldsets (``fields=``) for list endpoints.
+
+``fields=id,complaint_number,status`` limits both the columns a list
+endpoint loads and the JSON it returns to the named fields of its response
+schema. Each distinct field set gets a pydantic model with just those
+fields and a list serializer, built once and cached, so a request only pays
+for validating and encoding the columns it asked for.
+"""
+
+from functools import lru_cache
+from typing import List, Optional
+
+from fastapi import HTTPException, status
+from pydantic import ConfigDict, TypeAdapter, create_model
+from sqlalchemy.orm import load_only
+
+FIELDSET_CACHE_SIZE = 256
+
+def parse_fields(fields: Optional[str], schema) -> Optional[tuple]:
+    """Validate a ``fields`` parameter; returns the names in schema order, or None for all."""
+    if fields is None:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    if not requested:
+        return None
+    unknown = requested - schema.model_fields.keys()
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}; allowed: {', '.join(schema.model_fields)}"
+        )
+    return tuple(name for name in schema.model_fields if name in requested)
+
+@lru_cache(maxsize=FIELDSET_CACHE_SIZE)
+def serializer(schema, fields: tuple) -> TypeAdapter:
+    """List serializer for ``schema`` restricted to ``fields``."""
+    definitions = {
+        name: (field.annotation, field)
+        for name, field in schema.model_fields.items() if name in fields
+    }
+    model = create_model(
+        f"{schema.__name__}Fields", __config__=ConfigDict(from_attributes=True), **definitions
+    )
+    return TypeAdapter(List[model])
+
+def serialize(schema, fields: tuple, rows) -> bytes:
+    """JSON list of ``rows`` (ORM objects or result rows) with only ``fields``."""
+    adapter = serializer(schema, fields)
+    return adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+
+def columns(model, fields: tuple) -> list:
+    """Mapped attributes of ``model`` backing ``fields``."""
+    return [getattr(model, name) for name in fields if name in model.__table__.columns]
+
+def load_fields(model, fields: tuple):
+    """Loader option deferring every column of ``model`` outside ``fields``."""
+    attributes = columns(model, fields) or [getattr(model, column.name) for column in model.__table__.primary_key]
+    return load_only(*attributes, raiseload=True)
@@ -0,0 +1,27 @@
+"""Gunicorn settings for multi-worker serving.
+
+    gunicorn -c gunicorn.conf.py main:app
+
+Workers are pre-forked uvicorn workers. ``kill -HUP <master pid>`` reloads
+gracefully: new workers start and old ones finish their in-flight requests
+first. In-process caches are kept consistent across workers through the
+cache generation table (see cache.py).
+"""
+
+import multiprocessing
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Each worker must build its own engine and connection pool after the fork
+preload_app = False
+
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+keepalive = 5
+
+# Recycle workers periodically, staggered so they don't restart together
+max_requests = int(os.getenv("MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", "1000"))
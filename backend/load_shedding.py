@@ -0,0 +1,194 @@
+"""Adaptive concurrency limit and load shedding.
+
+Each worker admits at most ``limit`` requests at a time. The limit adapts
+with AIMD to the observed latency: it grows by about one per limit's worth
+of requests that finish within LOAD_SHED_LATENCY_TARGET_MS while the limit
+is in use, and shrinks by LOAD_SHED_BACKOFF (at most once per target
+interval) when they do not. When the database slows down, requests then
+wait here briefly instead of piling up inside the handlers, and the excess
+is shed with 503 + Retry-After.
+
+Requests are classed by priority. ``/health`` is always admitted, staff
+requests may use the whole limit and wait longest, and customer polling
+(GET requests with a customer token) only gets part of it, so customers are
+shed first. The class comes from the token's ``role`` claim, without a
+database lookup.
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from typing import Optional
+
+from jose import JWTError, jwt
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse
+
+from auth import SECRET_KEY, ALGORITHM
+import models
+
+LOAD_SHED_ENABLED = os.getenv("LOAD_SHED_ENABLED", "true").lower() == "true"
+LOAD_SHED_INITIAL_LIMIT = int(os.getenv("LOAD_SHED_INITIAL_LIMIT", "20"))
+LOAD_SHED_MIN_LIMIT = int(os.getenv("LOAD_SHED_MIN_LIMIT", "2"))
+LOAD_SHED_MAX_LIMIT = int(os.getenv("LOAD_SHED_MAX_LIMIT", "200"))
+LOAD_SHED_LATENCY_TARGET_MS = float(os.getenv("LOAD_SHED_LATENCY_TARGET_MS", "250"))
+LOAD_SHED_BACKOFF = float(os.getenv("LOAD_SHED_BACKOFF", "0.9"))
+LOAD_SHED_QUEUE_TIMEOUT_MS = float(os.getenv("LOAD_SHED_QUEUE_TIMEOUT_MS", "500"))
+
+CRITICAL = 0
+STAFF = 1
+DEFAULT = 2
+LOW = 3
+PRIORITY_NAMES = {CRITICAL: "critical", STAFF: "staff", DEFAULT: "default", LOW: "low"}
+
+# Share of the limit each class may fill, and how long (as a multiple of
+# LOAD_SHED_QUEUE_TIMEOUT_MS) it may wait for a slot
+ADMIT_FRACTION = {CRITICAL: math.inf, STAFF: 1.0, DEFAULT: 0.9, LOW: 0.75}
+QUEUE_TIMEOUT_FACTOR = {CRITICAL: 0, STAFF: 2.0, DEFAULT: 1.0, LOW: 0.25}
+
+CRITICAL_PATHS = {"/", "/health"}
+# Slow by design (password hashing); their latency says nothing about load
+LATENCY_EXEMPT_PATHS = {"/api/auth/login", "/api/auth/register"}
+STAFF_ROLES = {role.value for role in models.UserRole} - {models.UserRole.CUSTOMER.value}
+
+def request_priority(request) -> int:
+    """Priority class of a request from its path, method and token role claim."""
+    if request.url.path in CRITICAL_PATHS:
+        return CRITICAL
+    authorization = request.headers.get("Authorization", "")
+    if not authorization.lower().startswith("bearer "):
+        return DEFAULT
+    try:
+        role = jwt.decode(authorization[7:], SECRET_KEY, algorithms=[ALGORITHM]).get("role")
+    except JWTError:
+        return DEFAULT
+    if role in STAFF_ROLES:
+        return STAFF
+    if role == models.UserRole.CUSTOMER.value and request.method == "GET":
+        return LOW
+    return DEFAULT
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit with a priority-ordered wait queue.
+
+    Runs on the worker's event loop, so no locking is needed.
+    """
+
+    def __init__(self, initial: int = LOAD_SHED_INITIAL_LIMIT, minimum: int = LOAD_SHED_MIN_LIMIT,
+                 maximum: int = LOAD_SHED_MAX_LIMIT, target_ms: float = LOAD_SHED_LATENCY_TARGET_MS,
+                 backoff: float = LOAD_SHED_BACKOFF):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target = target_ms / 1000
+        self.backoff = backoff
+        self.in_flight = 0
+        self.latency_ewma = None
+        self._last_decrease = 0.0
+        self._waiters = []
+        self._sequence = itertools.count()
+        self.admitted = {name: 0 for name in PRIORITY_NAMES.values()}
+        self.shed = {name: 0 for name in PRIORITY_NAMES.values()}
+
+    def _fits(self, priority: int) -> bool:
+        return self.in_flight < self.limit * ADMIT_FRACTION[priority]
+
+    async def acquire(self, priority: int, timeout: float) -> bool:
+        """Take a slot, waiting up to ``timeout`` seconds; False means shed."""
+        name = PRIORITY_NAMES[priority]
+        # Queued requests go first unless this one outranks them all
+        if self._fits(priority) and (not self._waiters or priority < self._waiters[0][0]):
+            self.in_flight += 1
+            self.admitted[name] += 1
+            return True
+        if timeout > 0:
+            waiter = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._sequence), waiter))
+            try:
+                await asyncio.wait_for(waiter, timeout)
+                self.admitted[name] += 1
+                return True
+            except asyncio.TimeoutError:
+                self._wake()
+            except asyncio.CancelledError:
+                # Client went away; give back a slot handed over meanwhile
+                if waiter.done() and not waiter.cancelled():
+                    self.in_flight -= 1
+                    self._wake()
+                raise
+        self.shed[name] += 1
+        return False
+
+    def release(self, latency: Optional[float]):
+        """Free a slot and adapt the limit to the request's latency, if given."""
+        self.in_flight -= 1
+        if latency is None:
+            self._wake()
+            return
+        self.latency_ewma = latency if self.latency_ewma is None else 0.9 * self.latency_ewma + 0.1 * latency
+        now = time.monotonic()
+        if latency > self.target:
+            if now - self._last_decrease >= self.target:
+                self.limit = max(self.minimum, self.limit * self.backoff)
+                self._last_decrease = now
+        elif self.in_flight + 1 >= self.limit / 2:
+            # Only grow while the limit is actually being used
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        self._wake()
+
+    def _wake(self):
+        """Hand free slots to queued requests, highest priority first."""
+        while self._waiters:
+            priority, _, waiter = self._waiters[0]
+            if waiter.done():
+                heapq.heappop(self._waiters)
+                continue
+            if not self._fits(priority):
+                return
+            heapq.heappop(self._waiters)
+            self.in_flight += 1
+            waiter.set_result(True)
+
+    def retry_after(self) -> int:
+        """Seconds a shed client should wait: roughly the time to drain the queue."""
+        latency = self.latency_ewma or self.target
+        return max(1, math.ceil(latency * (len(self._waiters) + self.in_flight) / max(self.limit, 1)))
+
+    def stats(self) -> dict:
+        return {
+            "enabled": LOAD_SHED_ENABLED,
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queued": sum(1 for _, _, waiter in self._waiters if not waiter.done()),
+            "latency_ewma_ms": round(self.latency_ewma * 1000, 3) if self.latency_ewma is not None else None,
+            "admitted": dict(self.admitted),
+            "shed": dict(self.shed),
+        }
+
+limiter = AdaptiveLimiter()
+
+class LoadSheddingMiddleware(BaseHTTPMiddleware):
+    """Admit requests through the worker's ``limiter``; shed the rest with 503."""
+
+    async def dispatch(self, request, call_next):
+        if not LOAD_SHED_ENABLED:
+            return await call_next(request)
+
+        priority = request_priority(request)
+        timeout = LOAD_SHED_QUEUE_TIMEOUT_MS / 1000 * QUEUE_TIMEOUT_FACTOR[priority]
+        if not await limiter.acquire(priority, timeout):
+            return JSONResponse(
+                status_code=503,
+                content={"detail": "Server is overloaded, please retry later"},
+                headers={"Retry-After": str(limiter.retry_after())}
+            )
+
+        start = time.perf_counter()
+        try:
+            return await call_next(request)
+        finally:
+            exempt = request.url.path in LATENCY_EXEMPT_PATHS
+            limiter.release(None if exempt else time.perf_counter() - start)
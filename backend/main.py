@@ -1,20 +1,55 @@
+import time
+_import_started = time.perf_counter()
+
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer
 from sqlalchemy.orm import Session
-from database import engine, SessionLocal, Base
-from routers import auth, complaints, users, admin, chatbot
+from database import LAST_WRITE_HEADER, ReadYourWritesMiddleware, SessionLocal, replicas, sqlite_status
+from routers import auth, complaints, users, admin, chatbot, analytics, customers, catalog
+from profiling import ProfilingMiddleware
+from load_shedding import LoadSheddingMiddleware, limiter
+from startup import run_startup
 import models
+import notifications
+
+logger = logging.getLogger(__name__)
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Verify the schema and warm up before accepting traffic.
+    
+    Tables are created and migrated by scripts/init_db.py, not here.
+    """
+    timings = run_startup()
+    timings["cold_start_ms"] = round((time.perf_counter() - _import_started) * 1000, 3)
+    app.state.startup_timings = timings
+    logger.info("Cold start took %.1f ms (%s)", timings["cold_start_ms"], timings)
+    notifications.start()
+    yield
+    await notifications.stop()
 
 app = FastAPI(
     title="Complaint Management System API",
     description="API for managing complaints in banking/financial domain",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Middleware added last runs first: CORS wraps everything so that even shed
+# (503) responses carry the CORS headers the browser needs to read them
+
+# Tells clients when they last wrote, so their reads can avoid lagging replicas
+app.add_middleware(ReadYourWritesMiddleware)
+
+# On-demand request profiling (admin X-Profile header or PROFILE_SAMPLE_RATE)
+app.add_middleware(ProfilingMiddleware)
+
+# Adaptive concurrency limit; outside everything but CORS so shed requests cost almost nothing
+app.add_middleware(LoadSheddingMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -22,6 +57,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[LAST_WRITE_HEADER, "Retry-After"],
 )
 
 security = HTTPBearer()
@@ -40,6 +76,9 @@ app.include_router(complaints.router, prefix="/api/complaints", tags=["Complaint
 app.include_router(users.router, prefix="/api/users", tags=["Users"])
 app.include_router(admin.router, prefix="/api/admin", tags=["Admin"])
 app.include_router(chatbot.router, prefix="/api/chatbot", tags=["Chatbot"])
+app.include_router(analytics.router, prefix="/api/analytics", tags=["Analytics"])
+app.include_router(customers.router, prefix="/api/customers", tags=["Customers"])
+app.include_router(catalog.router, prefix="/api/catalog", tags=["Catalog"])
 
 @app.get("/")
 async def root():
@@ -47,8 +86,19 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "startup": getattr(app.state, "startup_timings", None),
+        "replicas": replicas.status(),
+        "sqlite": sqlite_status(),
+        "load": limiter.stats()
+    }
 
 if __name__ == "__main__":
+    import os
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    logging.basicConfig(level=logging.INFO)
+    # Each worker is a separate process with its own caches; see cache.py.
+    # For graceful reloads (SIGHUP) run under gunicorn: gunicorn -c gunicorn.conf.py main:app
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    uvicorn.run("main:app" if workers > 1 else app, host="0.0.0.0", port=8000, workers=workers)
\ No newline at end of file
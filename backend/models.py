@@ -1,11 +1,15 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Enum, Float
+from sqlalchemy import event, Column, Integer, BigInteger, String, Text, Date, DateTime, Boolean, ForeignKey, Enum, Float, Index, LargeBinary, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import object_session, relationship
 from datetime import datetime
 import enum
 
 Base = declarative_base()
 
+# Bump when the schema changes; scripts/init_db.py applies the migration and
+# stamps the new version, the API refuses to start against any other version.
+SCHEMA_VERSION = 13
+
 class UserRole(str, enum.Enum):
     CUSTOMER = "customer"
     OPS_MEMBER = "ops_member"
@@ -38,9 +42,9 @@ class User(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    team = relationship("Team", back_populates="members")
-    assigned_complaints = relationship("Complaint", back_populates="assigned_to")
-    created_complaints = relationship("Complaint", back_populates="customer")
+    team = relationship("Team", foreign_keys=[team_id], back_populates="members")
+    assigned_complaints = relationship("Complaint", foreign_keys="Complaint.assigned_to_id", back_populates="assigned_to")
+    created_complaints = relationship("Complaint", foreign_keys="Complaint.customer_id", back_populates="customer")
 
 class Team(Base):
     __tablename__ = "teams"
@@ -53,9 +57,33 @@ class Team(Base):
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     
-    members = relationship("User", back_populates="team")
+    members = relationship("User", foreign_keys="User.team_id", back_populates="team")
     complaints = relationship("Complaint", back_populates="assigned_team")
 
+class TeamCalendar(Base):
+    """Working days and hours of a team; teams without one use the default."""
+    __tablename__ = "team_calendars"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    team_id = Column(Integer, ForeignKey("teams.id"), unique=True, nullable=False)
+    # Monday..Sunday, "1" for a working day
+    weekmask = Column(String(7), nullable=False, default="1111100")
+    day_start = Column(String(5), nullable=False, default="09:00")
+    day_end = Column(String(5), nullable=False, default="17:00")
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class Holiday(Base):
+    """A non-working day for one team, or for every team when team_id is NULL."""
+    __tablename__ = "holidays"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    date = Column(Date, nullable=False, index=True)
+    name = Column(String(255), nullable=False)
+    team_id = Column(Integer, ForeignKey("teams.id"))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (UniqueConstraint("date", "team_id", name="uq_holidays_date_team"),)
+
 class Complaint(Base):
     __tablename__ = "complaints"
     
@@ -76,10 +104,35 @@ class Complaint(Base):
     sla_hours = Column(Integer, default=24)
     sla_breach = Column(Boolean, default=False)
     resolution_time = Column(DateTime)
+    # created_at + sla_hours business hours of the assigned team's calendar
+    # (see sla_clock.py); orders the agent work queue (see /complaints/next)
+    due_at = Column(DateTime)
+    
+    # Optimistic concurrency: every ORM flush runs UPDATE ... WHERE version = ?
+    # and bumps it; set-based UPDATEs must bump it explicitly
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # Commit time (microseconds) of the last transaction that changed the
+    # complaint, for the delta feed (see changes.py); set-based UPDATEs must
+    # set it explicitly
+    change_seq = Column(BigInteger, nullable=False, default=0, server_default="0")
     
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __mapper_args__ = {"version_id_col": version}
+    # Archival scans for old closed complaints (see archive.py)
+    __table_args__ = (
+        Index("ix_complaints_status_resolution", "status", "resolution_time"),
+        # Unassigned complaints of a team in due order (see queue_candidates);
+        # status lets the queue skip closed complaints within the index
+        Index("ix_complaints_queue", "assigned_team_id", "assigned_to_id", "due_at", "id", "status"),
+        # Per-assignee workload (see /users/teams/{id}/workload); covers
+        # every column the aggregate reads
+        Index("ix_complaints_assignee_status", "assigned_to_id", "status", "created_at", "due_at", "sla_breach"),
+        # Delta feed pages (see /complaints/changes)
+        Index("ix_complaints_change_seq", "change_seq", "id"),
+    )
+    
     customer = relationship("User", foreign_keys=[customer_id], back_populates="created_complaints")
     assigned_team = relationship("Team", back_populates="complaints")
     assigned_to = relationship("User", foreign_keys=[assigned_to_id], back_populates="assigned_complaints")
@@ -87,6 +140,22 @@ class Complaint(Base):
     attachments = relationship("ComplaintAttachment", back_populates="complaint")
     history = relationship("ComplaintHistory", back_populates="complaint")
 
+@event.listens_for(Complaint, "before_insert")
+def _set_due_at(mapper, connection, complaint):
+    # Imported here: sla_clock loads calendars through the models below
+    import sla_clock
+    if complaint.created_at is None:
+        complaint.created_at = datetime.utcnow()
+    if complaint.due_at is None:
+        complaint.due_at = sla_clock.due_at(
+            connection, complaint.created_at, complaint.sla_hours, complaint.assigned_team_id
+        )
+    _stamp_change(mapper, connection, complaint)
+
+@event.listens_for(Complaint, "before_update")
+def _stamp_change(mapper, connection, complaint):
+    complaint.change_seq = changes.transaction_seq(object_session(complaint))
+
 class ComplaintNote(Base):
     __tablename__ = "complaint_notes"
     
@@ -140,4 +209,154 @@ class SLAMatrix(Base):
     sla_hours = Column(Integer, nullable=False)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
\ No newline at end of file
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class SchemaVersion(Base):
+    __tablename__ = "schema_version"
+    
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False)
+    applied_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class CacheGeneration(Base):
+    __tablename__ = "cache_generations"
+    
+    name = Column(String(100), primary_key=True)
+    generation = Column(BigInteger, nullable=False, default=0)
+
+class ComplaintRollup(Base):
+    __tablename__ = "complaint_rollups"
+    __table_args__ = (
+        Index("ix_complaint_rollups_lookup", "granularity", "dimension", "team_id", "bucket_start"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    granularity = Column(String(10), nullable=False)
+    bucket_start = Column(Date, nullable=False)
+    dimension = Column(String(20), nullable=False)
+    dimension_value = Column(String(100), nullable=False)
+    team_id = Column(Integer)  # None = all teams, 0 = unassigned
+    complaints = Column(Integer, nullable=False)
+    closed = Column(Integer, nullable=False)
+    breached = Column(Integer, nullable=False)
+    mean_resolution_hours = Column(Float)
+    median_resolution_hours = Column(Float)
+    refreshed_at = Column(DateTime, nullable=False)
+
+class ResolutionSketch(Base):
+    __tablename__ = "resolution_sketches"
+    __table_args__ = (
+        UniqueConstraint("team_id", "product", "severity", "month", name="uq_resolution_sketches_key"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    team_id = Column(Integer, nullable=False, default=0)  # 0 = unassigned
+    product = Column(String(100), nullable=False)
+    severity = Column(Enum(ComplaintSeverity), nullable=False)
+    month = Column(String(7), nullable=False)  # YYYY-MM of resolution
+    count = Column(Integer, nullable=False)
+    sketch = Column(LargeBinary, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+# Complaints that left the working table (archived), so the delta feed can
+# report them (see changes.py)
+class ComplaintTombstone(Base):
+    __tablename__ = "complaint_tombstones"
+    __table_args__ = (
+        Index("ix_complaint_tombstones_change_seq", "change_seq", "complaint_id"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    complaint_id = Column(Integer, nullable=False)
+    complaint_number = Column(String(50), nullable=False)
+    # Ownership at removal, for role scoping
+    customer_id = Column(Integer, nullable=False)
+    assigned_team_id = Column(Integer)
+    assigned_to_id = Column(Integer)
+    reason = Column(String(20), nullable=False)
+    change_seq = Column(BigInteger, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+# Archive tables: closed complaints older than ARCHIVE_AFTER_DAYS are moved
+# here with their notes, attachments and history (see archive.py). Column
+# names match the live tables; there are no foreign keys back to them.
+class ArchivedComplaint(Base):
+    __tablename__ = "complaints_archive"
+    
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    complaint_number = Column(String(50), unique=True, nullable=False)
+    product = Column(String(100), nullable=False)
+    subproduct = Column(String(100))
+    issue = Column(String(100), nullable=False)
+    subissue = Column(String(100))
+    description = Column(Text, nullable=False)
+    severity = Column(Enum(ComplaintSeverity), nullable=False)
+    status = Column(Enum(ComplaintStatus), nullable=False)
+    customer_id = Column(Integer, nullable=False, index=True)
+    assigned_team_id = Column(Integer, index=True)
+    assigned_to_id = Column(Integer, index=True)
+    sla_hours = Column(Integer)
+    sla_breach = Column(Boolean)
+    resolution_time = Column(DateTime)
+    due_at = Column(DateTime)
+    version = Column(Integer, nullable=False)
+    created_at = Column(DateTime, index=True)
+    updated_at = Column(DateTime)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+class ArchivedComplaintNote(Base):
+    __tablename__ = "complaint_notes_archive"
+    
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    complaint_id = Column(Integer, nullable=False, index=True)
+    user_id = Column(Integer, nullable=False)
+    note = Column(Text, nullable=False)
+    is_internal = Column(Boolean)
+    created_at = Column(DateTime)
+
+class ArchivedComplaintAttachment(Base):
+    __tablename__ = "complaint_attachments_archive"
+    
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    complaint_id = Column(Integer, nullable=False, index=True)
+    filename = Column(String(255), nullable=False)
+    file_path = Column(String(500), nullable=False)
+    file_size = Column(Integer)
+    mime_type = Column(String(100))
+    created_at = Column(DateTime)
+
+class ArchivedComplaintHistory(Base):
+    __tablename__ = "complaint_history_archive"
+    
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    complaint_id = Column(Integer, nullable=False, index=True)
+    user_id = Column(Integer, nullable=False)
+    action = Column(String(100), nullable=False)
+    old_value = Column(String(255))
+    new_value = Column(String(255))
+    notes = Column(Text)
+    created_at = Column(DateTime)
+
+class OutboxMessage(Base):
+    """Notification written with the change that caused it (see notifications.py)."""
+    __tablename__ = "notification_outbox"
+    
+    id = Column(Integer, primary_key=True)
+    channel = Column(String(20), nullable=False)
+    dedup_key = Column(String(255), unique=True, nullable=False)
+    recipient = Column(String(255), nullable=False)
+    subject = Column(String(255), nullable=False)
+    body = Column(Text, nullable=False)
+    status = Column(String(20), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    claim_token = Column(String(36), index=True)
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime)
+    
+    __table_args__ = (Index("ix_notification_outbox_due", "status", "next_attempt_at"),)
+
+# Registers the commit hook that stamps change_seq (see changes.py) before any
+# session can flush a complaint; imported last because it uses these models
+import changes
@@ -0,0 +1,290 @@
+"""Transactional outbox and asynchronous notification dispatcher.
+
+Write paths call ``enqueue`` in the same transaction as the complaint change,
+so a notification exists exactly when the change commits and delivery never
+adds latency to the request. An asyncio dispatcher in each worker claims due
+messages in batches, delivers them through the channel's backend under a
+per-channel concurrency limit, and reschedules failures with exponential
+backoff until NOTIFY_MAX_ATTEMPTS.
+
+Claims are leases (``claim_token`` plus ``next_attempt_at``), so every worker
+can run a dispatcher over the same outbox; a worker dying mid-send only
+delays its batch by NOTIFY_LEASE_SECONDS. Delivery is at-least-once: each
+event has a unique dedup key, which also becomes the e-mail Message-ID so
+receivers can drop repeats.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import random
+import smtplib
+import uuid
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+import models
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_POLL_INTERVAL = float(os.getenv("NOTIFY_POLL_INTERVAL", "2"))
+NOTIFY_BATCH_SIZE = int(os.getenv("NOTIFY_BATCH_SIZE", "50"))
+NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "8"))
+NOTIFY_BACKOFF_SECONDS = float(os.getenv("NOTIFY_BACKOFF_SECONDS", "30"))
+NOTIFY_BACKOFF_MAX_SECONDS = float(os.getenv("NOTIFY_BACKOFF_MAX_SECONDS", "3600"))
+NOTIFY_LEASE_SECONDS = int(os.getenv("NOTIFY_LEASE_SECONDS", "300"))
+NOTIFY_EMAIL_CONCURRENCY = int(os.getenv("NOTIFY_EMAIL_CONCURRENCY", "4"))
+
+# E-mail delivery is disabled (and nothing is queued) unless SMTP_HOST is set
+SMTP_HOST = os.getenv("SMTP_HOST", "")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "25"))
+SMTP_USERNAME = os.getenv("SMTP_USERNAME", "")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "false").lower() == "true"
+SMTP_FROM = os.getenv("SMTP_FROM", "complaints@localhost")
+
+EMAIL = "email"
+PENDING = "pending"
+SENT = "sent"
+FAILED = "failed"
+
+TEMPLATES = {
+    "created": (
+        "Complaint {number} received",
+        "Your complaint {number} about {product} has been registered. We will keep you updated on its progress."
+    ),
+    "assigned": (
+        "Complaint {number} assigned to you",
+        "Complaint {number} about {product} has been assigned to you."
+    ),
+    "closed": (
+        "Complaint {number} closed",
+        "Your complaint {number} about {product} has been resolved and closed."
+    ),
+}
+
+_task = None
+
+def complaint_message(event: str, complaint, recipient: str) -> dict:
+    """Build an e-mail outbox message for a complaint event.
+
+    ``complaint`` needs id, complaint_number, product and the version the
+    event applies to; the version makes the dedup key unique per transition.
+    """
+    subject, body = TEMPLATES[event]
+    fields = {"number": complaint.complaint_number, "product": complaint.product}
+    return {
+        "channel": EMAIL,
+        "dedup_key": f"complaint:{complaint.id}:{event}:{complaint.version}:{recipient}",
+        "recipient": recipient,
+        "subject": subject.format(**fields),
+        "body": body.format(**fields),
+    }
+
+def enqueue(db: Session, messages: list):
+    """Add messages to the outbox in the caller's transaction.
+
+    Messages whose dedup key is already queued are skipped, and so are
+    messages for channels without a backend: nothing would ever send them.
+    """
+    table = models.OutboxMessage.__table__
+    channels = enabled_channels()
+    messages = list({
+        message["dedup_key"]: message for message in messages if message["channel"] in channels
+    }.values())
+    if not messages:
+        return
+    queued = set(db.execute(
+        select(table.c.dedup_key).where(table.c.dedup_key.in_([m["dedup_key"] for m in messages]))
+    ).scalars())
+    messages = [message for message in messages if message["dedup_key"] not in queued]
+    if not messages:
+        return
+    try:
+        with db.begin_nested():
+            db.execute(insert(table), messages)
+    except IntegrityError:
+        # Queued concurrently; retry one by one to keep the rest
+        for message in messages:
+            try:
+                with db.begin_nested():
+                    db.execute(insert(table).values(**message))
+            except IntegrityError:
+                pass
+
+class SMTPBackend:
+    """Deliver e-mail messages through an SMTP server."""
+
+    def __init__(self, host: str, port: int = 25, sender: str = SMTP_FROM, username: str = "",
+                 password: str = "", starttls: bool = False, timeout: float = 10):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+
+    def build(self, message) -> EmailMessage:
+        email = EmailMessage()
+        email["From"] = self.sender
+        email["To"] = message.recipient
+        email["Subject"] = message.subject
+        domain = self.sender.rpartition("@")[2] or "localhost"
+        email["Message-ID"] = f"<{hashlib.sha1(message.dedup_key.encode()).hexdigest()}@{domain}>"
+        email.set_content(message.body)
+        return email
+
+    def send(self, message):
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.starttls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+            smtp.send_message(self.build(message))
+
+def enabled_channels() -> set:
+    """Channels the environment configures a backend for."""
+    return {EMAIL} if SMTP_HOST else set()
+
+def configured_backends() -> dict:
+    """Channel backends enabled by the environment."""
+    backends = {}
+    if SMTP_HOST:
+        backends[EMAIL] = SMTPBackend(
+            SMTP_HOST, SMTP_PORT, SMTP_FROM, SMTP_USERNAME, SMTP_PASSWORD, SMTP_STARTTLS
+        )
+    return backends
+
+def backoff_seconds(attempts: int) -> float:
+    """Exponential backoff with jitter after ``attempts`` failed deliveries."""
+    delay = min(NOTIFY_BACKOFF_MAX_SECONDS, NOTIFY_BACKOFF_SECONDS * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+def claim_batch(db: Session, channels, limit: int = NOTIFY_BATCH_SIZE) -> list:
+    """Lease up to ``limit`` due messages of ``channels`` to this dispatcher."""
+    table = models.OutboxMessage.__table__
+    now = datetime.utcnow()
+    due = (
+        (table.c.status == PENDING) & (table.c.next_attempt_at <= now) & table.c.channel.in_(list(channels))
+    )
+    ids = db.execute(select(table.c.id).where(due).order_by(table.c.next_attempt_at).limit(limit)).scalars().all()
+    if not ids:
+        db.rollback()
+        return []
+    token = str(uuid.uuid4())
+    # Compare-and-set: rows another dispatcher leased meanwhile no longer match ``due``
+    db.execute(
+        update(table).where(table.c.id.in_(ids), due)
+        .values(claim_token=token, next_attempt_at=now + timedelta(seconds=NOTIFY_LEASE_SECONDS))
+    )
+    db.commit()
+    return db.execute(select(table).where(table.c.claim_token == token)).all()
+
+def record_results(db: Session, results: list):
+    """Mark delivered messages sent and reschedule or fail the rest.
+
+    Only rows still leased to the batch's claim token change: a message whose
+    lease expired mid-send may have been claimed by another dispatcher.
+    """
+    table = models.OutboxMessage.__table__
+    now = datetime.utcnow()
+    sent = {}
+    for message, error in results:
+        if error is None:
+            sent.setdefault(message.claim_token, []).append(message.id)
+    for token, ids in sent.items():
+        db.execute(
+            update(table).where(table.c.id.in_(ids), table.c.claim_token == token)
+            .values(status=SENT, sent_at=now, attempts=table.c.attempts + 1, claim_token=None, last_error=None)
+        )
+    for message, error in results:
+        if error is None:
+            continue
+        attempts = message.attempts + 1
+        values = {"attempts": attempts, "claim_token": None, "last_error": error[:1000]}
+        if attempts >= NOTIFY_MAX_ATTEMPTS:
+            values["status"] = FAILED
+            logger.warning("Giving up on notification %s after %d attempts: %s", message.dedup_key, attempts, error)
+        else:
+            values["next_attempt_at"] = now + timedelta(seconds=backoff_seconds(attempts))
+        db.execute(
+            update(table).where(table.c.id == message.id, table.c.claim_token == message.claim_token).values(**values)
+        )
+    db.commit()
+
+def _in_session(fn, *args):
+    db = SessionLocal()
+    try:
+        return fn(db, *args)
+    finally:
+        db.close()
+
+class Dispatcher:
+    """Drain the outbox on the event loop; blocking work runs in threads."""
+
+    def __init__(self, backends: dict, concurrency: dict = None):
+        self.backends = backends
+        concurrency = concurrency or {EMAIL: NOTIFY_EMAIL_CONCURRENCY}
+        self.semaphores = {channel: asyncio.Semaphore(concurrency.get(channel, 1)) for channel in backends}
+
+    async def _deliver(self, message):
+        async with self.semaphores[message.channel]:
+            try:
+                await asyncio.to_thread(self.backends[message.channel].send, message)
+                return message, None
+            except Exception as e:
+                return message, f"{type(e).__name__}: {e}"
+
+    async def drain_once(self) -> int:
+        """Deliver one batch; returns its size."""
+        batch = await asyncio.to_thread(_in_session, claim_batch, list(self.backends))
+        if batch:
+            results = await asyncio.gather(*(self._deliver(message) for message in batch))
+            await asyncio.to_thread(_in_session, record_results, results)
+        return len(batch)
+
+    async def run(self):
+        while True:
+            try:
+                delivered = await self.drain_once()
+            except Exception:
+                logger.exception("Notification dispatch failed")
+                delivered = 0
+            if delivered < NOTIFY_BATCH_SIZE:
+                await asyncio.sleep(NOTIFY_POLL_INTERVAL)
+
+def outbox_stats(db: Session) -> dict:
+    """Message counts per status."""
+    table = models.OutboxMessage.__table__
+    counts = dict(db.execute(select(table.c.status, func.count()).group_by(table.c.status)).all())
+    return {
+        "pending": counts.get(PENDING, 0),
+        "sent": counts.get(SENT, 0),
+        "failed": counts.get(FAILED, 0),
+        "channels": sorted(configured_backends()),
+    }
+
+def start():
+    """Start the dispatcher on the running event loop, if any backend is configured."""
+    global _task
+    backends = configured_backends()
+    if _task is None and backends:
+        _task = asyncio.get_running_loop().create_task(Dispatcher(backends).run())
+
+async def stop():
+    """Cancel the dispatcher; undelivered leases expire and are retried."""
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
@@ -0,0 +1,194 @@
+"""On-demand sampling profiler for individual requests.
+
+A request is profiled when an admin sends the ``X-Profile: 1`` header (or the
+``__profile=1`` query flag), or when it is picked by the random
+``PROFILE_SAMPLE_RATE``. While the request runs, a background thread samples
+the stacks of the event loop thread and of the busy threadpool threads that
+run sync endpoints every ``PROFILE_INTERVAL_MS`` milliseconds.
+The samples are stored in "folded stacks" format, one ``frame;frame;frame count``
+line per unique stack, which flamegraph.pl, speedscope and inferno read directly.
+
+Profiles are kept in a ring buffer per worker process and tagged with its
+pid; with several workers, ``/api/admin/profiles`` lists only the profiles of
+the worker that serves it.
+"""
+
+import asyncio
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from auth import check_permission, verify_token
+from database import SessionLocal
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_QUERY_PARAM = "__profile"
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_BUFFER_SIZE = int(os.getenv("PROFILE_BUFFER_SIZE", "50"))
+
+# Sync (def) endpoints and dependencies run in these threadpool threads
+WORKER_THREAD_NAME = "AnyIO worker thread"
+
+# Ring buffer of finished profiles, oldest evicted first
+_profiles = deque(maxlen=PROFILE_BUFFER_SIZE)
+_profiles_lock = threading.Lock()
+
+def _fold_stack(frame) -> str:
+    """Render a frame chain root-first as a folded stack line."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    names.reverse()
+    return ";".join(names)
+
+def _waiting_for_work(frame) -> bool:
+    """Whether a threadpool thread is idle, blocked on its work queue."""
+    while frame is not None:
+        if frame.f_code.co_name == "get" and frame.f_code.co_filename == queue.__file__:
+            return True
+        frame = frame.f_back
+    return False
+
+class SamplingProfiler:
+    """Periodically sample the event loop thread and busy threadpool threads.
+
+    Stacks are rooted at "event loop" or "threadpool" to tell them apart.
+    """
+
+    def __init__(self, thread_id: int, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.thread_id = thread_id
+        self.interval = interval_ms / 1000.0
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            sampled = False
+            for thread in threading.enumerate():
+                if thread.ident == self.thread_id:
+                    root = "event loop"
+                elif thread.name == WORKER_THREAD_NAME:
+                    root = "threadpool"
+                else:
+                    continue
+                frame = frames.get(thread.ident)
+                if frame is None or (root == "threadpool" and _waiting_for_work(frame)):
+                    continue
+                self.stacks[f"{root};{_fold_stack(frame)}"] += 1
+                sampled = True
+            self.samples += sampled
+            del frames, frame
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self) -> str:
+        """Return samples in folded stacks format."""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+def _is_admin_token(authorization: Optional[str]) -> bool:
+    """Check that the bearer token belongs to an admin, as the admin endpoints do.
+
+    Looks the user up, so a demoted admin's token no longer qualifies; only
+    called for flagged requests, in a thread.
+    """
+    if not authorization or not authorization.lower().startswith("bearer "):
+        return False
+    db = SessionLocal()
+    try:
+        user = verify_token(HTTPAuthorizationCredentials(scheme="Bearer", credentials=authorization[7:]), db)
+        check_permission(user, ["admin"])
+        return True
+    except HTTPException:
+        return False
+    finally:
+        db.close()
+
+async def _requested_trigger(request) -> Optional[str]:
+    """Return why this request should be profiled, or None."""
+    flag = request.headers.get(PROFILE_HEADER) or request.query_params.get(PROFILE_QUERY_PARAM)
+    if flag in ("1", "true", "yes") and await asyncio.to_thread(_is_admin_token, request.headers.get("Authorization")):
+        return "requested"
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return "sampled"
+    return None
+
+def list_profiles() -> list:
+    """Return stored profile metadata, newest first."""
+    with _profiles_lock:
+        return [
+            {key: value for key, value in profile.items() if key != "folded"}
+            for profile in reversed(_profiles)
+        ]
+
+def get_profile(profile_id: str) -> Optional[dict]:
+    """Return a stored profile including its folded stacks."""
+    with _profiles_lock:
+        for profile in _profiles:
+            if profile["id"] == profile_id:
+                return profile
+    return None
+
+class ProfilingMiddleware(BaseHTTPMiddleware):
+    """Profile opted-in or randomly sampled requests.
+
+    Endpoints are sync, so ``verify_token`` and the ORM work run in a
+    threadpool thread and response serialization on the event loop; the
+    profiler samples both. Other requests running at the same time show up
+    in the same profile; profile under low concurrency for a clean picture.
+    """
+
+    async def dispatch(self, request, call_next):
+        trigger = await _requested_trigger(request)
+        if trigger is None:
+            return await call_next(request)
+
+        profiler = SamplingProfiler(threading.get_ident())
+        started_at = datetime.utcnow()
+        start = time.perf_counter()
+        profiler.start()
+        try:
+            response = await call_next(request)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            # Joining the sampler waits for its current sample; keep that off the loop
+            await asyncio.to_thread(profiler.stop)
+
+        profile_id = uuid.uuid4().hex[:12]
+        with _profiles_lock:
+            _profiles.append({
+                "id": profile_id,
+                "pid": os.getpid(),
+                "method": request.method,
+                "path": request.url.path,
+                "status_code": response.status_code,
+                "trigger": trigger,
+                "started_at": started_at.isoformat(),
+                "duration_ms": round(duration_ms, 3),
+                "interval_ms": PROFILE_INTERVAL_MS,
+                "samples": profiler.samples,
+                "folded": profiler.folded(),
+            })
+        response.headers["X-Profile-Id"] = profile_id
+        return response
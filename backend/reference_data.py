@@ -0,0 +1,190 @@
+"""In-process cache of hot reference data (SLA rules and teams).
+
+Loaded during startup and reloaded lazily after the admin endpoints that
+change it bump the ``sla_rules`` or ``teams`` cache generation, so
+per-request code such as ``calculate_sla`` and manager scoping can skip a
+database round trip. The intake taxonomy is derived from the SLA rules and
+rebuilt with them.
+
+Lazy reloads read through a new primary session rather than the caller's:
+a replica that is behind, or a transaction that began before the change,
+would return the old data, and the cache would keep it until the next change.
+"""
+
+import hashlib
+import json
+import threading
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+import cache
+from database import SessionLocal
+import models
+
+SLA_RULES = "sla_rules"
+TEAMS = "teams"
+
+# SLA hours when no rule matches a complaint
+DEFAULT_SLA_HOURS = {"critical": 4, "high": 12, "medium": 24, "low": 48}
+
+_lock = threading.Lock()
+_sla_hours = None
+_teams = None
+_taxonomy = None
+# Invalidations so far. A load notes the count before reading and installs
+# its result only if no invalidation arrived meanwhile, since what it read
+# may predate the change that was invalidated.
+_generations = {SLA_RULES: 0, TEAMS: 0}
+
+def load_sla_rules(db: Session) -> dict:
+    """(Re)load active SLA rules keyed by (product, issue, severity)."""
+    global _sla_hours
+    generation = _generations[SLA_RULES]
+    rules = {}
+    # Ordered by id so the first matching rule wins, as with .first()
+    for rule in db.query(models.SLAMatrix).filter(models.SLAMatrix.is_active == True).order_by(models.SLAMatrix.id):
+        rules.setdefault((rule.product, rule.issue, rule.severity.value), rule.sla_hours)
+    with _lock:
+        if _generations[SLA_RULES] == generation:
+            _sla_hours = rules
+    return rules
+
+def load_teams(db: Session) -> dict:
+    """(Re)load team snapshots keyed by id."""
+    global _teams
+    generation = _generations[TEAMS]
+    teams = {
+        team.id: {
+            "id": team.id,
+            "name": team.name,
+            "manager_id": team.manager_id,
+            "team_lead_id": team.team_lead_id,
+            "is_active": team.is_active,
+        }
+        for team in db.query(models.Team)
+    }
+    with _lock:
+        if _generations[TEAMS] == generation:
+            _teams = teams
+    return teams
+
+def load_all(db: Session) -> dict:
+    """Load all reference data and return entry counts."""
+    return {SLA_RULES: len(load_sla_rules(db)), TEAMS: len(load_teams(db))}
+
+def load_taxonomy(db: Session) -> dict:
+    """(Re)build the product > subproduct > issue > subissue tree of active SLA rules.
+
+    Every leaf carries the SLA hours a new complaint would get for each
+    severity. The version is a hash of the content, so it is the same in
+    every worker.
+    """
+    global _taxonomy
+    generation = _generations[SLA_RULES]
+    rules = db.query(
+        models.SLAMatrix.product, models.SLAMatrix.subproduct, models.SLAMatrix.issue, models.SLAMatrix.subissue
+    ).filter(models.SLAMatrix.is_active == True).distinct().all()
+    
+    tree = {}
+    for product, subproduct, issue, subissue in rules:
+        tree.setdefault(product, {}).setdefault(subproduct, {}).setdefault(issue, set()).add(subissue)
+    
+    def sla_hours(product, issue, severity):
+        # A configured 0-hour SLA is a match, not a fallback to the default
+        hours = get_sla_hours(db, product, issue, severity)
+        return DEFAULT_SLA_HOURS[severity] if hours is None else hours
+    
+    def name_order(name):
+        # Unspecified (NULL) levels first
+        return (name is not None, name or "")
+    
+    products = [
+        {
+            "name": product,
+            "subproducts": [
+                {
+                    "name": subproduct,
+                    "issues": [
+                        {
+                            "name": issue,
+                            "subissues": [
+                                {
+                                    "name": subissue,
+                                    "sla_hours": {
+                                        severity.value: sla_hours(product, issue, severity.value)
+                                        for severity in models.ComplaintSeverity
+                                    },
+                                }
+                                for subissue in sorted(subissues, key=name_order)
+                            ],
+                        }
+                        for issue, subissues in sorted(issues.items(), key=lambda item: name_order(item[0]))
+                    ],
+                }
+                for subproduct, issues in sorted(subproducts.items(), key=lambda item: name_order(item[0]))
+            ],
+        }
+        for product, subproducts in sorted(tree.items())
+    ]
+    version = hashlib.sha1(json.dumps(products, sort_keys=True).encode()).hexdigest()[:16]
+    taxonomy = {"version": version, "products": products}
+    with _lock:
+        if _generations[SLA_RULES] == generation:
+            _taxonomy = taxonomy
+    return taxonomy
+
+def _drop_sla_rules():
+    global _sla_hours, _taxonomy
+    with _lock:
+        _generations[SLA_RULES] += 1
+        _sla_hours = None
+        _taxonomy = None
+
+def _drop_teams():
+    global _teams
+    with _lock:
+        _generations[TEAMS] += 1
+        _teams = None
+
+cache.on_invalidate(SLA_RULES, _drop_sla_rules)
+cache.on_invalidate(TEAMS, _drop_teams)
+
+def _reload(loader):
+    """Run ``loader`` through a new primary session."""
+    with SessionLocal() as db:
+        return loader(db)
+
+def get_sla_hours(db: Session, product: str, issue: str, severity: str) -> Optional[int]:
+    """Return SLA hours for a rule, or None if no rule matches."""
+    rules = _sla_hours
+    if rules is None:
+        rules = _reload(load_sla_rules)
+    return rules.get((product, issue, severity))
+
+def managed_team_ids(db: Session, manager_id: int) -> List[int]:
+    """Return ids of teams managed by a user."""
+    teams = _teams
+    if teams is None:
+        teams = _reload(load_teams)
+    return [team["id"] for team in teams.values() if team["manager_id"] == manager_id]
+
+def team_ids(db: Session) -> List[int]:
+    """Return ids of all teams."""
+    teams = _teams
+    if teams is None:
+        teams = _reload(load_teams)
+    return sorted(teams)
+
+def get_team(db: Session, team_id: int) -> Optional[dict]:
+    """Return a team snapshot, or None if no such team exists."""
+    teams = _teams
+    if teams is None:
+        teams = _reload(load_teams)
+    return teams.get(team_id)
+
+def get_taxonomy(db: Session) -> dict:
+    """Return the intake taxonomy and its version."""
+    taxonomy = _taxonomy
+    if taxonomy is None:
+        taxonomy = _reload(load_taxonomy)
+    return taxonomy
@@ -1,17 +1,28 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import PlainTextResponse
 from fastapi.security import HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from database import get_db
+from database import get_db, get_read_db
 from auth import security, verify_token, check_permission
 import models
 import schemas
+import profiling
+import reference_data
+import cache
+import archive
+import notifications
+import sla_clock
+import chat_sessions
+import complaint_cache
+import snapshots
+import fieldsets
 
 router = APIRouter()
 
 # Team management
 @router.post("/teams", response_model=schemas.Team)
-async def create_team(
+def create_team(
     team: schemas.TeamCreate,
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
@@ -22,27 +33,35 @@ async def create_team(
     
     db_team = models.Team(**team.dict())
     db.add(db_team)
+    cache.bump(db, reference_data.TEAMS)
     db.commit()
     db.refresh(db_team)
     
     return db_team
 
 @router.get("/teams", response_model=List[schemas.Team])
-async def read_teams(
+def read_teams(
     skip: int = 0,
     limit: int = 100,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,name"),
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get all teams."""
     current_user = verify_token(credentials, db)
     check_permission(current_user, ["admin", "manager"])
+    field_set = fieldsets.parse_fields(fields, schemas.Team)
     
-    teams = db.query(models.Team).offset(skip).limit(limit).all()
+    query = db.query(models.Team)
+    if field_set is not None:
+        query = query.options(fieldsets.load_fields(models.Team, field_set))
+    teams = query.offset(skip).limit(limit).all()
+    if field_set is not None:
+        return Response(content=fieldsets.serialize(schemas.Team, field_set, teams), media_type="application/json")
     return teams
 
 @router.put("/teams/{team_id}", response_model=schemas.Team)
-async def update_team(
+def update_team(
     team_id: int,
     team_update: schemas.TeamUpdate,
     credentials: HTTPAuthorizationCredentials = Depends(security),
@@ -63,14 +82,165 @@ async def update_team(
     for field, value in update_data.items():
         setattr(team, field, value)
     
+    cache.bump(db, reference_data.TEAMS)
     db.commit()
     db.refresh(team)
     
     return team
 
+# Business calendars
+def retime_complaints(db: Session, team_id: Optional[int] = None) -> int:
+    """Apply a calendar change to open complaints' deadlines in this transaction."""
+    db.flush()
+    retimed = sla_clock.recompute_due_at(db, None if team_id is None else [team_id])
+    cache.bump(db, sla_clock.CALENDARS)
+    return retimed
+
+@router.get("/calendars")
+def read_calendars(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_read_db)
+):
+    """Get the default business calendar and the teams' own calendars."""
+    current_user = verify_token(credentials, db)
+    check_permission(current_user, ["admin", "manager"])
+    
+    calendars = sla_clock.get_calendars(db)
+    return {
+        "default": calendars.default.describe(),
+        "teams": {team_id: calendar.describe() for team_id, calendar in sorted(calendars.teams.items())}
+    }
+
+@router.put("/teams/{team_id}/calendar", response_model=schemas.TeamCalendar)
+def update_team_calendar(
+    team_id: int,
+    calendar_update: schemas.TeamCalendarUpdate,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+):
+    """Set a team's working days and hours; re-times its open complaints."""
+    current_user = verify_token(credentials, db)
+    check_permission(current_user, ["admin"])
+    
+    if db.query(models.Team).filter(models.Team.id == team_id).first() is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Team not found"
+        )
+    try:
+        sla_clock.BusinessCalendar(calendar_update.weekmask, calendar_update.day_start, calendar_update.day_end)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    calendar = db.query(models.TeamCalendar).filter(models.TeamCalendar.team_id == team_id).first()
+    if calendar is None:
+        calendar = models.TeamCalendar(team_id=team_id)
+        db.add(calendar)
+    for field, value in calendar_update.dict().items():
+        setattr(calendar, field, value)
+    
+    retime_complaints(db, team_id)
+    db.commit()
+    db.refresh(calendar)
+    
+    return calendar
+
+@router.delete("/teams/{team_id}/calendar")
+def delete_team_calendar(
+    team_id: int,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+):
+    """Return a team to the default calendar; re-times its open complaints."""
+    current_user = verify_token(credentials, db)
+    check_permission(current_user, ["admin"])
+    
+    calendar = db.query(models.TeamCalendar).filter(models.TeamCalendar.team_id == team_id).first()
+    if calendar is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Team has no calendar of its own"
+        )
+    
+    db.delete(calendar)
+    retimed = retime_complaints(db, team_id)
+    db.commit()
+    
+    return {"message": "Team calendar removed", "complaints_retimed": retimed}
+
+@router.get("/holidays", response_model=List[schemas.Holiday])
+def read_holidays(
+    team_id: Optional[int] = None,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_read_db)
+):
+    """Get holidays, optionally only those applying to one team."""
+    current_user = verify_token(credentials, db)
+    check_permission(current_user, ["admin", "manager"])
+    
+    query = db.query(models.Holiday)
+    if team_id is not None:
+        query = query.filter((models.Holiday.team_id == team_id) | (models.Holiday.team_id.is_(None)))
+    return query.order_by(models.Holiday.date).all()
+
+@router.post("/holidays", response_model=schemas.Holiday)
+def create_holiday(
+    holiday: schemas.HolidayCreate,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+):
+    """Add a holiday for every team or one team; re-times affected open complaints."""
+    current_user = verify_token(credentials, db)
+    check_permission(current_user, ["admin"])
+    
+    existing = db.query(models.Holiday).filter(models.Holiday.date == holiday.date)
+    existing = existing.filter(
+        models.Holiday.team_id.is_(None) if holiday.team_id is None else models.Holiday.team_id == holiday.team_id
+    )
+    if existing.first() is not None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Holiday already exists"
+        )
+    
+    db_holiday = models.Holiday(**holiday.dict())
+    db.add(db_holiday)
+    retime_complaints(db, holiday.team_id)
+    db.commit()
+    db.refresh(db_holiday)
+    
+    return db_holiday
+
+@router.delete("/holidays/{holiday_id}")
+def delete_holiday(
+    holiday_id: int,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+):
+    """Remove a holiday; re-times affected open complaints."""
+    current_user = verify_token(credentials, db)
+    check_permission(current_user, ["admin"])
+    
+    holiday = db.query(models.Holiday).filter(models.Holiday.id == holiday_id).first()
+    if holiday is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Holiday not found"
+        )
+    
+    team_id = holiday.team_id
+    db.delete(holiday)
+    retimed = retime_complaints(db, team_id)
+    db.commit()
+    
+    return {"message": "Holiday removed", "complaints_retimed": retimed}
+
 # SLA Matrix management
 @router.post("/sla-matrix", response_model=schemas.SLAMatrix)
-async def create_sla_rule(
+def create_sla_rule(
     sla_rule: schemas.SLAMatrixCreate,
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
@@ -81,17 +251,18 @@ async def create_sla_rule(
     
     db_sla = models.SLAMatrix(**sla_rule.dict())
     db.add(db_sla)
+    cache.bump(db, reference_data.SLA_RULES)
     db.commit()
     db.refresh(db_sla)
     
     return db_sla
 
 @router.get("/sla-matrix", response_model=List[schemas.SLAMatrix])
-async def read_sla_rules(
+def read_sla_rules(
     skip: int = 0,
     limit: int = 100,
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get all SLA rules."""
     current_user = verify_token(credentials, db)
@@ -101,7 +272,7 @@ async def read_sla_rules(
     return sla_rules
 
 @router.put("/sla-matrix/{sla_id}", response_model=schemas.SLAMatrix)
-async def update_sla_rule(
+def update_sla_rule(
     sla_id: int,
     sla_update: schemas.SLAMatrixUpdate,
     credentials: HTTPAuthorizationCredentials = Depends(security),
@@ -122,13 +293,14 @@ async def update_sla_rule(
     for field, value in update_data.items():
         setattr(sla_rule, field, value)
     
+    cache.bump(db, reference_data.SLA_RULES)
     db.commit()
     db.refresh(sla_rule)
     
     return sla_rule
 
 @router.post("/agent-action")
-async def run_agent_action(
+def run_agent_action(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
 ):
@@ -161,4 +333,132 @@ async def run_agent_action(
         "message": "Agent automation completed successfully",
         "actions_performed": selected_actions,
         "timestamp": models.datetime.utcnow().isoformat()
-    }
\ No newline at end of file
+    }
+
+# Complaint archival
+@router.post("/archive")
+def run_archive(
+    older_than_days: Optional[int] = Query(None, ge=0),
+    max_batches: Optional[int] = Query(None, ge=1),
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+):
+    """Archive closed complaints now instead of waiting for the background job."""
+    current_user = verify_token(credentials, db)
+    check_permission(current_user, ["admin"])
+    
+    result = archive.archive_closed_complaints(db, older_than_days=older_than_days, max_batches=max_batches)
+    result.update(archive.archive_stats(db))
+    return result
+
+@router.get("/archive")
+def read_archive_stats(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_read_db)
+):
+    """Get working and archive table sizes."""
+    current_user = verify_token(credentials, db)
+    check_permission(current_user, ["admin"])
+    
+    return archive.archive_stats(db)
+
+# Parquet snapshots for analytics
+@router.post("/snapshots", status_code=status.HTTP_202_ACCEPTED)
+def start_snapshot(
+    mode: str = Query(snapshots.FULL, pattern=f"^({snapshots.FULL}|{snapshots.INCREMENTAL})$"),
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_read_db)
+):
+    """Start a full or incremental Parquet snapshot in the background."""
+    current_user = verify_token(credentials, db)
+    check_permission(current_user, ["admin"])
+    
+    job = snapshots.start(mode)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A snapshot is already running"
+        )
+    return job
+
+@router.get("/snapshots")
+def read_snapshots(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_read_db)
+):
+    """Get recent snapshot jobs."""
+    current_user = verify_token(credentials, db)
+    check_permission(current_user, ["admin"])
+    
+    return snapshots.jobs()
+
+# Notification outbox
+@router.get("/notifications")
+def read_notification_stats(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_read_db)
+):
+    """Get outbox message counts by status."""
+    current_user = verify_token(credentials, db)
+    check_permission(current_user, ["admin"])
+    
+    return notifications.outbox_stats(db)
+
+# Complaint list cache
+@router.get("/complaint-cache")
+def read_complaint_cache_stats(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_read_db)
+):
+    """Get this worker's complaint list cache size and hit ratio."""
+    current_user = verify_token(credentials, db)
+    check_permission(current_user, ["admin"])
+    
+    return complaint_cache.pages.stats()
+
+# Chatbot sessions
+@router.get("/chatbot-sessions")
+def read_chatbot_session_stats(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_read_db)
+):
+    """Get this worker's chatbot session store totals and per-session stats."""
+    current_user = verify_token(credentials, db)
+    check_permission(current_user, ["admin"])
+    
+    return {**chat_sessions.store.stats(), "per_session": chat_sessions.store.sessions()}
+
+# Request profiles
+@router.get("/profiles")
+def read_profiles(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+):
+    """List the request profiles stored by this worker.
+    
+    Each worker keeps its own profiles; with WEB_CONCURRENCY > 1 this shows
+    only those of the worker that serves the request (see ``pid``).
+    """
+    current_user = verify_token(credentials, db)
+    check_permission(current_user, ["admin"])
+    
+    return {"profiles": profiling.list_profiles()}
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+def read_profile(
+    profile_id: str,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+):
+    """Get a request profile of this worker in folded stacks format."""
+    current_user = verify_token(credentials, db)
+    check_permission(current_user, ["admin"])
+    
+    profile = profiling.get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    
+    return PlainTextResponse(profile["folded"])
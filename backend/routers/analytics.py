@@ -0,0 +1,179 @@
+from datetime import date, datetime, timedelta
+from collections import defaultdict
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy.orm import Session
+from database import get_db, get_read_db
+from auth import security, verify_token, check_permission
+import analytics
+import models
+import reference_data
+import schemas
+import sketches
+
+router = APIRouter()
+
+def _team_value(team_id: int) -> str:
+    """Rollup dimension value of a team id (0 for unassigned)."""
+    return "unassigned" if team_id == 0 else str(team_id)
+
+@router.get("/trends", response_model=schemas.TrendResponse)
+def read_trends(
+    granularity: str = Query("week", pattern="^(day|week)$"),
+    dimension: str = Query("all", pattern="^(all|product|issue|team|severity)$"),
+    team_id: Optional[int] = Query(None, description="One team's trends, 0 for unassigned"),
+    start: Optional[date] = Query(None),
+    end: Optional[date] = Query(None),
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_read_db)
+):
+    """Get complaint volume, breach rate and resolution time per time bucket.
+    
+    Managers see the teams they manage: one team at a time (``team_id``,
+    optional if they manage a single team), or their teams side by side with
+    ``dimension=team``.
+    """
+    current_user = verify_token(credentials, db)
+    check_permission(current_user, ["manager", "admin"])
+    
+    managed = None
+    if current_user.role == models.UserRole.MANAGER:
+        managed = reference_data.managed_team_ids(db, current_user.id)
+        if team_id is None and dimension != "team":
+            if len(managed) != 1:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="team_id is required: pick one of the teams you manage"
+                )
+            team_id = managed[0]
+        if team_id is not None and team_id not in managed:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized for this team")
+    
+    if start is None:
+        start = datetime.utcnow().date() - timedelta(days=365)
+    
+    query = db.query(models.ComplaintRollup).filter(
+        models.ComplaintRollup.granularity == granularity,
+        models.ComplaintRollup.dimension == dimension,
+        models.ComplaintRollup.bucket_start >= start
+    )
+    if dimension == "team":
+        # Per-team rows only exist across all teams
+        query = query.filter(models.ComplaintRollup.team_id.is_(None))
+        if team_id is not None:
+            query = query.filter(models.ComplaintRollup.dimension_value == _team_value(team_id))
+        elif managed is not None:
+            query = query.filter(models.ComplaintRollup.dimension_value.in_([_team_value(t) for t in managed]))
+    elif team_id is not None:
+        query = query.filter(models.ComplaintRollup.team_id == team_id)
+    else:
+        query = query.filter(models.ComplaintRollup.team_id.is_(None))
+    if end:
+        query = query.filter(models.ComplaintRollup.bucket_start <= end)
+    
+    rollups = query.order_by(models.ComplaintRollup.bucket_start, models.ComplaintRollup.dimension_value).all()
+    
+    return {
+        "granularity": granularity,
+        "dimension": dimension,
+        "team_id": team_id,
+        "refreshed_at": max((rollup.refreshed_at for rollup in rollups), default=None),
+        "points": [
+            {
+                "bucket_start": rollup.bucket_start,
+                "dimension_value": rollup.dimension_value,
+                "complaints": rollup.complaints,
+                "closed": rollup.closed,
+                "breached": rollup.breached,
+                "breach_rate": round(rollup.breached / rollup.complaints, 4) if rollup.complaints else 0.0,
+                "mean_resolution_hours": rollup.mean_resolution_hours,
+                "median_resolution_hours": rollup.median_resolution_hours,
+            }
+            for rollup in rollups
+        ]
+    }
+
+@router.get("/resolution-percentiles", response_model=schemas.PercentileResponse)
+def read_resolution_percentiles(
+    team_id: Optional[int] = Query(None, description="0 for unassigned"),
+    product: Optional[str] = Query(None),
+    severity: Optional[models.ComplaintSeverity] = Query(None),
+    from_month: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$"),
+    to_month: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$"),
+    group_by: Optional[str] = Query(None, pattern="^(team|product|severity|month)$"),
+    quantiles: str = Query("0.5,0.9,0.99"),
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_read_db)
+):
+    """Get resolution-time percentiles (hours) by merging quantile sketches.
+    
+    Team leads see their own team and managers the teams they manage.
+    """
+    current_user = verify_token(credentials, db)
+    check_permission(current_user, ["team_lead", "manager", "admin"])
+    
+    allowed = None
+    if current_user.role == models.UserRole.TEAM_LEAD:
+        allowed = [current_user.team_id] if current_user.team_id is not None else []
+    elif current_user.role == models.UserRole.MANAGER:
+        allowed = reference_data.managed_team_ids(db, current_user.id)
+    if allowed is not None and team_id is not None and team_id not in allowed:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized for this team")
+    
+    try:
+        qs = [float(q) for q in quantiles.split(",")]
+    except ValueError:
+        qs = []
+    if not qs or any(q < 0 or q > 1 for q in qs):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="quantiles must be comma-separated numbers between 0 and 1"
+        )
+    
+    query = db.query(models.ResolutionSketch)
+    if team_id is not None:
+        query = query.filter(models.ResolutionSketch.team_id == team_id)
+    elif allowed is not None:
+        query = query.filter(models.ResolutionSketch.team_id.in_(allowed))
+    if product:
+        query = query.filter(models.ResolutionSketch.product == product)
+    if severity:
+        query = query.filter(models.ResolutionSketch.severity == severity)
+    if from_month:
+        query = query.filter(models.ResolutionSketch.month >= from_month)
+    if to_month:
+        query = query.filter(models.ResolutionSketch.month <= to_month)
+    
+    groups = defaultdict(list)
+    if not group_by:
+        groups[None] = []
+    for row in query.all():
+        if group_by == "team":
+            key = str(row.team_id)
+        elif group_by == "severity":
+            key = row.severity.value
+        elif group_by:
+            key = getattr(row, group_by)
+        else:
+            key = None
+        groups[key].append(row)
+    
+    return {
+        "group_by": group_by,
+        "groups": [
+            {"group": key, **sketches.merged_percentiles(rows, qs)}
+            for key, rows in sorted(groups.items(), key=lambda item: item[0] or "")
+        ]
+    }
+
+@router.post("/refresh")
+def refresh_rollups(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+):
+    """Recompute analytics rollups now."""
+    current_user = verify_token(credentials, db)
+    check_permission(current_user, ["admin"])
+    
+    return analytics.refresh_rollups(db)
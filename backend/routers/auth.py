@@ -2,15 +2,17 @@ from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from database import get_db
+from database import get_db, get_read_db
 from auth import authenticate_user, create_access_token, get_password_hash, security, verify_token
 import models
 import schemas
+import cache
+import user_index
 
 router = APIRouter()
 
 @router.post("/register", response_model=schemas.User)
-async def register_user(
+def register_user(
     user: schemas.UserCreate,
     db: Session = Depends(get_db)
 ):
@@ -34,13 +36,15 @@ async def register_user(
         team_id=user.team_id
     )
     db.add(db_user)
+    cache.bump(db, user_index.USERS)
     db.commit()
     db.refresh(db_user)
+    user_index.user_changed(db_user)
     
     return db_user
 
 @router.post("/login", response_model=schemas.Token)
-async def login_for_access_token(
+def login_for_access_token(
     form_data: schemas.LoginRequest,
     db: Session = Depends(get_db)
 ):
@@ -55,22 +59,22 @@ async def login_for_access_token(
     
     access_token_expires = timedelta(minutes=30)
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data={"sub": user.email, "role": user.role.value}, expires_delta=access_token_expires
     )
     
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/me", response_model=schemas.User)
-async def read_users_me(
+def read_users_me(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get current user information."""
     current_user = verify_token(credentials, db)
     return current_user
 
 @router.post("/refresh-token", response_model=schemas.Token)
-async def refresh_access_token(
+def refresh_access_token(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
 ):
@@ -78,7 +82,7 @@ async def refresh_access_token(
     current_user = verify_token(credentials, db)
     access_token_expires = timedelta(minutes=30)
     access_token = create_access_token(
-        data={"sub": current_user.email}, expires_delta=access_token_expires
+        data={"sub": current_user.email, "role": current_user.role.value}, expires_delta=access_token_expires
     )
     
     return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
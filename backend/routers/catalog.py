@@ -0,0 +1,46 @@
+import json
+
+from fastapi import APIRouter, Depends, Header, Response, status
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy.orm import Session
+from typing import Optional
+from database import get_read_db
+from auth import security, verify_token
+import schemas
+import reference_data
+
+router = APIRouter()
+
+# (version, encoded body) of the last taxonomy served
+_encoded = (None, b"")
+
+def encoded_taxonomy(db: Session) -> tuple:
+    """Current taxonomy version and its JSON body, encoded once per version."""
+    global _encoded
+    version, body = _encoded
+    taxonomy = reference_data.get_taxonomy(db)
+    if taxonomy["version"] != version:
+        version, body = taxonomy["version"], json.dumps(taxonomy, separators=(",", ":")).encode()
+        _encoded = (version, body)
+    return version, body
+
+@router.get("/taxonomy", response_model=schemas.Taxonomy)
+def read_taxonomy(
+    if_none_match: Optional[str] = Header(None),
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_read_db)
+):
+    """Get the product > subproduct > issue > subissue tree with SLA hours per severity.
+    
+    Send the ETag back as If-None-Match to get 304 while the SLA rules are
+    unchanged.
+    """
+    verify_token(credentials, db)
+    
+    version, body = encoded_taxonomy(db)
+    etag = f'"{version}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    return Response(content=body, media_type="application/json", headers=headers)
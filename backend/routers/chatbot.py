@@ -1,10 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from database import get_db
+from database import get_db, get_read_db
 from auth import security, verify_token
+import models
 import schemas
+import chat_sessions
+import customer_summary
 import random
+import re
 
 router = APIRouter()
 
@@ -33,21 +37,141 @@ MOCK_CUSTOMER_DATA = {
     ]
 }
 
-def process_chatbot_query(query: str) -> dict:
-    """Process chatbot query and return response."""
+EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+# Only explicit IDs ("customer 42", "id: 42", "#42"), not any number in the query
+ID_PATTERN = re.compile(r"(?:\b(?:customer|client|user)\s+(?:id\b\s*)?|\bid\b\s*|#)[:#]?\s*(\d+)\b", re.IGNORECASE)
+# On a follow-up only "id 42" names another customer; "their complaint #3" does not
+EXPLICIT_ID_PATTERN = re.compile(r"\bid\b\s*[:#]?\s*(\d+)\b", re.IGNORECASE)
+
+# "and their transactions?": the customer discussed earlier in the session
+FOLLOW_UP_PATTERN = re.compile(r"\b(?:their|them|they|his|her|this customer|that customer|same customer)\b")
+
+WHICH_CUSTOMER = {
+    "response": (
+        "Which customer do you mean? Please include their e-mail address or ID, "
+        "e.g. 'find customer jane@email.com'."
+    ),
+    "data": None
+}
+
+def resolve_customer_id(db: Session, query: str, session=None, follow_up: bool = False):
+    """Customer named in the query by e-mail or ID; on a follow-up, the session's customer unless
+    the query gives an e-mail or "id N"."""
+    email = EMAIL_PATTERN.search(query)
+    if email:
+        key = ("email", email.group(0).lower())
+        customer_id = chat_sessions.store.get(session, key) if session is not None else None
+        if customer_id is None:
+            customer_id = db.query(models.User.id).filter(models.User.email == email.group(0)).scalar()
+            if session is not None and customer_id is not None:
+                chat_sessions.store.put(session, key, customer_id)
+        return customer_id
+    number = (EXPLICIT_ID_PATTERN if follow_up else ID_PATTERN).search(query)
+    if number:
+        return int(number.group(1))
+    if follow_up:
+        return session.entities.get("customer_id")
+    return None
+
+def lookup_customer(db: Session, query: str, session=None, follow_up: bool = False, current_user=None) -> dict:
+    """Answer a customer lookup from the customer's summary, if ``current_user`` may see it."""
+    customer_id = resolve_customer_id(db, query, session, follow_up)
+    if customer_id is None:
+        return {
+            "response": "Please include the customer's e-mail address or ID, e.g. 'find customer jane@email.com'.",
+            "data": None
+        }
+    if current_user is not None and not customer_summary.can_view(db, current_user, customer_id):
+        return {
+            "response": "You can only look up customers with complaints assigned to you or your team.",
+            "data": None
+        }
+    
+    key = ("customer", customer_id)
+    result = chat_sessions.store.get(session, key) if session is not None else None
+    if result is None:
+        summary = customer_summary.get_summary(db, customer_id)
+        if summary is None:
+            return {"response": "No customer found matching that e-mail or ID.", "data": None}
+        
+        profile = summary["profile"]
+        open_count = len(summary["open_complaints"])
+        breached = sum(
+            1 for complaint in summary["open_complaints"]
+            if complaint["sla_remaining_hours"] is not None and complaint["sla_remaining_hours"] < 0
+        )
+        result = {
+            "response": (
+                f"Found customer: {profile['full_name']} ({profile['email']}, ID: {profile['id']}) with "
+                f"{open_count} open complaint(s), {breached} past SLA"
+            ),
+            "data": schemas.CustomerSummary(**summary).model_dump(mode="json")
+        }
+        if session is not None:
+            chat_sessions.store.put(session, key, result)
+    
+    if session is not None:
+        profile = result["data"]["profile"]
+        chat_sessions.store.remember(
+            session, customer_id=profile["id"], customer_name=profile["full_name"], customer_email=profile["email"]
+        )
+    return result
+
+def customer_answer(kind: str, session) -> dict:
+    """Account, transaction or contact answer about the session's customer, kept for the session."""
+    customer_id = session.entities["customer_id"]
+    name = session.entities["customer_name"]
+    result = chat_sessions.store.get(session, (kind, customer_id))
+    if result is not None:
+        return result
+    
+    account = MOCK_CUSTOMER_DATA["account_details"][customer_id % len(MOCK_CUSTOMER_DATA["account_details"])]
+    if kind == "balance":
+        result = {
+            "response": f"Account {account['account_number']} of {name}: Balance is {account['balance']}, Status: {account['status']}",
+            "data": account
+        }
+    elif kind == "transactions":
+        transactions = random.Random(customer_id).sample(MOCK_CUSTOMER_DATA["transaction_history"], 3)
+        result = {"response": f"Recent transactions of {name}:", "data": {"transactions": transactions}}
+    elif kind == "status":
+        result = {
+            "response": f"Account status of {name}: {account['status']}, Last transaction: {account['last_transaction']}",
+            "data": account
+        }
+    else:
+        result = {
+            "response": f"Contact info of {name} - Email: {session.entities['customer_email']}",
+            "data": {"id": customer_id, "name": name, "email": session.entities["customer_email"]}
+        }
+    chat_sessions.store.put(session, (kind, customer_id), result)
+    return result
+
+def process_chatbot_query(query: str, db: Session, session=None, current_user=None) -> dict:
+    """Process chatbot query and return response.
+    
+    With a chat session, follow-ups about the customer found earlier
+    ("their", "them", ...) are answered from the session. Sessions live in
+    one worker's memory, so a follow-up whose session expired or was kept
+    by another worker asks which customer is meant.
+    """
     query_lower = query.lower()
+    refers_back = FOLLOW_UP_PATTERN.search(query_lower) is not None
+    follow_up = refers_back and session is not None and "customer_id" in session.entities
+    if refers_back and not follow_up and not (EMAIL_PATTERN.search(query) or ID_PATTERN.search(query)):
+        return WHICH_CUSTOMER
     
     # Customer lookup queries
     if any(word in query_lower for word in ["customer", "client", "user"]):
         if "lookup" in query_lower or "find" in query_lower or "search" in query_lower:
-            customer = random.choice(MOCK_CUSTOMER_DATA["customer_lookup"])
-            return {
-                "response": f"Found customer: {customer['name']} (ID: {customer['id']})",
-                "data": customer
-            }
+            return lookup_customer(db, query, session, follow_up, current_user)
+    if follow_up and any(word in query_lower for word in ["complaint", "summary", "profile", "details"]):
+        return lookup_customer(db, query, session, follow_up, current_user)
     
     # Account balance queries
     if any(word in query_lower for word in ["balance", "account"]):
+        if follow_up:
+            return customer_answer("balance", session)
         account = random.choice(MOCK_CUSTOMER_DATA["account_details"])
         return {
             "response": f"Account {account['account_number']}: Balance is {account['balance']}, Status: {account['status']}",
@@ -56,6 +180,8 @@ def process_chatbot_query(query: str) -> dict:
     
     # Transaction history queries
     if any(word in query_lower for word in ["transaction", "history", "payment"]):
+        if follow_up:
+            return customer_answer("transactions", session)
         transactions = random.sample(MOCK_CUSTOMER_DATA["transaction_history"], 3)
         return {
             "response": "Recent transactions found:",
@@ -64,6 +190,8 @@ def process_chatbot_query(query: str) -> dict:
     
     # Account status queries
     if "status" in query_lower:
+        if follow_up:
+            return customer_answer("status", session)
         account = random.choice(MOCK_CUSTOMER_DATA["account_details"])
         return {
             "response": f"Account status: {account['status']}, Last transaction: {account['last_transaction']}",
@@ -72,6 +200,8 @@ def process_chatbot_query(query: str) -> dict:
     
     # Contact information queries
     if any(word in query_lower for word in ["contact", "phone", "email"]):
+        if follow_up:
+            return customer_answer("contact", session)
         customer = random.choice(MOCK_CUSTOMER_DATA["customer_lookup"])
         return {
             "response": f"Contact info - Email: {customer['email']}, Phone: {customer['phone']}",
@@ -93,7 +223,7 @@ def process_chatbot_query(query: str) -> dict:
     }
 
 @router.post("/query", response_model=schemas.ChatbotResponse)
-async def chatbot_query(
+def chatbot_query(
     query_data: schemas.ChatbotQuery,
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
@@ -108,19 +238,21 @@ async def chatbot_query(
             detail="Chatbot access restricted to operations staff"
         )
     
+    session = chat_sessions.store.session(current_user.id, query_data.context)
     try:
-        result = process_chatbot_query(query_data.query)
-        return schemas.ChatbotResponse(**result)
+        result = process_chatbot_query(query_data.query, db, session, current_user)
+        return schemas.ChatbotResponse(**result, context=session.name)
     except Exception as e:
         return schemas.ChatbotResponse(
             response="Sorry, I encountered an error processing your query. Please try again.",
-            data=None
+            data=None,
+            context=session.name
         )
 
 @router.get("/suggestions")
-async def get_chatbot_suggestions(
+def get_chatbot_suggestions(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get chatbot query suggestions."""
     current_user = verify_token(credentials, db)
@@ -136,4 +268,30 @@ async def get_chatbot_suggestions(
         "Find account by number"
     ]
     
-    return {"suggestions": suggestions}
\ No newline at end of file
+    return {"suggestions": suggestions}
+
+@router.get("/sessions")
+def read_chatbot_sessions(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_read_db)
+):
+    """Get the caller's chatbot sessions with their memory use and hit rates."""
+    current_user = verify_token(credentials, db)
+    
+    return chat_sessions.store.sessions(current_user.id)
+
+@router.delete("/sessions/{context}")
+def delete_chatbot_session(
+    context: str,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_read_db)
+):
+    """Forget one of the caller's chatbot conversations."""
+    current_user = verify_token(credentials, db)
+    
+    if not chat_sessions.store.clear(current_user.id, context):
+        raise HTTPException(
+            status_code=404,
+            detail="Chatbot session not found"
+        )
+    return {"message": "Chatbot session cleared"}
@@ -1,46 +1,303 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status, Query
 from fastapi.security import HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_
-from database import get_db
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy import and_, or_, select, update, insert, case, true, union_all
+from database import get_db, get_read_db
 from auth import security, verify_token, check_permission
 import models
 import schemas
+import reference_data
+import sketches
+import archive
+import changes
+import notifications
+import complaint_cache
+import fieldsets
+import sla_clock
 from datetime import datetime
+from types import SimpleNamespace
 import uuid
 
 router = APIRouter()
 
+# Maximum number of complaints a single bulk request may touch
+BULK_LIMIT = 1000
+
+# Work queue: dialects with SELECT ... FOR UPDATE SKIP LOCKED; elsewhere
+# claim_next tries CLAIM_CANDIDATES rows per round, for CLAIM_ATTEMPTS rounds
+SKIP_LOCKED_DIALECTS = {"mysql", "mariadb", "postgresql", "oracle"}
+CLAIM_CANDIDATES = 5
+CLAIM_ATTEMPTS = 5
+
 def generate_complaint_number():
     """Generate unique complaint number."""
     return f"CMP{datetime.now().strftime('%Y%m%d')}{str(uuid.uuid4())[:8].upper()}"
 
+def role_scope_condition(db: Session, current_user: models.User, model=models.Complaint, assigned_to_me: bool = False):
+    """Return the SQL condition limiting complaints to what a user may see, or None for no limit."""
+    if current_user.role == models.UserRole.CUSTOMER:
+        return model.customer_id == current_user.id
+    if current_user.role == models.UserRole.OPS_MEMBER:
+        if assigned_to_me:
+            return model.assigned_to_id == current_user.id
+        return or_(
+            model.assigned_team_id == current_user.team_id,
+            model.assigned_to_id == current_user.id
+        )
+    if current_user.role == models.UserRole.TEAM_LEAD:
+        return model.assigned_team_id == current_user.team_id
+    if current_user.role == models.UserRole.MANAGER:
+        # Manager can see complaints from teams they manage
+        team_ids = reference_data.managed_team_ids(db, current_user.id)
+        if team_ids:
+            return model.assigned_team_id.in_(team_ids)
+    return None
+
+def read_permission_condition(current_user: models.User, model=models.Complaint):
+    """SQL form of ``read_complaint``'s permission check, or None if everything is readable."""
+    if current_user.role == models.UserRole.CUSTOMER:
+        return model.customer_id == current_user.id
+    if current_user.role in [models.UserRole.OPS_MEMBER, models.UserRole.TEAM_LEAD]:
+        return or_(
+            model.assigned_team_id == current_user.team_id,
+            model.assigned_to_id == current_user.id
+        )
+    return None
+
 def calculate_sla(db: Session, complaint: models.Complaint) -> int:
     """Calculate SLA hours based on complaint details."""
-    sla_rule = db.query(models.SLAMatrix).filter(
-        and_(
-            models.SLAMatrix.product == complaint.product,
-            models.SLAMatrix.issue == complaint.issue,
-            models.SLAMatrix.severity == complaint.severity,
-            models.SLAMatrix.is_active == True
+    sla_hours = reference_data.get_sla_hours(db, complaint.product, complaint.issue, complaint.severity.value)
+    if sla_hours is not None:
+        return sla_hours
+    
+    # Default SLA based on severity
+    return reference_data.DEFAULT_SLA_HOURS.get(complaint.severity.value, 24)
+
+def parse_if_match(if_match: Optional[str]) -> Optional[int]:
+    """Return the complaint version an If-Match header expects, if any."""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    value = if_match.strip()
+    if value.startswith("W/"):
+        value = value[2:]
+    try:
+        return int(value.strip('"'))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid If-Match header"
         )
-    ).first()
+
+def version_conflict() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Complaint was modified by someone else; reload and retry"
+    )
+
+def set_etag(response: Response, complaint: models.Complaint):
+    response.headers["ETag"] = f'"{complaint.version}"'
+
+def filter_conditions(complaint_filter: schemas.ComplaintFilter) -> list:
+    """Translate a bulk filter expression into SQL conditions."""
+    conditions = []
+    if complaint_filter.status:
+        conditions.append(models.Complaint.status == complaint_filter.status)
+    if complaint_filter.severity:
+        conditions.append(models.Complaint.severity == complaint_filter.severity)
+    if complaint_filter.team_id:
+        conditions.append(models.Complaint.assigned_team_id == complaint_filter.team_id)
+    if complaint_filter.assigned_to_id:
+        conditions.append(models.Complaint.assigned_to_id == complaint_filter.assigned_to_id)
+    if complaint_filter.product:
+        conditions.append(models.Complaint.product == complaint_filter.product)
+    if complaint_filter.issue:
+        conditions.append(models.Complaint.issue == complaint_filter.issue)
+    if complaint_filter.created_after:
+        conditions.append(models.Complaint.created_at >= complaint_filter.created_after)
+    if complaint_filter.created_before:
+        conditions.append(models.Complaint.created_at < complaint_filter.created_before)
+    return conditions
+
+def select_bulk_targets(db: Session, current_user: models.User, ids, complaint_filter):
+    """Resolve a bulk selection to the rows the user may change.
     
-    if sla_rule:
-        return sla_rule.sla_hours
+    Returns the permitted rows and a dict of per-id rejections. The role
+    scope is evaluated by the database in the same query.
+    """
+    if (ids is None) == (complaint_filter is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide exactly one of ids or filter"
+        )
     
-    # Default SLA based on severity
-    default_sla = {
-        "critical": 4,
-        "high": 12,
-        "medium": 24,
-        "low": 48
+    scope = role_scope_condition(db, current_user)
+    columns = (
+        models.Complaint.id,
+        models.Complaint.complaint_number,
+        models.Complaint.customer_id,
+        models.Complaint.version,
+        models.Complaint.status,
+        models.Complaint.severity,
+        models.Complaint.product,
+        models.Complaint.issue,
+        models.Complaint.assigned_team_id,
+        models.Complaint.assigned_to_id,
+        models.Complaint.created_at,
+        models.Complaint.sla_hours,
+        models.Complaint.due_at,
+        models.Complaint.resolution_time,
+    )
+    
+    if ids is not None:
+        ids = list(dict.fromkeys(ids))
+        if len(ids) > BULK_LIMIT:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"At most {BULK_LIMIT} complaints per request"
+            )
+        allowed = (scope if scope is not None else true()).label("allowed")
+        found = {
+            row.id: row
+            for row in db.execute(select(*columns, allowed).where(models.Complaint.id.in_(ids)))
+        }
+        targets, rejected = [], {}
+        for complaint_id in ids:
+            row = found.get(complaint_id)
+            if row is None:
+                rejected[complaint_id] = "not_found"
+            elif not row.allowed:
+                rejected[complaint_id] = "forbidden"
+            else:
+                targets.append(row)
+        return targets, rejected
+    
+    stmt = select(*columns).where(*filter_conditions(complaint_filter))
+    if scope is not None:
+        stmt = stmt.where(scope)
+    targets = db.execute(stmt.order_by(models.Complaint.id).limit(BULK_LIMIT + 1)).all()
+    if len(targets) > BULK_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Filter matches more than {BULK_LIMIT} complaints; narrow it down"
+        )
+    return targets, {}
+
+def customer_emails(db: Session, rows) -> dict:
+    """Map the customer ids of ``rows`` to e-mail addresses in one query."""
+    customer_ids = {row.customer_id for row in rows}
+    return dict(db.execute(
+        select(models.User.id, models.User.email).where(models.User.id.in_(customer_ids))
+    ).all())
+
+def updated_targets(db: Session, targets) -> tuple:
+    """Split targets into those the scoped UPDATE changed and per-id rejections for the rest.
+    
+    The UPDATE stamps the rows it changes with the transaction's change
+    marker; rows that left the caller's scope or the table since they were
+    selected do not carry it.
+    """
+    marker = changes.transaction_seq(db)
+    stamped = dict(db.execute(
+        select(models.Complaint.id, models.Complaint.change_seq == marker)
+        .where(models.Complaint.id.in_([row.id for row in targets]))
+    ).all())
+    rejected = {
+        row.id: "forbidden" if row.id in stamped else "not_found"
+        for row in targets if not stamped.get(row.id)
     }
-    return default_sla.get(complaint.severity.value, 24)
+    return [row for row in targets if stamped.get(row.id)], rejected
+
+def bulk_response(targets, rejected: dict, ids=None) -> dict:
+    """Build per-id results in request order (or id order for filters)."""
+    results = {row.id: "updated" for row in targets}
+    results.update(rejected)
+    order = list(dict.fromkeys(ids)) if ids is not None else sorted(results)
+    return {
+        "updated": len(targets),
+        "results": [{"id": complaint_id, "result": results[complaint_id]} for complaint_id in order]
+    }
+
+def queue_candidates(team_id: int):
+    """Unassigned open complaints of a team, most urgent first.
+    
+    Earliest SLA deadline first (severity is part of the deadline through
+    sla_hours), then oldest id. The order is that of ix_complaints_queue,
+    which also holds the status, so a locking read walks the index in order
+    and skips closed complaints without touching their rows.
+    """
+    return (
+        select(models.Complaint.id)
+        .where(
+            models.Complaint.assigned_team_id == team_id,
+            models.Complaint.assigned_to_id.is_(None),
+            models.Complaint.status != models.ComplaintStatus.CLOSED
+        )
+        .order_by(
+            models.Complaint.assigned_team_id,
+            models.Complaint.assigned_to_id,
+            models.Complaint.due_at,
+            models.Complaint.id
+        )
+    )
+
+def claim_next(db: Session, current_user: models.User) -> Optional[int]:
+    """Atomically assign the next queued complaint to a user and commit.
+    
+    Where the database supports SKIP LOCKED, concurrent claimers lock
+    different rows and never wait on each other. Elsewhere (SQLite, whose
+    writers are serialized anyway) a few candidates are read and claimed
+    with a compare-and-set on assigned_to_id, moving to the next candidate
+    when another agent won the race.
+    """
+    skip_locked = db.get_bind().dialect.name in SKIP_LOCKED_DIALECTS
+    candidates = queue_candidates(current_user.team_id)
+    for _ in range(CLAIM_ATTEMPTS):
+        if skip_locked:
+            complaint_ids = db.execute(candidates.limit(1).with_for_update(skip_locked=True)).scalars().all()
+        else:
+            complaint_ids = db.execute(candidates.limit(CLAIM_CANDIDATES)).scalars().all()
+        if not complaint_ids:
+            db.rollback()
+            return None
+        
+        now = datetime.utcnow()
+        for complaint_id in complaint_ids:
+            claimed = db.execute(
+                update(models.Complaint)
+                .where(models.Complaint.id == complaint_id, models.Complaint.assigned_to_id.is_(None))
+                .values(
+                    assigned_to_id=current_user.id,
+                    status=models.ComplaintStatus.INPROCESS,
+                    updated_at=now,
+                    version=models.Complaint.version + 1,
+                    change_seq=changes.transaction_seq(db)
+                )
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if claimed:
+                db.add(models.ComplaintHistory(
+                    complaint_id=complaint_id,
+                    user_id=current_user.id,
+                    action="Assigned",
+                    new_value=current_user.full_name,
+                    notes=f"Claimed by {current_user.full_name} from the team queue"
+                ))
+                claimed_row = db.execute(
+                    select(models.Complaint.id, models.Complaint.complaint_number, models.Complaint.product,
+                           models.Complaint.version, models.Complaint.customer_id)
+                    .where(models.Complaint.id == complaint_id)
+                ).one()
+                notifications.enqueue(db, [notifications.complaint_message("assigned", claimed_row, current_user.email)])
+                complaint_cache.touch(db, [current_user.team_id], [claimed_row.customer_id])
+                db.commit()
+                return complaint_id
+        db.rollback()
+    return None
 
 @router.post("/", response_model=schemas.Complaint)
-async def create_complaint(
+def create_complaint(
     complaint: schemas.ComplaintCreate,
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
@@ -63,10 +320,9 @@ async def create_complaint(
     db_complaint.sla_hours = calculate_sla(db, db_complaint)
     
     db.add(db_complaint)
-    db.commit()
-    db.refresh(db_complaint)
+    db.flush()
     
-    # Add history entry
+    # Add history entry, committed with the complaint, its message and cache touch
     history = models.ComplaintHistory(
         complaint_id=db_complaint.id,
         user_id=current_user.id,
@@ -75,69 +331,218 @@ async def create_complaint(
         notes="Complaint created"
     )
     db.add(history)
+    notifications.enqueue(db, [notifications.complaint_message("created", db_complaint, current_user.email)])
+    complaint_cache.touch(db, [db_complaint.assigned_team_id], [current_user.id])
     db.commit()
+    db.refresh(db_complaint)
     
     return db_complaint
 
+def list_complaints(db: Session, current_user: models.User, skip: int, limit: int, status: Optional[str],
+                    severity: Optional[str], team_id: Optional[int], assigned_to_me: bool,
+                    created_from: Optional[datetime], created_to: Optional[datetime],
+                    fields: Optional[tuple] = None) -> list:
+    """Run the complaint list query for ``read_complaints``, loading only ``fields`` if given."""
+    def conditions(model):
+        # Apply role-based filtering
+        conds = []
+        scope = role_scope_condition(db, current_user, model, assigned_to_me=assigned_to_me)
+        if scope is not None:
+            conds.append(scope)
+        
+        # Apply filters
+        if status:
+            conds.append(model.status == status)
+        if severity:
+            conds.append(model.severity == severity)
+        if team_id:
+            conds.append(model.assigned_team_id == team_id)
+        if created_from:
+            conds.append(model.created_at >= created_from)
+        if created_to:
+            conds.append(model.created_at < created_to)
+        return conds
+    
+    include_archive = status == models.ComplaintStatus.CLOSED.value or created_from or created_to
+    if not include_archive:
+        query = db.query(models.Complaint).filter(*conditions(models.Complaint))
+        if fields is not None:
+            query = query.options(fieldsets.load_fields(models.Complaint, fields))
+        return query.offset(skip).limit(limit).all()
+    
+    names = archive.shared_columns(models.Complaint, models.ArchivedComplaint)
+    if fields is not None:
+        # The union is ordered by id
+        names = [name for name in names if name in fields or name == "id"]
+    combined = union_all(*[
+        select(*[model.__table__.c[name] for name in names]).where(*conditions(model))
+        for model in (models.Complaint, models.ArchivedComplaint)
+    ]).subquery()
+    return db.execute(select(combined).order_by(combined.c.id).offset(skip).limit(limit)).all()
+
 @router.get("/", response_model=List[schemas.Complaint])
-async def read_complaints(
+def read_complaints(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     status: Optional[str] = Query(None),
     severity: Optional[str] = Query(None),
     team_id: Optional[int] = Query(None),
     assigned_to_me: bool = Query(False),
+    created_from: Optional[datetime] = Query(None),
+    created_to: Optional[datetime] = Query(None),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,complaint_number,status"),
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    """Get complaints with filters."""
-    current_user = verify_token(credentials, db)
+    """Get complaints with filters.
     
-    query = db.query(models.Complaint)
+    Archived complaints are included only when the filters can match them:
+    status=closed or a created_from/created_to date range. Pages are served
+    from the complaint list cache while nothing they show has changed.
+    ``fields`` limits the columns loaded and returned.
+    """
+    current_user = verify_token(credentials, db)
+    field_set = fieldsets.parse_fields(fields, schemas.Complaint)
     
-    # Apply role-based filtering
-    if current_user.role == models.UserRole.CUSTOMER:
-        query = query.filter(models.Complaint.customer_id == current_user.id)
-    elif current_user.role == models.UserRole.OPS_MEMBER:
-        if assigned_to_me:
-            query = query.filter(models.Complaint.assigned_to_id == current_user.id)
+    scope, generation_names = complaint_cache.scope_key(db, current_user, assigned_to_me)
+    key = (scope, status, severity, team_id, created_from, created_to, skip, limit, field_set)
+    token = complaint_cache.generations(db, generation_names)
+    body = complaint_cache.pages.get(key, token)
+    if body is None:
+        rows = list_complaints(db, current_user, skip, limit, status, severity, team_id, assigned_to_me,
+                               created_from, created_to, field_set)
+        if field_set is None:
+            body = complaint_cache.serialize(rows)
         else:
-            query = query.filter(
-                or_(
-                    models.Complaint.assigned_team_id == current_user.team_id,
-                    models.Complaint.assigned_to_id == current_user.id
-                )
-            )
-    elif current_user.role == models.UserRole.TEAM_LEAD:
-        query = query.filter(models.Complaint.assigned_team_id == current_user.team_id)
-    elif current_user.role == models.UserRole.MANAGER:
-        # Manager can see complaints from teams they manage
-        managed_teams = db.query(models.Team).filter(models.Team.manager_id == current_user.id).all()
-        team_ids = [team.id for team in managed_teams]
-        if team_ids:
-            query = query.filter(models.Complaint.assigned_team_id.in_(team_ids))
-    
-    # Apply filters
-    if status:
-        query = query.filter(models.Complaint.status == status)
-    if severity:
-        query = query.filter(models.Complaint.severity == severity)
-    if team_id:
-        query = query.filter(models.Complaint.assigned_team_id == team_id)
-    
-    complaints = query.offset(skip).limit(limit).all()
-    return complaints
+            body = fieldsets.serialize(schemas.Complaint, field_set, rows)
+        complaint_cache.pages.put(key, token, body)
+    
+    return Response(content=body, media_type="application/json")
+
+@router.post("/batch-get", response_model=schemas.ComplaintBatch)
+def batch_get_complaints(
+    refs: schemas.ComplaintRefs,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_read_db)
+):
+    """Get many complaints by id and/or complaint number.
+    
+    Fetched with one IN query (plus one on the archive for anything not
+    found) with ``read_complaint``'s permission check evaluated per row.
+    Requested references are partitioned into found complaints (in request
+    order) and forbidden and missing references.
+    """
+    current_user = verify_token(credentials, db)
+    
+    ids = list(dict.fromkeys(refs.ids))
+    numbers = list(dict.fromkeys(refs.complaint_numbers))
+    if len(ids) + len(numbers) > BULK_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {BULK_LIMIT} complaints per request"
+        )
+    
+    by_id, by_number = {}, {}
+    wanted_ids, wanted_numbers = set(ids), set(numbers)
+    for model in (models.Complaint, models.ArchivedComplaint):
+        lookups = []
+        if wanted_ids:
+            lookups.append(model.id.in_(wanted_ids))
+        if wanted_numbers:
+            lookups.append(model.complaint_number.in_(wanted_numbers))
+        if not lookups:
+            break
+        permission = read_permission_condition(current_user, model)
+        allowed = (permission if permission is not None else true()).label("allowed")
+        for complaint, is_allowed in db.query(model, allowed).filter(or_(*lookups)):
+            by_id[complaint.id] = by_number[complaint.complaint_number] = (complaint, bool(is_allowed))
+        # Old closed complaints live in the archive
+        wanted_ids -= by_id.keys()
+        wanted_numbers -= by_number.keys()
+    
+    found, seen = [], set()
+    forbidden = {"ids": [], "complaint_numbers": []}
+    missing = {"ids": [], "complaint_numbers": []}
+    for kind, keys, index in (("ids", ids, by_id), ("complaint_numbers", numbers, by_number)):
+        for key in keys:
+            match = index.get(key)
+            if match is None:
+                missing[kind].append(key)
+            elif not match[1]:
+                forbidden[kind].append(key)
+            elif match[0].id not in seen:
+                seen.add(match[0].id)
+                found.append(match[0])
+    
+    return {"found": found, "forbidden": forbidden, "missing": missing}
+
+def list_changes(db: Session, current_user: models.User, since: tuple, limit: int) -> dict:
+    """One page of the delta feed: complaints and tombstones after ``since``, in change order."""
+    seq, last_id = since
+    # Changes stamped later may belong to transactions still committing
+    horizon = changes.horizon()
+    entries = []
+    for model, key in ((models.Complaint, models.Complaint.id),
+                       (models.ComplaintTombstone, models.ComplaintTombstone.complaint_id)):
+        query = db.query(model).filter(
+            or_(model.change_seq > seq, and_(model.change_seq == seq, key > last_id)),
+            model.change_seq <= horizon
+        )
+        scope = role_scope_condition(db, current_user, model)
+        if scope is not None:
+            query = query.filter(scope)
+        # limit + 1 from each side is enough to fill a page and tell if there is more
+        for row in query.order_by(model.change_seq, key).limit(limit + 1):
+            entries.append((row.change_seq, row.id if model is models.Complaint else row.complaint_id, row))
+    
+    entries.sort(key=lambda entry: entry[:2])
+    page = entries[:limit]
+    return {
+        "complaints": [row for _, _, row in page if isinstance(row, models.Complaint)],
+        "tombstones": [row for _, _, row in page if isinstance(row, models.ComplaintTombstone)],
+        "next_cursor": changes.encode_cursor(*page[-1][:2]) if page else changes.encode_cursor(*since),
+        "has_more": len(entries) > limit,
+    }
+
+@router.get("/changes", response_model=schemas.ComplaintChanges)
+def read_complaint_changes(
+    since: str = Query(changes.START, description="Cursor from a previous response's next_cursor; 0 for everything"),
+    limit: int = Query(500, ge=1, le=BULK_LIMIT),
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_read_db)
+):
+    """Get complaints changed, and tombstones of complaints archived, after a cursor.
+    
+    Pass the returned next_cursor as ``since`` to continue; keep paging
+    while has_more is true. Changes appear after CHANGE_FEED_LAG_SECONDS. Complaints that move out of the caller's scope
+    stop appearing; a periodic full refresh drops them.
+    """
+    current_user = verify_token(credentials, db)
+    
+    try:
+        cursor = changes.decode_cursor(since)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    
+    return list_changes(db, current_user, cursor, limit)
 
 @router.get("/{complaint_id}", response_model=schemas.Complaint)
-async def read_complaint(
+def read_complaint(
     complaint_id: int,
+    response: Response,
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get specific complaint by ID."""
     current_user = verify_token(credentials, db)
     
     complaint = db.query(models.Complaint).filter(models.Complaint.id == complaint_id).first()
+    if complaint is None:
+        # Old closed complaints live in the archive
+        complaint = db.query(models.ArchivedComplaint).filter(models.ArchivedComplaint.id == complaint_id).first()
     if complaint is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -158,18 +563,26 @@ async def read_complaint(
                 detail="Not enough permissions"
             )
     
+    set_etag(response, complaint)
     return complaint
 
 @router.put("/{complaint_id}", response_model=schemas.Complaint)
-async def update_complaint(
+def update_complaint(
     complaint_id: int,
     complaint_update: schemas.ComplaintUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
 ):
-    """Update complaint."""
+    """Update complaint.
+    
+    Send the version from the ETag as If-Match to fail with 409 instead of
+    overwriting a concurrent change.
+    """
     current_user = verify_token(credentials, db)
     check_permission(current_user, ["ops_member", "team_lead", "manager", "admin"])
+    expected_version = parse_if_match(if_match)
     
     complaint = db.query(models.Complaint).filter(models.Complaint.id == complaint_id).first()
     if complaint is None:
@@ -177,14 +590,31 @@ async def update_complaint(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Complaint not found"
         )
+    if expected_version is not None and complaint.version != expected_version:
+        raise version_conflict()
+    
+    previous_status = complaint.status
+    previous_team_id = complaint.assigned_team_id
+    previous_severity = complaint.severity
+    # Reopened complaints keep the resolution time of their first close in the sketches
+    first_close = complaint.resolution_time is None
     
     # Update complaint fields
     update_data = complaint_update.dict(exclude_unset=True)
     for field, value in update_data.items():
-        if field == "status" and value == models.ComplaintStatus.CLOSED:
-            complaint.resolution_time = datetime.utcnow()
         setattr(complaint, field, value)
     
+    # The deadline follows the severity's SLA and the team's calendar
+    if complaint.severity != previous_severity:
+        complaint.sla_hours = calculate_sla(db, complaint)
+    if complaint.severity != previous_severity or complaint.assigned_team_id != previous_team_id:
+        complaint.due_at = sla_clock.due_at(db, complaint.created_at, complaint.sla_hours, complaint.assigned_team_id)
+    
+    if update_data.get("status") == models.ComplaintStatus.CLOSED:
+        complaint.resolution_time = datetime.utcnow()
+        if complaint.due_at is not None and complaint.resolution_time > complaint.due_at:
+            complaint.sla_breach = True
+    
     complaint.updated_at = datetime.utcnow()
     
     # Add history entry
@@ -193,27 +623,43 @@ async def update_complaint(
             complaint_id=complaint.id,
             user_id=current_user.id,
             action="Status Changed",
-            old_value=complaint.status.value if hasattr(complaint, 'status') else None,
+            old_value=previous_status.value if previous_status else None,
             new_value=complaint_update.status.value,
             notes=f"Status changed to {complaint_update.status.value}"
         )
         db.add(history)
     
-    db.commit()
+    try:
+        # Write (and lock) the complaint row before the cache generations,
+        # in the order claim_next takes them
+        db.flush()
+        # Feed resolution-time percentiles and tell the customer
+        if complaint.status == models.ComplaintStatus.CLOSED and previous_status != models.ComplaintStatus.CLOSED:
+            if first_close:
+                sketches.record_resolutions(db, [complaint])
+            notifications.enqueue(db, [notifications.complaint_message("closed", complaint, complaint.customer.email)])
+        complaint_cache.touch(db, [previous_team_id, complaint.assigned_team_id], [complaint.customer_id])
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise version_conflict()
     db.refresh(complaint)
     
+    set_etag(response, complaint)
     return complaint
 
 @router.post("/{complaint_id}/assign")
-async def assign_complaint(
+def assign_complaint(
     complaint_id: int,
     assigned_to_id: int,
+    if_match: Optional[str] = Header(None),
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
 ):
     """Assign complaint to a user."""
     current_user = verify_token(credentials, db)
     check_permission(current_user, ["team_lead", "manager", "admin"])
+    expected_version = parse_if_match(if_match)
     
     complaint = db.query(models.Complaint).filter(models.Complaint.id == complaint_id).first()
     if complaint is None:
@@ -221,6 +667,8 @@ async def assign_complaint(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Complaint not found"
         )
+    if expected_version is not None and complaint.version != expected_version:
+        raise version_conflict()
     
     assignee = db.query(models.User).filter(models.User.id == assigned_to_id).first()
     if assignee is None:
@@ -229,6 +677,10 @@ async def assign_complaint(
             detail="User not found"
         )
     
+    previous_team_id = complaint.assigned_team_id
+    if assignee.team_id != previous_team_id:
+        # The SLA clock runs on the calendar of the team working the complaint
+        complaint.due_at = sla_clock.due_at(db, complaint.created_at, complaint.sla_hours, assignee.team_id)
     complaint.assigned_to_id = assigned_to_id
     complaint.assigned_team_id = assignee.team_id
     complaint.status = models.ComplaintStatus.INPROCESS
@@ -244,14 +696,271 @@ async def assign_complaint(
     )
     db.add(history)
     
+    try:
+        db.flush()
+        notifications.enqueue(db, [notifications.complaint_message("assigned", complaint, assignee.email)])
+        complaint_cache.touch(db, [previous_team_id, assignee.team_id], [complaint.customer_id])
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise version_conflict()
+    
+    return {"message": "Complaint assigned successfully", "version": complaint.version}
+
+@router.post("/bulk-update", response_model=schemas.BulkResponse)
+def bulk_update_complaints(
+    bulk_update: schemas.BulkComplaintUpdate,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+):
+    """Change status and/or severity of many complaints at once."""
+    current_user = verify_token(credentials, db)
+    check_permission(current_user, ["ops_member", "team_lead", "manager", "admin"])
+    
+    if bulk_update.status is None and bulk_update.severity is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Nothing to update"
+        )
+    
+    targets, rejected = select_bulk_targets(db, current_user, bulk_update.ids, bulk_update.filter)
+    # Complaints already in the requested state are left alone
+    unchanged = {
+        row.id for row in targets
+        if bulk_update.status in (None, row.status) and bulk_update.severity in (None, row.severity)
+    }
+    rejected.update(dict.fromkeys(unchanged, "unchanged"))
+    targets = [row for row in targets if row.id not in unchanged]
+    if not targets:
+        return bulk_response(targets, rejected, bulk_update.ids)
+    
+    now = datetime.utcnow()
+    target_ids = [row.id for row in targets]
+    values = {"updated_at": now, "version": models.Complaint.version + 1, "change_seq": changes.transaction_seq(db)}
+    newly_closed = []
+    due = {row.id: row.due_at for row in targets}
+    
+    if bulk_update.severity:
+        # A new severity means a new SLA and deadline
+        resized = [row for row in targets if row.severity != bulk_update.severity and row.created_at is not None]
+        if resized:
+            sla_hours = [
+                calculate_sla(db, SimpleNamespace(product=row.product, issue=row.issue, severity=bulk_update.severity))
+                for row in resized
+            ]
+            resized_due = sla_clock.get_calendars(db).due_at_many(
+                [row.created_at for row in resized], sla_hours, [row.assigned_team_id for row in resized]
+            )
+            resized_ids = [row.id for row in resized]
+            due.update(zip(resized_ids, resized_due.astype(object)))
+            values["sla_hours"] = case(
+                dict(zip(resized_ids, sla_hours)), value=models.Complaint.id, else_=models.Complaint.sla_hours
+            )
+            values["due_at"] = case(
+                {complaint_id: due[complaint_id] for complaint_id in resized_ids},
+                value=models.Complaint.id,
+                else_=models.Complaint.due_at
+            )
+    
+    if bulk_update.status:
+        values["status"] = bulk_update.status
+        if bulk_update.status == models.ComplaintStatus.CLOSED:
+            newly_closed = [row for row in targets if row.status != models.ComplaintStatus.CLOSED]
+            closing_ids = [row.id for row in newly_closed]
+            breaching_ids = [row.id for row in newly_closed if due[row.id] is not None and due[row.id] < now]
+            values["resolution_time"] = case(
+                (models.Complaint.id.in_(closing_ids), now),
+                else_=models.Complaint.resolution_time
+            )
+            values["sla_breach"] = case(
+                (models.Complaint.id.in_(breaching_ids), True),
+                else_=models.Complaint.sla_breach
+            )
+    if bulk_update.severity:
+        values["severity"] = bulk_update.severity
+    
+    # One set-based UPDATE, re-checking the role scope
+    stmt = update(models.Complaint).where(models.Complaint.id.in_(target_ids))
+    scope = role_scope_condition(db, current_user)
+    if scope is not None:
+        stmt = stmt.where(scope)
+    db.execute(stmt.values(**values).execution_options(synchronize_session=False))
+    targets, missed = updated_targets(db, targets)
+    rejected.update(missed)
+    if not targets:
+        db.rollback()
+        return bulk_response(targets, rejected, bulk_update.ids)
+    updated_ids = {row.id for row in targets}
+    newly_closed = [row for row in newly_closed if row.id in updated_ids]
+    
+    # History only for what actually changed
+    history = []
+    if bulk_update.status:
+        history.extend(
+            {
+                "complaint_id": row.id,
+                "user_id": current_user.id,
+                "action": "Status Changed",
+                "old_value": row.status.value,
+                "new_value": bulk_update.status.value,
+                "notes": f"Status changed to {bulk_update.status.value} (bulk)",
+                "created_at": now,
+            }
+            for row in targets if row.status != bulk_update.status
+        )
+    if bulk_update.severity:
+        history.extend(
+            {
+                "complaint_id": row.id,
+                "user_id": current_user.id,
+                "action": "Severity Changed",
+                "old_value": row.severity.value,
+                "new_value": bulk_update.severity.value,
+                "notes": f"Severity changed to {bulk_update.severity.value} (bulk)",
+                "created_at": now,
+            }
+            for row in targets if row.severity != bulk_update.severity
+        )
+    if history:
+        db.execute(insert(models.ComplaintHistory), history)
+    complaint_cache.touch(db, [row.assigned_team_id for row in targets], [row.customer_id for row in targets])
+    
+    if newly_closed:
+        emails = customer_emails(db, newly_closed)
+        notifications.enqueue(db, [
+            notifications.complaint_message("closed", row, emails[row.customer_id])
+            for row in newly_closed if row.customer_id in emails
+        ])
+        # Only first closes; reopened complaints are already in the sketches
+        sketches.record_resolutions(db, [
+            SimpleNamespace(
+                assigned_team_id=row.assigned_team_id,
+                product=row.product,
+                severity=bulk_update.severity or row.severity,
+                created_at=row.created_at,
+                resolution_time=now
+            )
+            for row in newly_closed if row.resolution_time is None
+        ])
+    
     db.commit()
     
-    return {"message": "Complaint assigned successfully"}
+    return bulk_response(targets, rejected, bulk_update.ids)
 
-@router.get("/dashboard/stats")
-async def get_dashboard_stats(
+@router.post("/bulk-assign", response_model=schemas.BulkResponse)
+def bulk_assign_complaints(
+    bulk_assign: schemas.BulkComplaintAssign,
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
+):
+    """Assign many complaints to one user at once."""
+    current_user = verify_token(credentials, db)
+    check_permission(current_user, ["team_lead", "manager", "admin"])
+    
+    assignee = db.query(models.User).filter(models.User.id == bulk_assign.assigned_to_id).first()
+    if assignee is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    
+    targets, rejected = select_bulk_targets(db, current_user, bulk_assign.ids, bulk_assign.filter)
+    # Complaints the assignee is already working on are left alone
+    unchanged = {
+        row.id for row in targets
+        if row.assigned_to_id == assignee.id and row.assigned_team_id == assignee.team_id
+        and row.status == models.ComplaintStatus.INPROCESS
+    }
+    rejected.update(dict.fromkeys(unchanged, "unchanged"))
+    targets = [row for row in targets if row.id not in unchanged]
+    if not targets:
+        return bulk_response(targets, rejected, bulk_assign.ids)
+    
+    now = datetime.utcnow()
+    values = {
+        "assigned_to_id": assignee.id,
+        "assigned_team_id": assignee.team_id,
+        "status": models.ComplaintStatus.INPROCESS,
+        "updated_at": now,
+        "version": models.Complaint.version + 1,
+        "change_seq": changes.transaction_seq(db),
+    }
+    # Complaints changing team get deadlines on the new team's calendar
+    moved = [row for row in targets if row.assigned_team_id != assignee.team_id and row.created_at is not None]
+    if moved:
+        due = sla_clock.get_calendars(db).due_at_many(
+            [row.created_at for row in moved],
+            [float("nan") if row.sla_hours is None else row.sla_hours for row in moved],
+            [assignee.team_id] * len(moved)
+        )
+        values["due_at"] = case(
+            dict(zip([row.id for row in moved], due.astype(object))),
+            value=models.Complaint.id,
+            else_=models.Complaint.due_at
+        )
+    
+    stmt = update(models.Complaint).where(models.Complaint.id.in_([row.id for row in targets]))
+    scope = role_scope_condition(db, current_user)
+    if scope is not None:
+        stmt = stmt.where(scope)
+    db.execute(stmt.values(**values).execution_options(synchronize_session=False))
+    targets, missed = updated_targets(db, targets)
+    rejected.update(missed)
+    if not targets:
+        db.rollback()
+        return bulk_response(targets, rejected, bulk_assign.ids)
+    
+    db.execute(insert(models.ComplaintHistory), [
+        {
+            "complaint_id": row.id,
+            "user_id": current_user.id,
+            "action": "Assigned",
+            "new_value": assignee.full_name,
+            "notes": f"Assigned to {assignee.full_name} (bulk)",
+            "created_at": now,
+        }
+        for row in targets
+    ])
+    notifications.enqueue(db, [notifications.complaint_message("assigned", row, assignee.email) for row in targets])
+    complaint_cache.touch(
+        db, [row.assigned_team_id for row in targets] + [assignee.team_id], [row.customer_id for row in targets]
+    )
+    
+    db.commit()
+    
+    return bulk_response(targets, rejected, bulk_assign.ids)
+
+@router.post("/next", response_model=schemas.Complaint)
+def claim_next_complaint(
+    response: Response,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+):
+    """Claim the highest-priority unassigned complaint of the caller's team.
+    
+    Returns 204 when the team queue is empty.
+    """
+    current_user = verify_token(credentials, db)
+    check_permission(current_user, ["ops_member", "team_lead"])
+    
+    if current_user.team_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="User is not a member of a team"
+        )
+    
+    complaint_id = claim_next(db, current_user)
+    if complaint_id is None:
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+    
+    complaint = db.query(models.Complaint).filter(models.Complaint.id == complaint_id).first()
+    set_etag(response, complaint)
+    return complaint
+
+@router.get("/dashboard/stats")
+def get_dashboard_stats(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_read_db)
 ):
     """Get dashboard statistics."""
     current_user = verify_token(credentials, db)
@@ -259,30 +968,28 @@ async def get_dashboard_stats(
     base_query = db.query(models.Complaint)
     
     # Apply role-based filtering
-    if current_user.role == models.UserRole.CUSTOMER:
-        base_query = base_query.filter(models.Complaint.customer_id == current_user.id)
-    elif current_user.role == models.UserRole.OPS_MEMBER:
-        base_query = base_query.filter(
-            or_(
-                models.Complaint.assigned_team_id == current_user.team_id,
-                models.Complaint.assigned_to_id == current_user.id
-            )
-        )
-    elif current_user.role == models.UserRole.TEAM_LEAD:
-        base_query = base_query.filter(models.Complaint.assigned_team_id == current_user.team_id)
-    elif current_user.role == models.UserRole.MANAGER:
-        managed_teams = db.query(models.Team).filter(models.Team.manager_id == current_user.id).all()
-        team_ids = [team.id for team in managed_teams]
-        if team_ids:
-            base_query = base_query.filter(models.Complaint.assigned_team_id.in_(team_ids))
+    scope = role_scope_condition(db, current_user)
+    if scope is not None:
+        base_query = base_query.filter(scope)
+    
+    # Archived complaints (all closed) still count, so archiving does not change the figures
+    archived_query = db.query(models.ArchivedComplaint)
+    archived_scope = role_scope_condition(db, current_user, models.ArchivedComplaint)
+    if archived_scope is not None:
+        archived_query = archived_query.filter(archived_scope)
+    archived = archived_query.count()
+    now = datetime.utcnow()
     
     stats = {
-        "total_complaints": base_query.count(),
+        "total_complaints": base_query.count() + archived,
         "open_complaints": base_query.filter(models.Complaint.status == models.ComplaintStatus.OPEN).count(),
         "inprocess_complaints": base_query.filter(models.Complaint.status == models.ComplaintStatus.INPROCESS).count(),
         "pending_complaints": base_query.filter(models.Complaint.status == models.ComplaintStatus.PENDING).count(),
-        "closed_complaints": base_query.filter(models.Complaint.status == models.ComplaintStatus.CLOSED).count(),
-        "sla_breached": base_query.filter(models.Complaint.sla_breach == True).count(),
+        "closed_complaints": base_query.filter(models.Complaint.status == models.ComplaintStatus.CLOSED).count() + archived,
+        "sla_breached": (
+            base_query.filter(sla_clock.breached(models.Complaint, now)).count()
+            + archived_query.filter(sla_clock.breached(models.ArchivedComplaint, now)).count()
+        ),
     }
     
     return stats
\ No newline at end of file
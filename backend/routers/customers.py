@@ -0,0 +1,35 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy.orm import Session
+from database import get_read_db
+from auth import security, verify_token
+import models
+import schemas
+import customer_summary
+
+router = APIRouter()
+
+@router.get("/{user_id}/summary", response_model=schemas.CustomerSummary)
+def read_customer_summary(
+    user_id: int,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_read_db)
+):
+    """Get a customer's profile, complaint counts, open complaints, history and notes."""
+    current_user = verify_token(credentials, db)
+    
+    is_customer = current_user.role == models.UserRole.CUSTOMER
+    if not customer_summary.can_view(db, current_user, user_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    
+    summary = customer_summary.get_summary(db, user_id, include_internal=not is_customer)
+    if summary is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Customer not found"
+        )
+    
+    return summary
@@ -1,33 +1,118 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import and_, case, func, or_, select
 from sqlalchemy.orm import Session
-from database import get_db
+from database import get_db, get_read_db
 from auth import security, verify_token, check_permission, get_password_hash
 import models
 import schemas
+import cache
+import customer_summary
+import reference_data
+import user_index
+import fieldsets
+from datetime import datetime
+import os
+import time
 
 router = APIRouter()
 
+# Team workload responses are cached per team for this many seconds
+WORKLOAD_CACHE_SECONDS = float(os.getenv("WORKLOAD_CACHE_SECONDS", "10"))
+_workload_cache = {}
+
+def team_workload(db: Session, team_id: int) -> dict:
+    """Per-member open work of a team, from one grouped query."""
+    now = datetime.utcnow()
+    complaint = models.Complaint
+    
+    def count(condition):
+        return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+    
+    rows = db.execute(
+        select(
+            models.User.id,
+            models.User.full_name,
+            models.User.role,
+            models.User.is_active,
+            count(complaint.status == models.ComplaintStatus.OPEN).label("open"),
+            count(complaint.status == models.ComplaintStatus.INPROCESS).label("inprocess"),
+            count(complaint.status == models.ComplaintStatus.PENDING).label("pending"),
+            count(or_(complaint.sla_breach == True, complaint.due_at < now)).label("breached"),
+            func.min(complaint.created_at).label("oldest"),
+        )
+        .select_from(models.User)
+        .outerjoin(complaint, and_(
+            complaint.assigned_to_id == models.User.id,
+            complaint.status != models.ComplaintStatus.CLOSED
+        ))
+        .where(models.User.team_id == team_id)
+        .group_by(models.User.id, models.User.full_name, models.User.role, models.User.is_active)
+        .order_by(models.User.full_name)
+    ).all()
+    
+    return {
+        "team_id": team_id,
+        "generated_at": now,
+        "members": [
+            {
+                "user_id": row.id,
+                "full_name": row.full_name,
+                "role": row.role,
+                "is_active": row.is_active,
+                "open": row.open,
+                "inprocess": row.inprocess,
+                "pending": row.pending,
+                "breached": row.breached,
+                "oldest_age_hours": round((now - row.oldest).total_seconds() / 3600, 2) if row.oldest else None,
+            }
+            for row in rows
+        ],
+    }
+
 @router.get("/", response_model=List[schemas.User])
-async def read_users(
+def read_users(
     skip: int = 0,
     limit: int = 100,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,email,role"),
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get all users (admin only)."""
     current_user = verify_token(credentials, db)
     check_permission(current_user, ["admin", "manager"])
+    field_set = fieldsets.parse_fields(fields, schemas.User)
     
-    users = db.query(models.User).offset(skip).limit(limit).all()
+    query = db.query(models.User)
+    if field_set is not None:
+        query = query.options(fieldsets.load_fields(models.User, field_set))
+    users = query.offset(skip).limit(limit).all()
+    if field_set is not None:
+        return Response(content=fieldsets.serialize(schemas.User, field_set, users), media_type="application/json")
     return users
 
+@router.get("/lookup", response_model=List[schemas.UserLookup])
+def lookup_users(
+    q: str = Query(..., min_length=1, max_length=100),
+    role: Optional[models.UserRole] = Query(None),
+    team_id: Optional[int] = Query(None),
+    is_active: Optional[bool] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_read_db)
+):
+    """Find users whose name, any name word or e-mail starts with q."""
+    current_user = verify_token(credentials, db)
+    check_permission(current_user, ["admin", "manager"])
+    
+    return user_index.get_index(db).search(q, limit, role=role, team_id=team_id, is_active=is_active)
+
 @router.get("/{user_id}", response_model=schemas.User)
-async def read_user(
+def read_user(
     user_id: int,
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get user by ID."""
     current_user = verify_token(credentials, db)
@@ -46,7 +131,7 @@ async def read_user(
     return user
 
 @router.put("/{user_id}", response_model=schemas.User)
-async def update_user(
+def update_user(
     user_id: int,
     user_update: schemas.UserUpdate,
     credentials: HTTPAuthorizationCredentials = Depends(security),
@@ -70,13 +155,16 @@ async def update_user(
     for field, value in update_data.items():
         setattr(user, field, value)
     
+    cache.bump(db, user_index.USERS)
+    customer_summary.touch(db, user.id)
     db.commit()
     db.refresh(user)
+    user_index.user_changed(user)
     
     return user
 
 @router.delete("/{user_id}")
-async def delete_user(
+def delete_user(
     user_id: int,
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
@@ -100,15 +188,18 @@ async def delete_user(
         )
     
     db.delete(user)
+    cache.bump(db, user_index.USERS)
+    customer_summary.touch(db, user_id)
     db.commit()
+    user_index.user_deleted(user_id)
     
     return {"message": "User deleted successfully"}
 
 @router.get("/teams/{team_id}/members", response_model=List[schemas.User])
-async def get_team_members(
+def get_team_members(
     team_id: int,
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get team members."""
     current_user = verify_token(credentials, db)
@@ -131,4 +222,37 @@ async def get_team_members(
         )
     
     members = db.query(models.User).filter(models.User.team_id == team_id).all()
-    return members
\ No newline at end of file
+    return members
+
+@router.get("/teams/{team_id}/workload", response_model=schemas.TeamWorkload)
+def get_team_workload(
+    team_id: int,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_read_db)
+):
+    """Get open, in-process, pending and breached counts per team member."""
+    current_user = verify_token(credentials, db)
+    
+    team = reference_data.get_team(db, team_id)
+    if team is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Team not found"
+        )
+    
+    # Team leads see their own team, managers the teams they manage
+    if not (current_user.role == models.UserRole.ADMIN
+            or (current_user.role == models.UserRole.TEAM_LEAD and current_user.team_id == team_id)
+            or team["manager_id"] == current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    
+    cached = _workload_cache.get(team_id)
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+    
+    workload = team_workload(db, team_id)
+    _workload_cache[team_id] = (time.monotonic() + WORKLOAD_CACHE_SECONDS, workload)
+    return workload
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, validator
-from datetime import datetime
-from typing import Optional, List
+from datetime import datetime, date
+from typing import Dict, Optional, List
 from models import UserRole, ComplaintStatus, ComplaintSeverity
 import re
 
@@ -35,6 +35,30 @@ class User(UserBase):
     class Config:
         from_attributes = True
 
+class UserLookup(BaseModel):
+    id: int
+    email: str
+    full_name: str
+    role: UserRole
+    team_id: Optional[int] = None
+    is_active: bool
+
+class MemberWorkload(BaseModel):
+    user_id: int
+    full_name: str
+    role: UserRole
+    is_active: bool
+    open: int
+    inprocess: int
+    pending: int
+    breached: int
+    oldest_age_hours: Optional[float] = None
+
+class TeamWorkload(BaseModel):
+    team_id: int
+    generated_at: datetime
+    members: List[MemberWorkload]
+
 # Authentication schemas
 class Token(BaseModel):
     access_token: str
@@ -72,6 +96,46 @@ class Team(TeamBase):
     class Config:
         from_attributes = True
 
+# Business calendar schemas
+class TeamCalendarBase(BaseModel):
+    weekmask: str = "1111100"
+    day_start: str = "09:00"
+    day_end: str = "17:00"
+    
+    @validator('weekmask')
+    def validate_weekmask(cls, v):
+        if not re.fullmatch(r'[01]{7}', v) or '1' not in v:
+            raise ValueError('Weekmask must be 7 digits 0/1 (Monday..Sunday) with at least one working day')
+        return v
+    
+    @validator('day_start', 'day_end')
+    def validate_time(cls, v):
+        if not re.fullmatch(r'([01]\d|2[0-3]):[0-5]\d|24:00', v):
+            raise ValueError('Time must be HH:MM')
+        return v
+
+class TeamCalendarUpdate(TeamCalendarBase):
+    pass
+
+class TeamCalendar(TeamCalendarBase):
+    team_id: int
+    updated_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+class HolidayCreate(BaseModel):
+    date: date
+    name: str
+    team_id: Optional[int] = None
+
+class Holiday(HolidayCreate):
+    id: int
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
 # Complaint schemas
 class ComplaintBase(BaseModel):
     product: str
@@ -101,12 +165,69 @@ class Complaint(ComplaintBase):
     sla_hours: int
     sla_breach: bool
     resolution_time: Optional[datetime] = None
+    due_at: Optional[datetime] = None
+    version: int
+    change_seq: int = 0
     created_at: datetime
     updated_at: datetime
     
     class Config:
         from_attributes = True
 
+class ComplaintFilter(BaseModel):
+    status: Optional[ComplaintStatus] = None
+    severity: Optional[ComplaintSeverity] = None
+    team_id: Optional[int] = None
+    assigned_to_id: Optional[int] = None
+    product: Optional[str] = None
+    issue: Optional[str] = None
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+
+class BulkComplaintUpdate(BaseModel):
+    ids: Optional[List[int]] = None
+    filter: Optional[ComplaintFilter] = None
+    status: Optional[ComplaintStatus] = None
+    severity: Optional[ComplaintSeverity] = None
+
+class BulkComplaintAssign(BaseModel):
+    ids: Optional[List[int]] = None
+    filter: Optional[ComplaintFilter] = None
+    assigned_to_id: int
+
+class ComplaintTombstone(BaseModel):
+    complaint_id: int
+    complaint_number: str
+    reason: str
+    change_seq: int
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+class ComplaintChanges(BaseModel):
+    complaints: List[Complaint]
+    tombstones: List[ComplaintTombstone]
+    next_cursor: str
+    has_more: bool
+
+class ComplaintRefs(BaseModel):
+    ids: List[int] = []
+    complaint_numbers: List[str] = []
+
+class ComplaintBatch(BaseModel):
+    found: List[Complaint]
+    forbidden: ComplaintRefs
+    missing: ComplaintRefs
+
+class BulkResult(BaseModel):
+    id: int
+    result: str
+
+class BulkResponse(BaseModel):
+    updated: int
+    results: List[BulkResult]
+
 # Note schemas
 class ComplaintNoteBase(BaseModel):
     note: str
@@ -164,11 +285,105 @@ class DashboardStats(BaseModel):
     sla_breached: int
     avg_resolution_time: Optional[float] = None
 
+# Analytics schemas
+class RollupPoint(BaseModel):
+    bucket_start: date
+    dimension_value: str
+    complaints: int
+    closed: int
+    breached: int
+    breach_rate: float
+    mean_resolution_hours: Optional[float] = None
+    median_resolution_hours: Optional[float] = None
+
+class TrendResponse(BaseModel):
+    granularity: str
+    dimension: str
+    team_id: Optional[int] = None
+    refreshed_at: Optional[datetime] = None
+    points: List[RollupPoint]
+
+class PercentileGroup(BaseModel):
+    group: Optional[str] = None
+    count: int
+    percentiles: dict
+
+class PercentileResponse(BaseModel):
+    group_by: Optional[str] = None
+    groups: List[PercentileGroup]
+
+# Customer summary schemas
+class CustomerOpenComplaint(BaseModel):
+    id: int
+    complaint_number: str
+    product: str
+    issue: str
+    severity: ComplaintSeverity
+    status: ComplaintStatus
+    assigned_team_id: Optional[int] = None
+    assigned_to_id: Optional[int] = None
+    created_at: datetime
+    due_at: Optional[datetime] = None
+    sla_remaining_hours: Optional[float] = None
+
+class CustomerActivity(BaseModel):
+    complaint_id: int
+    user_id: int
+    action: str
+    old_value: Optional[str] = None
+    new_value: Optional[str] = None
+    notes: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+class CustomerNote(BaseModel):
+    id: int
+    complaint_id: int
+    user_id: int
+    note: str
+    is_internal: bool
+    created_at: Optional[datetime] = None
+
+class CustomerSummary(BaseModel):
+    profile: User
+    complaint_counts: dict
+    open_complaints: List[CustomerOpenComplaint]
+    recent_history: List[CustomerActivity]
+    recent_notes: List[CustomerNote]
+
+# Catalog schemas
+class TaxonomySubissue(BaseModel):
+    name: Optional[str] = None
+    sla_hours: Dict[str, int]
+
+class TaxonomyIssue(BaseModel):
+    name: str
+    subissues: List[TaxonomySubissue]
+
+class TaxonomySubproduct(BaseModel):
+    name: Optional[str] = None
+    issues: List[TaxonomyIssue]
+
+class TaxonomyProduct(BaseModel):
+    name: str
+    subproducts: List[TaxonomySubproduct]
+
+class Taxonomy(BaseModel):
+    version: str
+    products: List[TaxonomyProduct]
+
 # Chatbot schemas
 class ChatbotQuery(BaseModel):
     query: str
     context: Optional[str] = None
+    
+    @validator('context')
+    def validate_context(cls, v):
+        if v is not None and len(v) > 64:
+            raise ValueError('Context must be at most 64 characters')
+        return v
 
 class ChatbotResponse(BaseModel):
     response: str
-    data: Optional[dict] = None
\ No newline at end of file
+    data: Optional[dict] = None
+    # Session the turn belonged to; send it back as the next query's context
+    context: Optional[str] = None
\ No newline at end of file
@@ -1,36 +1,138 @@
 #!/usr/bin/env python3
-"""Initialize database and create tables."""
+"""Initialize database, create tables and apply schema migrations."""
 
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from sqlalchemy import create_engine
-from models import Base
-from database import DATABASE_URL
+from sqlalchemy import bindparam, inspect, select, text, update
+from models import Base, CacheGeneration, Complaint, SchemaVersion, SCHEMA_VERSION
+from database import DATABASE_URL, create_database_engine
+import sketches
+import sla_clock
+
+def add_column(table, ddl):
+    """Migration step adding a column unless create_all already did."""
+    def step(conn):
+        name = ddl.split()[0]
+        if name not in {column["name"] for column in inspect(conn).get_columns(table)}:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {ddl}"))
+    return step
+
+def replace_index(table, name):
+    """Migration step recreating an index with its definition in models.py."""
+    def step(conn):
+        index = next(index for index in Base.metadata.tables[table].indexes if index.name == name)
+        if name in {existing["name"] for existing in inspect(conn).get_indexes(table)}:
+            index.drop(conn)
+        index.create(conn)
+    return step
+
+def backfill_due_at(conn):
+    """Set complaints.due_at from created_at and sla_hours."""
+    complaints = Complaint.__table__
+    rows = conn.execute(
+        select(complaints.c.id, complaints.c.created_at, complaints.c.sla_hours, complaints.c.assigned_team_id)
+        .where(complaints.c.due_at.is_(None), complaints.c.created_at.isnot(None))
+    ).all()
+    if rows:
+        ids, created, hours, teams = zip(*rows)
+        due = sla_clock.build_calendars(conn).due_at_many(
+            created, [float("nan") if h is None else h for h in hours], teams
+        )
+        conn.execute(
+            update(complaints).where(complaints.c.id == bindparam("complaint_id")),
+            [{"complaint_id": complaint_id, "due_at": value} for complaint_id, value in zip(ids, due.astype(object))]
+        )
+
+def retime_open_complaints(conn):
+    """Move open complaints' deadlines from wall-clock to business hours."""
+    # change_seq is added by a later version
+    sla_clock.recompute_due_at(conn, stamp=False)
+
+# Steps create_all cannot apply to existing tables (new columns, backfills),
+# keyed by the schema version that introduces them. A step is a SQL string
+# or a callable taking the connection. New tables need no entry: create_all
+# adds them.
+MIGRATIONS = {
+    4: [sketches.rebuild],
+    5: ["ALTER TABLE complaints ADD COLUMN version INTEGER NOT NULL DEFAULT 1"],
+    6: ["CREATE INDEX ix_complaints_status_resolution ON complaints (status, resolution_time)"],
+    7: [
+        add_column("complaints", "due_at DATETIME"),
+        add_column("complaints_archive", "due_at DATETIME"),
+        "CREATE INDEX ix_complaints_queue ON complaints (assigned_team_id, assigned_to_id, due_at)",
+        backfill_due_at,
+    ],
+    9: ["CREATE INDEX ix_complaints_assignee_status ON complaints "
+        "(assigned_to_id, status, created_at, due_at, sla_breach)"],
+    10: [retime_open_complaints],
+    11: [
+        add_column("complaints", "change_seq BIGINT NOT NULL DEFAULT 0"),
+        "CREATE INDEX ix_complaints_change_seq ON complaints (change_seq, id)",
+    ],
+    # Existing rollups become the all-teams rows until the next refresh
+    12: [
+        add_column("complaint_rollups", "team_id INTEGER"),
+        replace_index("complaint_rollups", "ix_complaint_rollups_lookup"),
+    ],
+    13: [replace_index("complaints", "ix_complaints_queue")],
+}
+
+def get_schema_version(conn):
+    """Return the stamped schema version, or None for an empty database."""
+    inspector = inspect(conn)
+    if inspector.has_table(SchemaVersion.__tablename__):
+        version = conn.execute(select(SchemaVersion.version)).scalar()
+        if version is not None:
+            return version
+    # Databases created before versioning match the version 1 schema
+    if inspector.has_table("complaints"):
+        return 1
+    return None
 
 def init_database():
-    """Initialize database and create all tables."""
+    """Initialize database, create all tables and migrate to SCHEMA_VERSION."""
     print("Initializing database...")
-    
-    engine = create_engine(DATABASE_URL, echo=True)
-    
+
+    engine = create_database_engine(DATABASE_URL, echo=True)
+
     try:
-        # Create all tables
-        Base.metadata.create_all(bind=engine)
+        with engine.begin() as conn:
+            current = get_schema_version(conn)
+
+            # Create any missing tables
+            Base.metadata.create_all(bind=conn)
+
+            if current is not None:
+                for version in range(current + 1, SCHEMA_VERSION + 1):
+                    for step in MIGRATIONS.get(version, []):
+                        if callable(step):
+                            step(conn)
+                        else:
+                            conn.execute(text(step))
+                    print(f"✅ Migrated to schema version {version}")
+
+            # Counter row of the former delta feed sequence; changes are stamped at commit now
+            generations = CacheGeneration.__table__
+            conn.execute(generations.delete().where(generations.c.name == "complaint_changes"))
+
+            conn.execute(SchemaVersion.__table__.delete())
+            conn.execute(SchemaVersion.__table__.insert().values(id=1, version=SCHEMA_VERSION))
+
         print("✅ Database initialized successfully!")
-        print("✅ All tables created!")
-        
+        print(f"✅ All tables created! (schema version {SCHEMA_VERSION})")
+
     except Exception as e:
         print(f"❌ Error initializing database: {e}")
         return False
-    
+
     return True
 
 if __name__ == "__main__":
     success = init_database()
     if not success:
         sys.exit(1)
-    
+
     print("\n🚀 Database is ready!")
-    print("Next step: Run 'python scripts/seed_data.py' to populate with sample data.")
\ No newline at end of file
+    print("Next step: Run 'python scripts/seed_data.py' to populate with sample data.")
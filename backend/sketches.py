@@ -0,0 +1,172 @@
+"""Mergeable quantile sketches for resolution-time percentiles.
+
+Closing a complaint for the first time adds its resolution time (hours) to
+a DDSketch kept per (team, product, severity, month) in the
+``resolution_sketches`` table; closing it again after a reopen does not
+count it twice.
+Percentiles for any combination of those filters are answered by merging the
+matching sketches, without touching the complaints themselves. Every
+quantile is within RELATIVE_ACCURACY of the exact value.
+"""
+
+import math
+import struct
+from array import array
+from collections import defaultdict
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import select, union_all, update
+from sqlalchemy.exc import IntegrityError
+
+import models
+
+RELATIVE_ACCURACY = 0.01
+# Resolution times below this (in hours) are counted as zero
+MIN_VALUE = 1e-6
+
+# accuracy, zero count, number of bins; then int16 bin keys and uint32 counts
+_HEADER = struct.Struct("<dQI")
+
+class DDSketch:
+    """Quantile sketch with logarithmic buckets (Masson et al., VLDB 2019)."""
+
+    def __init__(self, relative_accuracy: float = RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins = defaultdict(int)
+        self.zero_count = 0
+
+    @property
+    def count(self) -> int:
+        return self.zero_count + sum(self.bins.values())
+
+    def add(self, value: float, weight: int = 1):
+        if value < MIN_VALUE:
+            self.zero_count += weight
+        else:
+            self.bins[math.ceil(math.log(value) / self._log_gamma)] += weight
+
+    def merge(self, other: "DDSketch"):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        self.zero_count += other.zero_count
+        for key, count in other.bins.items():
+            self.bins[key] += count
+
+    def quantile(self, q: float) -> Optional[float]:
+        total = self.count
+        if total == 0:
+            return None
+        rank = q * (total - 1)
+        seen = self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+    def to_bytes(self) -> bytes:
+        keys = sorted(self.bins)
+        return (
+            _HEADER.pack(self.relative_accuracy, self.zero_count, len(keys))
+            + array("h", keys).tobytes()
+            + array("I", (self.bins[key] for key in keys)).tobytes()
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "DDSketch":
+        relative_accuracy, zero_count, n = _HEADER.unpack_from(data)
+        sketch = cls(relative_accuracy)
+        sketch.zero_count = zero_count
+        offset = _HEADER.size
+        keys = array("h")
+        keys.frombytes(data[offset:offset + 2 * n])
+        counts = array("I")
+        counts.frombytes(data[offset + 2 * n:offset + 6 * n])
+        sketch.bins.update(zip(keys, counts))
+        return sketch
+
+def resolution_hours(complaint) -> Optional[float]:
+    if complaint.resolution_time is None or complaint.created_at is None:
+        return None
+    return max((complaint.resolution_time - complaint.created_at).total_seconds() / 3600, 0.0)
+
+def _sketch_key(complaint) -> dict:
+    return {
+        "team_id": complaint.assigned_team_id or 0,
+        "product": complaint.product,
+        "severity": complaint.severity,
+        "month": complaint.resolution_time.strftime("%Y-%m"),
+    }
+
+def _group_resolutions(complaints, grouped=None) -> dict:
+    """Build one sketch per (team, product, severity, month) key."""
+    grouped = defaultdict(DDSketch) if grouped is None else grouped
+    for complaint in complaints:
+        hours = resolution_hours(complaint)
+        if hours is not None:
+            grouped[tuple(_sketch_key(complaint).values())].add(hours)
+    return grouped
+
+def _merge_into_table(db, grouped: dict):
+    table = models.ResolutionSketch.__table__
+    for (team_id, product, severity, month), added in grouped.items():
+        match = (
+            (table.c.team_id == team_id) & (table.c.product == product)
+            & (table.c.severity == severity) & (table.c.month == month)
+        )
+        row = db.execute(select(table.c.id, table.c.sketch).where(match).with_for_update()).first()
+        if row is None:
+            try:
+                with db.begin_nested():
+                    db.execute(table.insert().values(
+                        team_id=team_id, product=product, severity=severity, month=month,
+                        count=added.count, sketch=added.to_bytes(), updated_at=datetime.utcnow()
+                    ))
+                continue
+            except IntegrityError:
+                # Created concurrently; merge into that row instead
+                row = db.execute(select(table.c.id, table.c.sketch).where(match).with_for_update()).first()
+        sketch = DDSketch.from_bytes(row.sketch)
+        sketch.merge(added)
+        db.execute(update(table).where(table.c.id == row.id).values(
+            count=sketch.count, sketch=sketch.to_bytes(), updated_at=datetime.utcnow()
+        ))
+
+def record_resolutions(db, complaints):
+    """Add closed complaints to their sketches in the caller's transaction."""
+    _merge_into_table(db, _group_resolutions(complaints))
+
+def rebuild(conn):
+    """Rebuild all sketches from closed complaints, archived ones included (used by init_db.py)."""
+    closed = union_all(*[
+        select(
+            table.c.assigned_team_id, table.c.product, table.c.severity,
+            table.c.created_at, table.c.resolution_time
+        ).where(
+            table.c.status == models.ComplaintStatus.CLOSED,
+            table.c.resolution_time.isnot(None)
+        )
+        for table in (models.Complaint.__table__, models.ArchivedComplaint.__table__)
+    ])
+    result = conn.execute(closed.execution_options(yield_per=10000))
+    # Sketch all rows first; the streaming cursor must be drained before writing
+    grouped = defaultdict(DDSketch)
+    for partition in result.partitions():
+        _group_resolutions(partition, grouped)
+    conn.execute(models.ResolutionSketch.__table__.delete())
+    _merge_into_table(conn, grouped)
+
+def merged_percentiles(rows, quantiles) -> dict:
+    """Merge sketch rows and return {"count", "percentiles"}."""
+    merged = DDSketch()
+    for row in rows:
+        merged.merge(DDSketch.from_bytes(row.sketch))
+    return {
+        "count": merged.count,
+        "percentiles": {f"p{q * 100:g}": merged.quantile(q) for q in quantiles},
+    }
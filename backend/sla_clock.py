@@ -0,0 +1,263 @@
+"""Business-hours SLA clock.
+
+SLA hours count working time only: the working days and hours of the
+complaint's team (``team_calendars``, or the SLA_WEEKMASK / SLA_DAY_START /
+SLA_DAY_END default) minus holidays (``holidays``, for every team or one).
+Working hours are in the same clock as the stored timestamps (UTC).
+
+Calendars are plain NumPy business-day calendars, so deadlines and elapsed
+business time are computed for whole arrays of timestamps at once with
+``np.busday_offset`` / ``np.busday_count``; the scalar helpers are one-element
+calls of the same code. The loaded calendars are cached per worker and
+dropped when the admin endpoints bump the ``calendars`` cache generation;
+they are reloaded through a new primary session, since the caller's may be
+a replica that has not seen the change yet.
+"""
+
+import os
+import threading
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import and_, bindparam, or_, select, update
+
+import cache
+import changes
+from database import SessionLocal
+import models
+
+SLA_WEEKMASK = os.getenv("SLA_WEEKMASK", "1111100")
+SLA_DAY_START = os.getenv("SLA_DAY_START", "09:00")
+SLA_DAY_END = os.getenv("SLA_DAY_END", "17:00")
+RECOMPUTE_BATCH_SIZE = 5000
+
+CALENDARS = "calendars"
+# complaints.sla_hours column default
+DEFAULT_HOURS = 24
+NO_TEAM = -1
+
+# busday_count origin; any fixed working-day-aligned date works
+_ORIGIN = np.datetime64("2000-01-03", "D")
+
+_lock = threading.Lock()
+_calendars = None
+# Invalidations so far; a load racing one is returned but not installed
+_generation = 0
+
+def parse_time(value: str) -> int:
+    """Seconds after midnight of an "HH:MM" time."""
+    hours, _, minutes = value.partition(":")
+    hours, minutes = int(hours), int(minutes or 0)
+    if not (0 <= hours <= 24 and 0 <= minutes < 60) or hours * 60 + minutes > 24 * 60:
+        raise ValueError(f"Invalid time of day: {value!r}")
+    return hours * 3600 + minutes * 60
+
+class BusinessCalendar:
+    """Working days, working hours and holidays of one team."""
+
+    def __init__(self, weekmask: str = SLA_WEEKMASK, day_start: str = SLA_DAY_START,
+                 day_end: str = SLA_DAY_END, holidays=()):
+        self.weekmask = weekmask
+        self.day_start = day_start
+        self.day_end = day_end
+        self.start = parse_time(day_start)
+        self.end = parse_time(day_end)
+        if self.end <= self.start:
+            raise ValueError("Working day must end after it starts")
+        self.day_seconds = self.end - self.start
+        self.busdaycal = np.busdaycalendar(weekmask=weekmask, holidays=np.array(sorted(holidays), dtype="datetime64[D]"))
+
+    def _split(self, times):
+        times = np.asarray(times, dtype="datetime64[s]")
+        days = times.astype("datetime64[D]")
+        return days, (times - days).astype(np.int64)
+
+    def add_hours(self, starts, hours) -> np.ndarray:
+        """Deadlines ``hours`` business hours after each of ``starts``."""
+        days, seconds = self._split(starts)
+        working_day = np.is_busday(days, busdaycal=self.busdaycal)
+        # Outside working time the clock starts at the next opening
+        closed = ~working_day | (seconds >= self.end)
+        days = np.busday_offset(days, np.where(working_day & closed, 1, 0), roll="forward", busdaycal=self.busdaycal)
+        worked = np.where(closed, 0, np.maximum(seconds - self.start, 0))
+
+        total = worked + np.round(np.asarray(hours, dtype=np.float64) * 3600).astype(np.int64)
+        whole_days, rest = np.divmod(total, self.day_seconds)
+        # A deadline exactly at closing time stays on that day
+        at_close = (rest == 0) & (whole_days > 0)
+        whole_days = whole_days - at_close
+        rest = np.where(at_close, self.day_seconds, rest)
+
+        due_days = np.busday_offset(days, whole_days, roll="forward", busdaycal=self.busdaycal)
+        return due_days + (self.start + rest).astype("timedelta64[s]")
+
+    def _position(self, times) -> np.ndarray:
+        """Business seconds from a fixed origin to each of ``times``."""
+        days, seconds = self._split(times)
+        today = np.where(
+            np.is_busday(days, busdaycal=self.busdaycal), np.clip(seconds - self.start, 0, self.day_seconds), 0
+        )
+        return np.busday_count(_ORIGIN, days, busdaycal=self.busdaycal) * self.day_seconds + today
+
+    def hours_between(self, starts, ends) -> np.ndarray:
+        """Business hours from each of ``starts`` to each of ``ends`` (negative if earlier)."""
+        return (self._position(ends) - self._position(starts)) / 3600
+
+    def describe(self) -> dict:
+        return {
+            "weekmask": self.weekmask,
+            "day_start": self.day_start,
+            "day_end": self.day_end,
+            "holidays": [str(day) for day in self.busdaycal.holidays],
+        }
+
+def team_array(team_ids) -> np.ndarray:
+    """Team ids as an int array, NO_TEAM for unassigned."""
+    if isinstance(team_ids, np.ndarray) and team_ids.dtype.kind == "i":
+        return team_ids
+    return np.array([NO_TEAM if team_id is None else team_id for team_id in team_ids], dtype=np.int64)
+
+class Calendars:
+    """The default calendar plus the calendars of teams that differ from it."""
+
+    def __init__(self, default: BusinessCalendar, teams: dict):
+        self.default = default
+        self.teams = teams
+
+    def for_team(self, team_id: Optional[int]) -> BusinessCalendar:
+        return self.teams.get(team_id, self.default)
+
+    def _by_team(self, method: str, first, second, team_ids):
+        """Apply a calendar method element-wise, each element with its team's calendar."""
+        result = getattr(self.default, method)(first, second)
+        if team_ids is None or not self.teams:
+            return result
+        team_ids = team_array(team_ids)
+        first, second = np.broadcast_arrays(first, second)
+        for team_id, calendar in self.teams.items():
+            rows = np.flatnonzero(team_ids == team_id)
+            if rows.size:
+                result[rows] = getattr(calendar, method)(first[rows], second[rows])
+        return result
+
+    def due_at_many(self, created_at, sla_hours, team_ids=None) -> np.ndarray:
+        """Vectorized deadlines: ``sla_hours`` business hours after ``created_at``."""
+        created_at = np.asarray(created_at, dtype="datetime64[s]")
+        sla_hours = np.asarray(sla_hours, dtype=np.float64)
+        return self._by_team("add_hours", created_at, np.where(np.isnan(sla_hours), DEFAULT_HOURS, sla_hours), team_ids)
+
+    def hours_between_many(self, starts, ends, team_ids=None) -> np.ndarray:
+        """Vectorized business hours between pairs of timestamps."""
+        starts = np.asarray(starts, dtype="datetime64[s]")
+        ends = np.asarray(ends, dtype="datetime64[s]")
+        return self._by_team("hours_between", starts, ends, team_ids)
+
+def build_calendars(db) -> Calendars:
+    """Read calendars and holidays through a session or connection, without caching."""
+    holidays = {}
+    for day, team_id in db.execute(select(models.Holiday.date, models.Holiday.team_id)):
+        holidays.setdefault(team_id, set()).add(day)
+    common = holidays.get(None, set())
+    custom = {
+        row.team_id: row
+        for row in db.execute(select(
+            models.TeamCalendar.team_id, models.TeamCalendar.weekmask,
+            models.TeamCalendar.day_start, models.TeamCalendar.day_end
+        ))
+    }
+    teams = {}
+    for team_id in (set(custom) | set(holidays)) - {None}:
+        row = custom.get(team_id)
+        teams[team_id] = BusinessCalendar(
+            row.weekmask if row else SLA_WEEKMASK,
+            row.day_start if row else SLA_DAY_START,
+            row.day_end if row else SLA_DAY_END,
+            common | holidays.get(team_id, set())
+        )
+    return Calendars(BusinessCalendar(holidays=common), teams)
+
+def load_calendars(db) -> Calendars:
+    """(Re)load the calendars and cache them, unless invalidated meanwhile."""
+    global _calendars
+    generation = _generation
+    calendars = build_calendars(db)
+    with _lock:
+        if _generation == generation:
+            _calendars = calendars
+    return calendars
+
+def get_calendars(db) -> Calendars:
+    """Cached calendars, loaded from the primary on first use after an invalidation."""
+    calendars = _calendars
+    if calendars is None:
+        with SessionLocal() as primary:
+            calendars = load_calendars(primary)
+    return calendars
+
+def _drop_calendars():
+    global _calendars, _generation
+    with _lock:
+        _generation += 1
+        _calendars = None
+
+cache.on_invalidate(CALENDARS, _drop_calendars)
+
+def due_at(db, created_at: datetime, sla_hours: Optional[int], team_id: Optional[int] = None) -> datetime:
+    """When a complaint created at ``created_at`` breaches its SLA."""
+    calendar = get_calendars(db).for_team(team_id)
+    hours = DEFAULT_HOURS if sla_hours is None else sla_hours
+    return calendar.add_hours(np.array([created_at], dtype="datetime64[s]"), hours)[0].astype(datetime)
+
+def remaining_hours(db, due: datetime, team_id: Optional[int] = None, now: Optional[datetime] = None) -> float:
+    """Business hours left until ``due``; negative once it has passed."""
+    calendar = get_calendars(db).for_team(team_id)
+    return float(calendar.hours_between([now or datetime.utcnow()], [due])[0])
+
+def breached(model, now: datetime):
+    """SQL condition: a complaint of ``model`` missed or is past its deadline."""
+    return or_(
+        model.sla_breach == True,
+        and_(model.status != models.ComplaintStatus.CLOSED, model.due_at < now),
+        model.resolution_time > model.due_at,
+    )
+
+def recompute_due_at(db, team_ids=None, stamp: bool = True) -> int:
+    """Re-time the deadlines of open complaints after a calendar change.
+
+    Runs in the caller's transaction with the calendars as the session sees
+    them, limited to complaints of ``team_ids`` (None for all). Changed rows
+    get a new version and, if ``stamp``, the transaction's change number;
+    returns how many changed.
+    """
+    complaints = models.Complaint.__table__
+    stmt = select(
+        complaints.c.id, complaints.c.created_at, complaints.c.sla_hours,
+        complaints.c.assigned_team_id, complaints.c.due_at
+    ).where(complaints.c.status != models.ComplaintStatus.CLOSED, complaints.c.created_at.isnot(None))
+    if team_ids is not None:
+        stmt = stmt.where(complaints.c.assigned_team_id.in_(list(team_ids)))
+    rows = db.execute(stmt).all()
+    if not rows:
+        return 0
+
+    ids, created, hours, teams, due = zip(*rows)
+    new_due = build_calendars(db).due_at_many(
+        np.array(created, dtype="datetime64[s]"),
+        np.array([np.nan if h is None else h for h in hours], dtype=np.float64),
+        team_array(teams)
+    )
+    changed = np.flatnonzero(new_due != np.array(due, dtype="datetime64[s]"))
+    values = new_due[changed].astype(object)
+    stamps = {"change_seq": changes.transaction_seq(db)} if stamp and changed.size else {}
+    for start in range(0, changed.size, RECOMPUTE_BATCH_SIZE):
+        db.execute(
+            update(complaints).where(complaints.c.id == bindparam("complaint_id"))
+            .values(due_at=bindparam("new_due_at"), version=complaints.c.version + 1, **stamps),
+            [
+                {"complaint_id": ids[row], "new_due_at": value}
+                for row, value in zip(changed[start:start + RECOMPUTE_BATCH_SIZE].tolist(),
+                                      values[start:start + RECOMPUTE_BATCH_SIZE])
+            ]
+        )
+    return int(changed.size)
@@ -0,0 +1,311 @@
+"""Parquet snapshots of complaints, complaint history and the SLA matrix.
+
+An admin starts a snapshot job (``POST /api/admin/snapshots``); it runs in a
+background thread and writes one Parquet file per table with typed columns:
+integers, booleans and timestamps keep their types and enum columns
+(status, severity) are dictionary-encoded. Rows are streamed from a
+server-side cursor SNAPSHOT_CHUNK_ROWS at a time and written in row groups
+of SNAPSHOT_ROW_GROUP_ROWS, so memory stays bounded whatever the table size.
+
+- ``full``: every row, under ``SNAPSHOT_DIR/full/<run>/<table>.parquet``.
+- ``incremental``: rows changed since the previous snapshot of either kind,
+  partitioned by the date of their last change under
+  ``SNAPSHOT_DIR/incremental/<table>/updated_date=<date>/<run>.parquet``.
+
+Changes are found by a per-table watermark column: the commit stamps of
+``complaints`` and ``complaint_tombstones`` (``change_seq``, see changes.py),
+``complaint_history.created_at`` and ``sla_matrix.updated_at``. None of them
+is written at the instant its row becomes visible, so a run does not stop at
+the highest value it saw: it exports up to a horizon SNAPSHOT_LAG_SECONDS
+before it started and the next run continues from that horizon, kept in
+``SNAPSHOT_DIR/state.json``. A row is missed only if its transaction
+committed more than SNAPSHOT_LAG_SECONDS after its stamp.
+
+Complaints that were archived show up as tombstones (with their history
+leaving ``complaint_history``). A full snapshot exports every row, including
+rows newer than its horizon that the next incremental run exports again, so
+consumers keep the latest row per primary key.
+
+Files are written under a temporary name and renamed when complete; a run
+counts once its JSON manifest exists (``<run>/_manifest.json``,
+``incremental/_runs/<run>.json``).
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from itertools import groupby
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import BigInteger, Boolean, Date, DateTime, Enum, Float, Integer, LargeBinary, select
+
+from database import ReadSessionLocal
+import models
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshots")
+SNAPSHOT_CHUNK_ROWS = int(os.getenv("SNAPSHOT_CHUNK_ROWS", "10000"))
+SNAPSHOT_ROW_GROUP_ROWS = int(os.getenv("SNAPSHOT_ROW_GROUP_ROWS", "131072"))
+SNAPSHOT_COMPRESSION = os.getenv("SNAPSHOT_COMPRESSION", "zstd")
+SNAPSHOT_LAG_SECONDS = float(os.getenv("SNAPSHOT_LAG_SECONDS", "300"))
+MAX_JOBS = 20
+
+FULL = "full"
+INCREMENTAL = "incremental"
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+# name -> (model, watermark column, partition column)
+TABLES = {
+    "complaints": (models.Complaint, "change_seq", "updated_at"),
+    "complaint_tombstones": (models.ComplaintTombstone, "change_seq", "created_at"),
+    "complaint_history": (models.ComplaintHistory, "created_at", "created_at"),
+    "sla_matrix": (models.SLAMatrix, "updated_at", "updated_at"),
+}
+
+_lock = threading.Lock()
+_jobs = OrderedDict()
+
+def arrow_type(column) -> pa.DataType:
+    """Arrow type of a SQLAlchemy column; enums become dictionary-encoded strings."""
+    kind = column.type
+    if isinstance(kind, Enum):
+        return pa.dictionary(pa.int8(), pa.string())
+    if isinstance(kind, Boolean):
+        return pa.bool_()
+    if isinstance(kind, BigInteger):
+        return pa.int64()
+    if isinstance(kind, Integer):
+        return pa.int32()
+    if isinstance(kind, Float):
+        return pa.float64()
+    if isinstance(kind, DateTime):
+        return pa.timestamp("us")
+    if isinstance(kind, Date):
+        return pa.date32()
+    if isinstance(kind, LargeBinary):
+        return pa.binary()
+    return pa.string()
+
+def arrow_schema(model) -> pa.Schema:
+    return pa.schema([
+        pa.field(column.name, arrow_type(column), nullable=column.nullable)
+        for column in model.__table__.columns
+    ])
+
+def to_batch(rows, schema: pa.Schema) -> pa.RecordBatch:
+    """Record batch of result rows, column by column."""
+    columns = list(zip(*rows))
+    arrays = []
+    for field, values in zip(schema, columns):
+        if pa.types.is_dictionary(field.type):
+            values = [None if value is None else value.value for value in values]
+        arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+class ParquetSink:
+    """A Parquet file written in row groups of SNAPSHOT_ROW_GROUP_ROWS, renamed into place on close."""
+
+    def __init__(self, path: str, schema: pa.Schema):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.partial = f"{path}.partial"
+        self.writer = pq.ParquetWriter(self.partial, schema, compression=SNAPSHOT_COMPRESSION, use_dictionary=True)
+        self.batches = []
+        self.buffered = 0
+        self.rows = 0
+
+    def write(self, batch: pa.RecordBatch):
+        self.batches.append(batch)
+        self.buffered += batch.num_rows
+        if self.buffered >= SNAPSHOT_ROW_GROUP_ROWS:
+            self._flush()
+
+    def _flush(self):
+        if self.batches:
+            self.writer.write_table(pa.Table.from_batches(self.batches), row_group_size=SNAPSHOT_ROW_GROUP_ROWS)
+            self.rows += self.buffered
+            self.batches, self.buffered = [], 0
+
+    def close(self):
+        self._flush()
+        self.writer.close()
+        os.replace(self.partial, self.path)
+
+    def abort(self):
+        self.writer.close()
+        os.remove(self.partial)
+
+def horizon(name: str, started: float):
+    """Watermark value SNAPSHOT_LAG_SECONDS before ``started`` (a Unix time), in the column's type."""
+    model, watermark_column, _ = TABLES[name]
+    at = started - SNAPSHOT_LAG_SECONDS
+    if isinstance(model.__table__.c[watermark_column].type, DateTime):
+        return datetime.utcfromtimestamp(at)
+    # change_seq: microseconds
+    return int(at * 1_000_000)
+
+def stream(db, model, watermark_column: str, since=None, until=None, order_by=None):
+    """Yield chunks of rows of ``model`` with ``watermark_column`` in (``since``, ``until``], from a server-side cursor."""
+    table = model.__table__
+    stmt = select(table)
+    if since is not None:
+        stmt = stmt.where(table.c[watermark_column] > since)
+    if until is not None:
+        stmt = stmt.where(table.c[watermark_column] <= until)
+    if order_by is not None:
+        stmt = stmt.order_by(table.c[order_by])
+    result = db.execute(stmt, execution_options={"stream_results": True, "yield_per": SNAPSHOT_CHUNK_ROWS})
+    yield from result.partitions(SNAPSHOT_CHUNK_ROWS)
+
+def partition_name(value) -> str:
+    return NULL_PARTITION if value is None else value.date().isoformat()
+
+def export_full(db, name: str, directory: str, state: dict, until) -> int:
+    """Write every row; the next incremental run continues from ``until``."""
+    model, watermark_column, _ = TABLES[name]
+    schema = arrow_schema(model)
+    sink = ParquetSink(os.path.join(directory, f"{name}.parquet"), schema)
+    try:
+        for rows in stream(db, model, watermark_column):
+            sink.write(to_batch(rows, schema))
+        sink.close()
+    except BaseException:
+        sink.abort()
+        raise
+    state[name] = until
+    return sink.rows
+
+def export_incremental(db, name: str, directory: str, run_id: str, state: dict, until) -> dict:
+    """Write the rows changed from the table's watermark up to ``until``, one file per change date; returns rows per date."""
+    model, watermark_column, partition_column = TABLES[name]
+    schema = arrow_schema(model)
+    partition_index = schema.get_field_index(partition_column)
+    partitions = {}
+    sink, current = None, None
+    try:
+        # Ordered by the partition column, so each date's file is written in one go
+        for rows in stream(db, model, watermark_column, since=state.get(name), until=until, order_by=partition_column):
+            for day, group in groupby(rows, key=lambda row: partition_name(row[partition_index])):
+                if sink is None or day != current:
+                    if sink is not None:
+                        sink.close()
+                        partitions[current] = sink.rows
+                    current = day
+                    sink = ParquetSink(os.path.join(directory, name, f"updated_date={day}", f"{run_id}.parquet"), schema)
+                sink.write(to_batch(list(group), schema))
+        if sink is not None:
+            sink.close()
+            partitions[current] = sink.rows
+            sink = None
+    except BaseException:
+        if sink is not None:
+            sink.abort()
+        raise
+    state[name] = until
+    return partitions
+
+def _load_state() -> dict:
+    path = os.path.join(SNAPSHOT_DIR, "state.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        watermarks = json.load(f)["watermarks"]
+    state = {}
+    for name, value in watermarks.items():
+        if name not in TABLES:
+            continue
+        model, watermark_column, _ = TABLES[name]
+        # Timestamp watermarks are stored as ISO strings
+        if isinstance(model.__table__.c[watermark_column].type, DateTime):
+            value = datetime.fromisoformat(value) if isinstance(value, str) else None
+        elif not isinstance(value, int):
+            value = None
+        if value is None:
+            # Written for another watermark column (e.g. history ids before
+            # created_at); the next incremental run exports the whole table
+            logger.warning("Ignoring snapshot watermark %r of %s", watermarks[name], name)
+            continue
+        state[name] = value
+    return state
+
+def _write_json(path: str, data: dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.partial", "w") as f:
+        json.dump(data, f, indent=2, default=lambda value: value.isoformat())
+    os.replace(f"{path}.partial", path)
+
+def take_snapshot(db, mode: str = FULL, run_id: str = None) -> dict:
+    """Export every table in one read transaction; returns the run's manifest."""
+    run_id = run_id or datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    start = time.perf_counter()
+    started = time.time()
+    state = _load_state()
+    tables = {}
+    if mode == FULL:
+        directory = os.path.join(SNAPSHOT_DIR, FULL, run_id)
+        for name in TABLES:
+            tables[name] = {"rows": export_full(db, name, directory, state, horizon(name, started))}
+        manifest_path = os.path.join(directory, "_manifest.json")
+    else:
+        directory = os.path.join(SNAPSHOT_DIR, INCREMENTAL)
+        for name in TABLES:
+            partitions = export_incremental(db, name, directory, run_id, state, horizon(name, started))
+            tables[name] = {"rows": sum(partitions.values()), "partitions": partitions}
+        manifest_path = os.path.join(directory, "_runs", f"{run_id}.json")
+    db.rollback()
+
+    manifest = {
+        "run_id": run_id,
+        "mode": mode,
+        "schema_version": models.SCHEMA_VERSION,
+        "taken_at": datetime.utcnow(),
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 3),
+        "path": directory,
+        "tables": tables,
+        "watermarks": state,
+    }
+    _write_json(manifest_path, manifest)
+    _write_json(os.path.join(SNAPSHOT_DIR, "state.json"), {"watermarks": state, "last_run": run_id})
+    return manifest
+
+def _run(job: dict):
+    db = ReadSessionLocal()
+    try:
+        manifest = take_snapshot(db, job["mode"], job["id"])
+        job.update(status="succeeded", tables=manifest["tables"], path=manifest["path"])
+        logger.info("Snapshot %s (%s) written to %s", job["id"], job["mode"], manifest["path"])
+    except Exception as e:
+        logger.exception("Snapshot %s failed", job["id"])
+        job.update(status="failed", error=str(e))
+    finally:
+        db.close()
+        job["finished_at"] = datetime.utcnow()
+        _lock.release()
+
+def start(mode: str) -> dict:
+    """Start a snapshot job in the background; None if one is already running."""
+    if not _lock.acquire(blocking=False):
+        return None
+    job = {
+        "id": f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:6]}",
+        "mode": mode,
+        "status": "running",
+        "started_at": datetime.utcnow(),
+        "finished_at": None,
+    }
+    _jobs[job["id"]] = job
+    while len(_jobs) > MAX_JOBS:
+        _jobs.popitem(last=False)
+    threading.Thread(target=_run, args=(job,), name=f"snapshot-{job['id']}", daemon=True).start()
+    return job
+
+def jobs() -> list:
+    """Recent jobs, newest first."""
+    return [dict(job) for job in reversed(_jobs.values())]
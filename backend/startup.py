@@ -0,0 +1,84 @@
+"""Application startup: schema version check and warm-up."""
+
+import logging
+import time
+
+from sqlalchemy import select, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from database import engine, read_engine, SessionLocal, replicas
+import analytics
+import archive
+import cache
+import models
+import reference_data
+import user_index
+
+logger = logging.getLogger(__name__)
+
+def check_schema_version(db):
+    """Fail fast unless the database is stamped with models.SCHEMA_VERSION."""
+    try:
+        version = db.execute(select(models.SchemaVersion.version)).scalar()
+    except SQLAlchemyError as e:
+        raise RuntimeError(
+            "Could not read database schema version; run 'python scripts/init_db.py'"
+        ) from e
+    if version != models.SCHEMA_VERSION:
+        raise RuntimeError(
+            f"Database schema version {version} does not match application version "
+            f"{models.SCHEMA_VERSION}; run 'python scripts/init_db.py'"
+        )
+    return version
+
+def warm_pool(bind=engine) -> int:
+    """Open the pool's steady-state connections so first requests skip connect."""
+    size = bind.pool.size() if hasattr(bind.pool, "size") else 1
+    connections = []
+    try:
+        for _ in range(size):
+            conn = bind.connect()
+            conn.execute(text("SELECT 1"))
+            connections.append(conn)
+    finally:
+        for conn in connections:
+            conn.close()
+    return len(connections)
+
+def run_startup() -> dict:
+    """Run all startup phases and return their timings in milliseconds."""
+    timings = {}
+
+    start = time.perf_counter()
+    db = SessionLocal()
+    try:
+        check_schema_version(db)
+        timings["schema_check_ms"] = (time.perf_counter() - start) * 1000
+
+        phase = time.perf_counter()
+        warmed = warm_pool()
+        if read_engine is not engine:
+            warmed += warm_pool(read_engine)
+        timings["pool_warmup_ms"] = (time.perf_counter() - phase) * 1000
+
+        phase = time.perf_counter()
+        replicas.start()
+        timings["replica_check_ms"] = (time.perf_counter() - phase) * 1000
+
+        phase = time.perf_counter()
+        loaded = reference_data.load_all(db)
+        timings["reference_data_ms"] = (time.perf_counter() - phase) * 1000
+    finally:
+        db.close()
+
+    cache.start()
+    # Built in the background; the first lookup builds it if still missing
+    user_index.schedule_rebuild()
+    analytics.start()
+    archive.start()
+
+    logger.info(
+        "Startup complete: schema v%s, %d pooled connections, %s",
+        models.SCHEMA_VERSION, warmed, ", ".join(f"{count} {name}" for name, count in loaded.items())
+    )
+    return {name: round(value, 3) for name, value in timings.items()}
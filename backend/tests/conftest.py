@@ -0,0 +1,7 @@
+import os
+import sys
+import tempfile
+
+# database.py reads DATABASE_URL at import time; tests use a scratch SQLite file
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='complaints-tests-'), 'primary.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
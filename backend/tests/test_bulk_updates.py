@@ -0,0 +1,43 @@
+"""Bulk results reflect the rows the scoped UPDATE actually changed."""
+
+import uuid
+from types import SimpleNamespace
+
+from sqlalchemy import update
+
+import changes
+import database
+import models
+from routers.complaints import updated_targets
+
+def add_complaint(team_id) -> int:
+    with database.SessionLocal() as db:
+        complaint = models.Complaint(
+            complaint_number=uuid.uuid4().hex[:20], product="Loan", issue="Processing Delay",
+            description="Bulk test", severity=models.ComplaintSeverity.LOW, customer_id=1,
+            sla_hours=24, assigned_team_id=team_id
+        )
+        db.add(complaint)
+        db.commit()
+        return complaint.id
+
+def test_rows_the_update_did_not_change_are_rejected():
+    models.Base.metadata.create_all(database.engine)
+    kept, moved, deleted = add_complaint(1), add_complaint(1), add_complaint(1)
+    # Selected for team 1, then one complaint moves to team 2 and one disappears
+    with database.engine.begin() as conn:
+        conn.execute(update(models.Complaint.__table__).where(models.Complaint.id == moved).values(assigned_team_id=2))
+        conn.execute(models.Complaint.__table__.delete().where(models.Complaint.id == deleted))
+    targets = [SimpleNamespace(id=complaint_id) for complaint_id in (kept, moved, deleted)]
+    
+    with database.SessionLocal() as db:
+        db.execute(
+            update(models.Complaint)
+            .where(models.Complaint.id.in_([kept, moved, deleted]), models.Complaint.assigned_team_id == 1)
+            .values(status=models.ComplaintStatus.PENDING, change_seq=changes.transaction_seq(db))
+        )
+        updated, rejected = updated_targets(db, targets)
+        db.rollback()
+    
+    assert [row.id for row in updated] == [kept]
+    assert rejected == {moved: "forbidden", deleted: "not_found"}
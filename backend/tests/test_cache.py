@@ -0,0 +1,72 @@
+"""Cache generations: callbacks for a worker's own bumps and for other workers'."""
+
+import pytest
+
+import cache
+import database
+import models
+
+@pytest.fixture
+def generations(monkeypatch):
+    models.CacheGeneration.__table__.create(database.engine, checkfirst=True)
+    monkeypatch.setattr(cache, "_callbacks", cache.defaultdict(list))
+    monkeypatch.setattr(cache, "_remote_callbacks", cache.defaultdict(list))
+    monkeypatch.setattr(cache, "_seen", {})
+    calls = []
+    cache.on_invalidate("test", lambda: calls.append("local"))
+    cache.on_invalidate("test", lambda: calls.append("remote"), local=False)
+    with database.SessionLocal() as db:
+        cache.sync(db)
+    return calls
+
+def bump():
+    with database.SessionLocal() as db:
+        cache.bump(db, "test")
+        db.commit()
+
+def sync():
+    with database.SessionLocal() as db:
+        cache.sync(db)
+
+def test_own_bump_skips_remote_callbacks(generations):
+    bump()
+    assert generations == ["local"]
+    sync()
+    assert generations == ["local"]
+
+def test_other_workers_bump_runs_every_callback(generations):
+    with database.engine.begin() as conn:
+        conn.execute(
+            models.CacheGeneration.__table__.update()
+            .where(models.CacheGeneration.name == "test")
+            .values(generation=models.CacheGeneration.generation + 1)
+        )
+    bump()
+    # Another worker bumped since the last sync, so our commit runs everything
+    assert generations == ["local", "remote"]
+    sync()
+    assert generations == ["local", "remote"]
+
+def test_sync_runs_every_callback(generations):
+    with database.engine.begin() as conn:
+        conn.execute(
+            models.CacheGeneration.__table__.update()
+            .where(models.CacheGeneration.name == "test")
+            .values(generation=models.CacheGeneration.generation + 1)
+        )
+    sync()
+    assert generations == ["local", "remote"]
+
+def test_bumps_apply_at_commit_after_a_rolled_back_savepoint(generations):
+    with database.SessionLocal() as db:
+        before = cache.current(db, "test")
+        cache.bump(db, "test")
+        assert cache.current(db, "test") == before
+        try:
+            with db.begin_nested():
+                db.execute(models.CacheGeneration.__table__.insert().values(name="test", generation=0))
+        except cache.IntegrityError:
+            pass
+        db.commit()
+        assert cache.current(db, "test") == before + 1
+    assert generations == ["local"]
@@ -0,0 +1,153 @@
+"""Delta feed stamps: taken at commit, and never skipped by a cursor."""
+
+import os
+import random
+import subprocess
+import sys
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import update
+
+import changes
+import database
+import models
+from routers.complaints import list_changes
+
+ADMIN = SimpleNamespace(id=1, role=models.UserRole.ADMIN, team_id=None)
+SECOND = 1_000_000
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake microsecond clock; set ``clock["now"]`` to move it."""
+    models.Base.metadata.create_all(database.engine)
+    with database.engine.begin() as conn:
+        conn.execute(models.Complaint.__table__.delete())
+        conn.execute(models.ComplaintTombstone.__table__.delete())
+    state = {"now": 1_700_000_000 * SECOND}
+    monkeypatch.setattr(changes, "_now_us", lambda: state["now"])
+    monkeypatch.setattr(changes, "_last_stamp", 0)
+    monkeypatch.setattr(changes, "CHANGE_FEED_LAG_SECONDS", 5)
+    return state
+
+def new_complaint() -> models.Complaint:
+    return models.Complaint(
+        complaint_number=uuid.uuid4().hex[:20], product="Loan", issue="Processing Delay",
+        description="Change feed test", severity=models.ComplaintSeverity.LOW, customer_id=1, sla_hours=24
+    )
+
+def write() -> int:
+    with database.SessionLocal() as db:
+        complaint = new_complaint()
+        db.add(complaint)
+        db.commit()
+        return complaint.id
+
+def stamp_of(complaint_id: int) -> int:
+    with database.SessionLocal() as db:
+        return db.get(models.Complaint, complaint_id).change_seq
+
+def poll(cursor: tuple) -> tuple:
+    """Every page from ``cursor``; returns the complaint ids seen and the new cursor."""
+    seen = []
+    with database.SessionLocal() as db:
+        while True:
+            page = list_changes(db, ADMIN, cursor, limit=7)
+            seen += [complaint.id for complaint in page["complaints"]]
+            cursor = changes.decode_cursor(page["next_cursor"])
+            if not page["has_more"]:
+                return seen, cursor
+
+def test_stamp_is_the_commit_time(clock):
+    with database.SessionLocal() as db:
+        complaint = new_complaint()
+        db.add(complaint)
+        db.flush()
+        assert complaint.change_seq < 0
+        clock["now"] += 2 * SECOND
+        db.commit()
+        complaint_id = complaint.id
+    assert stamp_of(complaint_id) == clock["now"]
+
+def test_set_based_updates_and_tombstones_get_the_same_stamp(clock):
+    first, second = write(), write()
+    clock["now"] += SECOND
+    with database.SessionLocal() as db:
+        db.execute(
+            update(models.Complaint).where(models.Complaint.id == first)
+            .values(description="Updated", change_seq=changes.transaction_seq(db))
+        )
+        changes.record_tombstones(db, [second], "archived")
+        db.commit()
+        tombstone = db.query(models.ComplaintTombstone).filter_by(complaint_id=second).one()
+        assert tombstone.change_seq == clock["now"]
+    assert stamp_of(first) == clock["now"]
+
+def test_rolled_back_savepoint_keeps_the_transaction_marker(clock):
+    with database.SessionLocal() as db:
+        complaint = new_complaint()
+        db.add(complaint)
+        db.flush()
+        with pytest.raises(Exception):
+            with db.begin_nested():
+                db.add(models.Complaint(complaint_number=complaint.complaint_number))
+                db.flush()
+        db.commit()
+        complaint_id = complaint.id
+    assert stamp_of(complaint_id) == clock["now"]
+
+def test_first_commit_of_a_process_is_stamped(clock):
+    # Scripts such as seed_data import only the models before their first commit
+    script = (
+        "import database, models\n"
+        "db = database.SessionLocal()\n"
+        "db.add(models.Complaint(complaint_number='FRESH', product='Loan', issue='Delay', description='x',"
+        " severity=models.ComplaintSeverity.LOW, customer_id=1, sla_hours=24))\n"
+        "db.commit()\n"
+        "print(db.query(models.Complaint.change_seq).filter_by(complaint_number='FRESH').scalar())\n"
+    )
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, "-c", script], cwd=backend, capture_output=True, text=True, check=True)
+    assert int(result.stdout.strip().splitlines()[-1]) > 0
+
+def test_changes_inside_the_lag_window_are_held_back(clock):
+    complaint_id = write()
+    clock["now"] += 4 * SECOND
+    seen, cursor = poll((0, 0))
+    assert seen == [] and cursor == (0, 0)
+    clock["now"] += 2 * SECOND
+    assert poll(cursor)[0] == [complaint_id]
+
+def commit_late(clock, writes: int, max_delay: float) -> tuple:
+    """Writers stamp in order but commit up to ``max_delay`` seconds later; a client polls after each commit.
+
+    Returns the ids written and the ids the client saw.
+    """
+    rng = random.Random(7)
+    start = clock["now"]
+    events = sorted(
+        (stamped + rng.uniform(0, max_delay) * SECOND, stamped)
+        for stamped in (start + i * SECOND // 2 for i in range(writes))
+    )
+    written, seen, cursor = [], [], (0, 0)
+    for visible, stamped in events:
+        # Each commit as if by another worker, with its own clock reading
+        clock["now"] = stamped
+        changes._last_stamp = 0
+        written.append(write())
+        clock["now"] = visible
+        page, cursor = poll(cursor)
+        seen += page
+    clock["now"] = events[-1][0] + 60 * SECOND
+    seen += poll(cursor)[0]
+    return written, seen
+
+def test_cursor_never_skips_a_change(clock):
+    written, seen = commit_late(clock, writes=40, max_delay=4.9)
+    assert sorted(seen) == sorted(written)
+
+def test_without_the_lag_window_late_commits_are_skipped(clock, monkeypatch):
+    monkeypatch.setattr(changes, "CHANGE_FEED_LAG_SECONDS", 0)
+    written, seen = commit_late(clock, writes=40, max_delay=4.9)
+    assert len(set(seen)) < len(written)
@@ -0,0 +1,27 @@
+"""Chatbot session store bounds."""
+
+import pytest
+from pydantic import ValidationError
+
+import chat_sessions
+import schemas
+
+def test_empty_sessions_count_against_the_budget():
+    store = chat_sessions.SessionStore(max_bytes=50_000, per_user=10_000)
+    for user_id in range(1000):
+        store.session(user_id, f"context-{user_id}")
+    stats = store.stats()
+    assert 0 < stats["bytes"] <= 50_000
+    assert stats["sessions"] < 1000
+
+def test_sessions_per_user_are_capped():
+    store = chat_sessions.SessionStore(per_user=3)
+    for n in range(10):
+        store.session(1, f"context-{n}")
+    store.session(2)
+    assert [session["context"] for session in store.sessions(1)] == ["context-9", "context-8", "context-7"]
+    assert len(store.sessions(2)) == 1
+
+def test_context_length_is_limited():
+    with pytest.raises(ValidationError):
+        schemas.ChatbotQuery(query="hi", context="x" * 65)
@@ -0,0 +1,45 @@
+"""Outbox results recorded after a dispatcher's lease expired."""
+
+import uuid
+
+from sqlalchemy import update
+
+import database
+import models
+import notifications
+
+def claim(n: int) -> list:
+    models.Base.metadata.create_all(database.engine)
+    with database.SessionLocal() as db:
+        db.query(models.OutboxMessage).delete()
+        for _ in range(n):
+            db.add(models.OutboxMessage(
+                channel=notifications.EMAIL, dedup_key=uuid.uuid4().hex, recipient="ops@bank.com",
+                subject="Complaint", body="Updated"
+            ))
+        db.commit()
+        return notifications.claim_batch(db, [notifications.EMAIL])
+
+def reclaim(message_id: int):
+    """Another dispatcher leases the message after the first one's lease ran out."""
+    with database.SessionLocal() as db:
+        db.execute(
+            update(models.OutboxMessage).where(models.OutboxMessage.id == message_id)
+            .values(claim_token="other-dispatcher")
+        )
+        db.commit()
+
+def row(message_id: int):
+    with database.SessionLocal() as db:
+        return db.get(models.OutboxMessage, message_id)
+
+def test_results_of_an_expired_lease_are_dropped():
+    delivered, failed, kept = claim(3)
+    reclaim(delivered.id)
+    reclaim(failed.id)
+    with database.SessionLocal() as db:
+        notifications.record_results(db, [(delivered, None), (failed, "SMTPException: timeout"), (kept, None)])
+    for message in (delivered, failed):
+        current = row(message.id)
+        assert (current.status, current.attempts, current.claim_token) == (notifications.PENDING, 0, "other-dispatcher")
+    assert row(kept.id).status == notifications.SENT
@@ -0,0 +1,70 @@
+"""Read-your-writes routing, with two SQLite files standing in for the primary and a replica."""
+
+import time
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+import database
+
+@pytest.fixture
+def replica(tmp_path, monkeypatch):
+    """A healthy replica that never receives the primary's writes."""
+    pool = database.ReplicaPool([f"sqlite:///{tmp_path / 'replica.db'}"])
+    for engine in (database.engine, pool.replicas[0].engine):
+        with engine.begin() as conn:
+            conn.execute(text("DROP TABLE IF EXISTS notes"))
+            conn.execute(text("CREATE TABLE notes (body TEXT)"))
+    pool.check_all()
+    monkeypatch.setattr(database, "replicas", pool)
+    return pool
+
+def make_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(database.ReadYourWritesMiddleware)
+
+    @app.post("/notes")
+    def add_note(db=Depends(database.get_db)):
+        db.execute(text("INSERT INTO notes VALUES ('hello')"))
+        db.commit()
+        return {}
+
+    @app.get("/notes")
+    def count_notes(db=Depends(database.get_read_db)):
+        return db.execute(text("SELECT count(*) FROM notes")).scalar()
+
+    @app.get("/primary")
+    def read_primary(db=Depends(database.get_db)):
+        return db.execute(text("SELECT count(*) FROM notes")).scalar()
+
+    return app
+
+def test_only_committed_writes_set_the_header(replica):
+    client = TestClient(make_app())
+    assert database.LAST_WRITE_HEADER not in client.get("/primary").headers
+    response = client.post("/notes")
+    assert abs(float(response.headers[database.LAST_WRITE_HEADER]) - time.time()) < 5
+
+def test_echoed_write_time_reads_from_primary(replica):
+    client = TestClient(make_app())
+    last_write = client.post("/notes").headers[database.LAST_WRITE_HEADER]
+    assert client.get("/notes").json() == 0
+    assert client.get("/notes", headers={database.LAST_WRITE_HEADER: last_write}).json() == 1
+
+def test_write_time_works_across_workers(replica):
+    # Separate apps stand in for gunicorn workers: nothing is shared but the header
+    writer, reader = TestClient(make_app()), TestClient(make_app())
+    last_write = writer.post("/notes").headers[database.LAST_WRITE_HEADER]
+    assert reader.get("/notes", headers={database.LAST_WRITE_HEADER: last_write}).json() == 1
+
+@pytest.mark.parametrize("value", [
+    "not-a-time",
+    str(time.time() - 10 * database.READ_YOUR_WRITES_SECONDS),
+    str(time.time() + 10 * database.READ_YOUR_WRITES_SECONDS),
+])
+def test_old_or_invalid_write_time_reads_from_replica(replica, value):
+    client = TestClient(make_app())
+    client.post("/notes")
+    assert client.get("/notes", headers={database.LAST_WRITE_HEADER: value}).json() == 0
@@ -0,0 +1,73 @@
+"""Reference data loads racing with invalidations."""
+
+from types import SimpleNamespace
+
+import database
+import models
+import reference_data
+
+class RacingSession:
+    """Returns ``rows`` for any query, after running ``invalidate`` as if it arrived mid-read."""
+
+    def __init__(self, rows, invalidate):
+        self.rows = rows
+        self.invalidate = invalidate
+
+    def query(self, *entities):
+        self.invalidate()
+        return self
+
+    def filter(self, *criteria):
+        return self
+
+    def distinct(self):
+        return self
+
+    def all(self):
+        return list(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+TEAM = SimpleNamespace(id=1, name="Cards", manager_id=2, team_lead_id=3, is_active=True)
+
+def test_load_racing_an_invalidation_is_not_installed():
+    teams = reference_data.load_teams(RacingSession([TEAM], reference_data._drop_teams))
+    assert teams[1]["name"] == "Cards"
+    assert reference_data._teams is None
+
+def test_load_without_invalidation_is_installed():
+    reference_data.load_teams(RacingSession([TEAM], lambda: None))
+    assert reference_data._teams[1]["manager_id"] == 2
+
+def test_lazy_reload_reads_the_primary(monkeypatch):
+    models.Base.metadata.create_all(database.engine)
+    with database.SessionLocal() as db:
+        team = models.Team(name="Loans", manager_id=2)
+        db.add(team)
+        db.commit()
+        team_id = team.id
+    monkeypatch.setattr(reference_data, "_teams", None)
+    # A replica that is behind and has no teams yet
+    behind = RacingSession([], lambda: None)
+    assert team_id in reference_data.managed_team_ids(behind, 2)
+    assert team_id in reference_data._teams
+
+RULE = ("Cards", None, "Fraud", None)
+
+def test_taxonomy_racing_an_invalidation_is_not_installed(monkeypatch):
+    def invalidate():
+        reference_data._drop_sla_rules()
+        # Another request reloads the rules meanwhile
+        monkeypatch.setattr(reference_data, "_sla_hours", {})
+    
+    reference_data.load_taxonomy(RacingSession([RULE], invalidate))
+    assert reference_data._taxonomy is None
+
+def test_taxonomy_keeps_zero_hour_sla(monkeypatch):
+    monkeypatch.setattr(reference_data, "_sla_hours", {("Cards", "Fraud", "critical"): 0})
+    taxonomy = reference_data.load_taxonomy(RacingSession([RULE], lambda: None))
+    hours = taxonomy["products"][0]["subproducts"][0]["issues"][0]["subissues"][0]["sla_hours"]
+    assert hours["critical"] == 0
+    assert hours["low"] == reference_data.DEFAULT_SLA_HOURS["low"]
+    assert reference_data._taxonomy is taxonomy
@@ -0,0 +1,38 @@
+"""Calendar loads racing with invalidations."""
+
+import database
+import models
+import sla_clock
+
+class RacingSession:
+    """Returns no rows, after running ``invalidate`` as if it arrived mid-read."""
+
+    def __init__(self, invalidate):
+        self.invalidate = invalidate
+
+    def execute(self, stmt):
+        self.invalidate()
+        return []
+
+def test_load_racing_an_invalidation_is_not_installed(monkeypatch):
+    monkeypatch.setattr(sla_clock, "_calendars", None)
+    calendars = sla_clock.load_calendars(RacingSession(sla_clock._drop_calendars))
+    assert calendars.for_team(None) is not None
+    assert sla_clock._calendars is None
+
+def test_load_without_invalidation_is_installed(monkeypatch):
+    monkeypatch.setattr(sla_clock, "_calendars", None)
+    calendars = sla_clock.load_calendars(RacingSession(lambda: None))
+    assert sla_clock._calendars is calendars
+
+def test_lazy_reload_reads_the_primary(monkeypatch):
+    models.Base.metadata.create_all(database.engine)
+    with database.SessionLocal() as db:
+        db.query(models.TeamCalendar).delete()
+        db.add(models.TeamCalendar(team_id=7, weekmask="1111110", day_start="08:00", day_end="16:00"))
+        db.commit()
+    monkeypatch.setattr(sla_clock, "_calendars", None)
+    # A replica that is behind and has no team calendars yet
+    calendars = sla_clock.get_calendars(RacingSession(lambda: None))
+    assert calendars.for_team(7).weekmask == "1111110"
+    assert sla_clock._calendars is calendars
@@ -0,0 +1,62 @@
+"""Incremental snapshots: late commits and archived complaints are exported."""
+
+import json
+import os
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+import changes
+import database
+import models
+import snapshots
+
+@pytest.fixture
+def snapshot_dir(tmp_path, monkeypatch):
+    models.Base.metadata.create_all(database.engine)
+    with database.engine.begin() as conn:
+        for model in (models.SLAMatrix, models.ComplaintTombstone, models.ComplaintHistory, models.Complaint):
+            conn.execute(model.__table__.delete())
+    monkeypatch.setattr(snapshots, "SNAPSHOT_DIR", str(tmp_path))
+    return tmp_path
+
+def add_rule(updated_at: datetime):
+    with database.SessionLocal() as db:
+        db.add(models.SLAMatrix(
+            product="Loan", issue=uuid.uuid4().hex[:12], severity=models.ComplaintSeverity.LOW,
+            sla_hours=24, updated_at=updated_at
+        ))
+        db.commit()
+
+def incremental(monkeypatch, lag: float) -> dict:
+    monkeypatch.setattr(snapshots, "SNAPSHOT_LAG_SECONDS", lag)
+    with database.SessionLocal() as db:
+        return snapshots.take_snapshot(db, snapshots.INCREMENTAL, uuid.uuid4().hex)["tables"]
+
+def test_rows_committed_late_are_exported_by_the_next_run(snapshot_dir, monkeypatch):
+    add_rule(datetime.utcnow() - timedelta(seconds=1))
+    assert incremental(monkeypatch, lag=60)["sla_matrix"]["rows"] == 0
+    # Stamped before the row the first run saw, but committed after that run
+    add_rule(datetime.utcnow() - timedelta(seconds=30))
+    assert incremental(monkeypatch, lag=0)["sla_matrix"]["rows"] == 2
+    assert incremental(monkeypatch, lag=0)["sla_matrix"]["rows"] == 0
+
+def test_archived_complaints_are_exported_as_tombstones(snapshot_dir, monkeypatch):
+    with database.SessionLocal() as db:
+        complaint = models.Complaint(
+            complaint_number=uuid.uuid4().hex[:20], product="Loan", issue="Processing Delay",
+            description="Snapshot test", severity=models.ComplaintSeverity.LOW, customer_id=1, sla_hours=24
+        )
+        db.add(complaint)
+        db.commit()
+        changes.record_tombstones(db, [complaint.id], "archived")
+        db.commit()
+    tables = incremental(monkeypatch, lag=0)
+    assert tables["complaint_tombstones"]["rows"] == 1
+
+def test_watermarks_of_another_column_are_ignored(snapshot_dir, monkeypatch):
+    with open(os.path.join(snapshot_dir, "state.json"), "w") as f:
+        json.dump({"watermarks": {"complaint_history": 12, "sla_matrix": "2000-01-01T00:00:00"}}, f)
+    state = snapshots._load_state()
+    assert state == {"sla_matrix": datetime(2000, 1, 1)}
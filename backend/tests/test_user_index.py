@@ -0,0 +1,34 @@
+"""Typeahead index searches running alongside user updates."""
+
+import threading
+
+import models
+import user_index
+
+def user(user_id: int, name: str) -> dict:
+    return {
+        "id": user_id, "email": f"{name}{user_id}@bank.com", "full_name": f"{name.title()} {user_id}",
+        "role": models.UserRole.CUSTOMER, "team_id": None, "is_active": True,
+    }
+
+def test_search_during_updates_sees_consistent_entries(monkeypatch):
+    index = user_index.PrefixIndex([user(n, "ann") for n in range(200)])
+    monkeypatch.setattr(user_index, "_index", index)
+    done = threading.Event()
+    
+    def churn():
+        n = 0
+        while not done.is_set():
+            user_index.user_changed(models.User(**user(1000 + n % 50, "anna")))
+            user_index.user_deleted(1000 + (n + 25) % 50)
+            n += 1
+    
+    writer = threading.Thread(target=churn)
+    writer.start()
+    try:
+        for _ in range(2000):
+            found = index.search("ann", limit=250)
+            assert len({u["id"] for u in found}) == len(found) >= 200
+    finally:
+        done.set()
+        writer.join()
@@ -0,0 +1,41 @@
+"""SQLite write queue: FIFO turns, never waited for on the event loop."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+import database
+
+def test_turns_are_handed_over_in_order():
+    queue = database.WriteQueue(timeout=5)
+    assert queue.acquire()
+    order = []
+
+    def writer(number):
+        queue.acquire()
+        order.append(number)
+        queue.release()
+
+    threads = []
+    for number in range(3):
+        threads.append(threading.Thread(target=writer, args=(number,)))
+        threads[-1].start()
+        while queue.stats()["waiting"] < number + 1:
+            time.sleep(0.001)
+    queue.release()
+    for thread in threads:
+        thread.join()
+    assert order == [0, 1, 2]
+    assert queue.stats()["held"] is False
+
+def test_acquire_on_the_event_loop_raises_instead_of_blocking():
+    queue = database.WriteQueue(timeout=5)
+
+    async def write():
+        queue.acquire()
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(write())
+    assert queue.stats()["acquired"] == 0
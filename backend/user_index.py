@@ -0,0 +1,175 @@
+"""In-memory prefix index over user names and e-mails for typeahead lookup.
+
+Every lowercased e-mail, full name and name word is stored with its user id
+in one sorted list, so a prefix query is a binary search followed by a scan
+of the matching run. Writers apply their change to the local index right
+after committing and bump the ``users`` cache generation; every other worker
+then rebuilds its index in a background thread and swaps it in, so lookups
+never wait for a rebuild once the first one is done.
+"""
+
+import logging
+import threading
+from bisect import bisect_left, insort
+from collections import defaultdict
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+import cache
+import models
+
+logger = logging.getLogger(__name__)
+
+USERS = "users"
+
+_lock = threading.Lock()
+_index = None
+_rebuilding = False
+_rebuild_again = False
+
+def _snapshot(user) -> dict:
+    return {
+        "id": user.id,
+        "email": user.email,
+        "full_name": user.full_name,
+        "role": user.role,
+        "team_id": user.team_id,
+        "is_active": user.is_active,
+    }
+
+def _terms(user: dict) -> set:
+    name = user["full_name"].lower()
+    return {user["email"].lower(), name, *name.split()}
+
+class PrefixIndex:
+    """Sorted (term, user id) entries plus user snapshots by id.
+
+    Entries are also partitioned by role and by team, so filtered searches
+    only scan the matching partition instead of skipping through every
+    customer.
+    """
+
+    def __init__(self, users=()):
+        self.users = {user["id"]: user for user in users}
+        self.partitions = defaultdict(list)
+        for user in self.users.values():
+            for key in self._partition_keys(user):
+                self.partitions[key].extend((term, user["id"]) for term in _terms(user))
+        for entries in self.partitions.values():
+            entries.sort()
+
+    @staticmethod
+    def _partition_keys(user: dict) -> tuple:
+        return (None, ("role", user["role"]), ("team", user["team_id"]))
+
+    def add(self, user: dict):
+        self.remove(user["id"])
+        self.users[user["id"]] = user
+        for key in self._partition_keys(user):
+            for term in _terms(user):
+                insort(self.partitions[key], (term, user["id"]))
+
+    def remove(self, user_id: int):
+        user = self.users.pop(user_id, None)
+        if user is None:
+            return
+        for key in self._partition_keys(user):
+            entries = self.partitions[key]
+            for term in _terms(user):
+                position = bisect_left(entries, (term, user_id))
+                if position < len(entries) and entries[position] == (term, user_id):
+                    del entries[position]
+
+    def search(self, prefix: str, limit: int = 20, role=None, team_id: Optional[int] = None,
+               is_active: Optional[bool] = None) -> list:
+        """First ``limit`` users, by matching term, with a term starting with ``prefix``."""
+        prefix = prefix.lower()
+        # user_changed / user_deleted edit the entry lists in place under the same lock
+        with _lock:
+            if team_id is not None:
+                entries = self.partitions.get(("team", team_id), [])
+            elif role is not None:
+                entries = self.partitions.get(("role", role), [])
+            else:
+                entries = self.partitions.get(None, [])
+            
+            matches = {}
+            for position in range(bisect_left(entries, (prefix,)), len(entries)):
+                term, user_id = entries[position]
+                if not term.startswith(prefix) or len(matches) == limit:
+                    break
+                user = self.users.get(user_id)
+                if (user is None
+                        or (role is not None and user["role"] != role)
+                        or (is_active is not None and user["is_active"] != is_active)):
+                    continue
+                matches.setdefault(user_id, user)
+        return list(matches.values())
+
+def build(db: Session) -> PrefixIndex:
+    """Load all users into a new index and make it current."""
+    global _index
+    index = PrefixIndex(_snapshot(user) for user in db.query(
+        models.User.id, models.User.email, models.User.full_name,
+        models.User.role, models.User.team_id, models.User.is_active
+    ))
+    with _lock:
+        _index = index
+    return index
+
+def get_index(db: Session) -> PrefixIndex:
+    """Current index, built on first use."""
+    index = _index
+    return index if index is not None else build(db)
+
+def _rebuild():
+    global _rebuilding, _rebuild_again
+    while True:
+        db = SessionLocal()
+        try:
+            build(db)
+        except Exception:
+            logger.exception("User index rebuild failed")
+        finally:
+            db.close()
+        with _lock:
+            if not _rebuild_again:
+                _rebuilding = False
+                return
+            _rebuild_again = False
+
+def schedule_rebuild():
+    """Rebuild the index in the background, coalescing concurrent requests."""
+    global _rebuilding, _rebuild_again
+    with _lock:
+        if _rebuilding:
+            _rebuild_again = True
+            return
+        _rebuilding = True
+    threading.Thread(target=_rebuild, name="user-index", daemon=True).start()
+
+# Writers apply their own changes with user_changed / user_deleted; only
+# other workers rebuild
+cache.on_invalidate(USERS, schedule_rebuild, local=False)
+
+def _rebuild_if_running():
+    # A rebuild already under way may have read the users before the change
+    global _rebuild_again
+    if _rebuilding:
+        _rebuild_again = True
+
+def user_changed(user):
+    """Apply a committed insert or update to the local index."""
+    with _lock:
+        if _index is not None:
+            _index.add(_snapshot(user))
+        _rebuild_if_running()
+
+def user_deleted(user_id: int):
+    """Apply a committed delete to the local index."""
+    with _lock:
+        if _index is not None:
+            _index.remove(user_id)
+        _rebuild_if_running()
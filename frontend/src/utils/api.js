@@ -8,6 +8,10 @@ export const apiClient = axios.create({
   },
 })
 
+// Time of our last write, echoed back so the API serves our reads from the
+// primary database until replicas have caught up
+const LAST_WRITE_HEADER = 'X-Last-Write'
+
 // Request interceptor to add auth token
 apiClient.interceptors.request.use(
   (config) => {
@@ -15,6 +19,10 @@ apiClient.interceptors.request.use(
     if (token) {
       config.headers.Authorization = `Bearer ${token}`
     }
+    const lastWrite = sessionStorage.getItem('lastWrite')
+    if (lastWrite) {
+      config.headers[LAST_WRITE_HEADER] = lastWrite
+    }
     return config
   },
   (error) => {
@@ -24,7 +32,13 @@ apiClient.interceptors.request.use(
 
 // Response interceptor for error handling
 apiClient.interceptors.response.use(
-  (response) => response,
+  (response) => {
+    const lastWrite = response.headers[LAST_WRITE_HEADER.toLowerCase()]
+    if (lastWrite) {
+      sessionStorage.setItem('lastWrite', lastWrite)
+    }
+    return response
+  },
   (error) => {
     if (error.response?.status === 401) {
       localStorage.removeItem('token')